@@ -0,0 +1,13 @@
+'''
+**************************************************************************
+RemLocXY is the geometry core of "Triangulate the XY of Remote Location".
+
+It holds the math of the tool (UTM projection, intersection of the
+observation lines, incenter and incircle radius) so it can be imported and
+run without arcpy. The ArcGIS Pro script (RemoteLocationXYPro.py) runs
+RemLocXY.tool, which uses arcpy only for display; the ArcMap script
+(RemoteLocationXY.py) keeps its own arcpy geoprocessing.
+**************************************************************************
+'''
+
+from RemLocXY.solver import triangulate, intersect, incircle, Triangulation
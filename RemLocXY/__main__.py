@@ -0,0 +1,7 @@
+'''Run the command-line batch triangulation: python -m RemLocXY --help'''
+
+import sys
+
+from RemLocXY.cli import main
+
+sys.exit(main())
@@ -0,0 +1,372 @@
+'''
+Append-only archive of triangulated locations.
+
+Years of fixes (animal, time, Xin, Yin, r) are kept in one folder of flat
+binary files that are opened with numpy.memmap, so a query reads only the
+index entries and records it needs, not the archive:
+
+    archive = Archive("season.rlx")
+    archive.append(animal, time, Xin, Yin, r)
+    found = archive.query(animal="Crane 12", start="2014-05-01", end="2014-06-01")
+    found = archive.query(bbox=(-89.8, 43.5, -89.7, 43.6))
+
+Every append adds a segment: its records are sorted by time and written
+after the records already there, and two indexes of the segment are
+appended to their files:
+
+    grid     rows ordered by the cell of a coarse lon/lat grid (GRID degrees)
+    animal   rows ordered by animal
+
+Each index is an order file (row numbers) and a key file (key, first
+position in the order file, count), sorted by key within the segment, so
+a time window, a grid cell or an animal is found by binary search in
+every segment the query overlaps. Rows keep their time order within a
+key. The segment table (segments.bin) is written last, so an append that
+was cut short is ignored and overwritten by the next one. Many small
+appends make many segments; append in batches (a day, a season).
+'''
+
+import argparse
+import csv
+import json
+import os
+import sys
+
+import numpy as np
+
+# Width of the grid cells of the spatial index (degrees)
+GRID = 1.0
+# Rows per chunk when a CSV file is appended
+CHUNKSIZE = 1000000
+
+RECORD_DTYPE = np.dtype([("animal", "u4"), ("time", "f8"), ("Xin", "f8"), ("Yin", "f8"),
+                         ("r", "f4"), ("status", "u1")])
+KEY_DTYPE = np.dtype([("key", "i8"), ("start", "i8"), ("count", "i8")])
+SEGMENT_DTYPE = np.dtype([("start", "i8"), ("count", "i8"),
+                          ("tmin", "f8"), ("tmax", "f8"),
+                          ("lonmin", "f8"), ("lonmax", "f8"), ("latmin", "f8"), ("latmax", "f8"),
+                          ("grid_start", "i8"), ("grid_count", "i8"),
+                          ("animal_start", "i8"), ("animal_count", "i8")])
+INDEXES = ("grid", "animal")
+
+
+def _seconds(t):
+    '''Seconds since 1970 of numbers, datetime64 or ISO date strings.'''
+    t = np.asarray(t)
+    if t.dtype.kind in "US":
+        try:
+            return t.astype(np.float64)
+        except ValueError:
+            t = t.astype("datetime64[ns]")
+    if t.dtype.kind == "M":
+        return t.astype("datetime64[ns]").astype(np.int64) / 1e9
+    return t.astype(np.float64)
+
+
+def _map(path, dtype, count):
+    if count == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=(count,))
+
+
+def _append(path, array, size):
+    '''Write array to path at byte size (dropping anything after it).'''
+    with open(path, "r+b" if os.path.exists(path) else "w+b") as f:
+        f.truncate(size)
+        f.seek(size)
+        array.tofile(f)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _index(keys, start):
+    '''Stable order of the rows by key and the KEY_DTYPE table of it.'''
+    order = np.argsort(keys, kind="stable")
+    unique, first, count = np.unique(keys[order], return_index=True, return_counts=True)
+    table = np.zeros(len(unique), dtype=KEY_DTYPE)
+    table["key"] = unique
+    table["start"] = first + start
+    table["count"] = count
+    return order, table
+
+
+class Archive(object):
+    '''
+    Archive in the folder path, created (with grid cells of grid degrees)
+    if it does not exist.
+    '''
+
+    def __init__(self, path, grid=GRID):
+        self.path = path
+        meta = os.path.join(path, "archive.json")
+        if not os.path.exists(meta):
+            os.makedirs(path, exist_ok=True)
+            with open(meta, "w") as f:
+                json.dump({"version": 1, "grid": float(grid)}, f)
+        with open(meta) as f:
+            self.grid = json.load(f)["grid"]
+        self.columns = int(np.ceil(360 / self.grid))
+        self.rows = int(np.ceil(180 / self.grid))
+        self.animals = []
+        self.numbers = {}
+        if os.path.exists(self._file("animals.txt")):
+            with open(self._file("animals.txt"), encoding="utf-8") as f:
+                for line in f:
+                    self._number(line.rstrip("\n"))
+        ## Animals numbered since are written with the next append
+        self.saved = len(self.animals)
+        self._open()
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _open(self):
+        '''Map the files up to the extent of the segment table.'''
+        seg = self._file("segments.bin")
+        self.segments = np.fromfile(seg, dtype=SEGMENT_DTYPE) if os.path.exists(seg) else \
+            np.zeros(0, dtype=SEGMENT_DTYPE)
+        last = self.segments[-1] if len(self.segments) else None
+        self.size = int(last["start"] + last["count"]) if last is not None else 0
+        self.records = _map(self._file("records.bin"), RECORD_DTYPE, self.size)
+        self.orders = {}
+        self.keys = {}
+        for name in INDEXES:
+            self.orders[name] = _map(self._file(name + ".order"), np.int64, self.size)
+            count = int(last[name + "_start"] + last[name + "_count"]) if last is not None else 0
+            self.keys[name] = _map(self._file(name + ".keys"), KEY_DTYPE, count)
+
+    def __len__(self):
+        return self.size
+
+    def _number(self, animal):
+        animal = str(animal)
+        number = self.numbers.get(animal)
+        if number is None:
+            if "\n" in animal:
+                raise ValueError("Animal IDs cannot hold line breaks")
+            number = self.numbers[animal] = len(self.animals)
+            self.animals.append(animal)
+        return number
+
+    def cell(self, lon, lat):
+        '''Key of the grid cell of every point (-1 where it is NaN).'''
+        lon = np.asarray(lon, dtype=np.float64)
+        lat = np.asarray(lat, dtype=np.float64)
+        with np.errstate(invalid="ignore"):
+            col = np.clip(np.floor((lon + 180) / self.grid), 0, self.columns - 1)
+            row = np.clip(np.floor((lat + 90) / self.grid), 0, self.rows - 1)
+            key = row * self.columns + col
+        return np.where(np.isfinite(key), key, -1).astype(np.int64)
+
+    #----------------------------------------------------------------------------
+    #                                Append
+    #----------------------------------------------------------------------------
+
+    def append(self, animal, time, Xin, Yin, r, status=0):
+        '''
+        Append a batch of locations: animal IDs, times (seconds since 1970,
+        datetime64 or ISO strings), Xin, Yin (WGS84), r (meters) and the
+        status codes. Returns the number of records appended.
+        '''
+        animal = list(animal)
+        n = len(animal)
+        if not n:
+            return 0
+        records = np.zeros(n, dtype=RECORD_DTYPE)
+        records["animal"] = [self._number(a) for a in animal]
+        records["time"] = _seconds(time)
+        records["Xin"] = Xin
+        records["Yin"] = Yin
+        records["r"] = r
+        records["status"] = status
+        if np.isnan(records["time"]).any():
+            raise ValueError("Every record needs a time")
+        records = records[np.argsort(records["time"], kind="stable")]
+        start = self.size
+
+        # Records and indexes first, the segment table last
+        with open(self._file("animals.txt"), "a", encoding="utf-8") as f:
+            for a in self.animals[self.saved:]:
+                f.write(a + "\n")
+        self.saved = len(self.animals)
+        _append(self._file("records.bin"), records, start * RECORD_DTYPE.itemsize)
+        segment = np.zeros(1, dtype=SEGMENT_DTYPE)
+        segment["start"] = start
+        segment["count"] = n
+        segment["tmin"] = records["time"][0]
+        segment["tmax"] = records["time"][-1]
+        ## Bounding box of the located records (NaN if there are none)
+        located = np.isfinite(records["Xin"]) & np.isfinite(records["Yin"])
+        if located.any():
+            x, y = records["Xin"][located], records["Yin"][located]
+            segment[["lonmin", "lonmax", "latmin", "latmax"]] = (x.min(), x.max(), y.min(), y.max())
+        else:
+            segment[["lonmin", "lonmax", "latmin", "latmax"]] = (np.nan,) * 4
+        for name, keys in (("grid", self.cell(records["Xin"], records["Yin"])),
+                           ("animal", records["animal"].astype(np.int64))):
+            order, table = _index(keys, start)
+            segment[name + "_start"] = len(self.keys[name])
+            segment[name + "_count"] = len(table)
+            _append(self._file(name + ".order"), order + start, start * 8)
+            _append(self._file(name + ".keys"), table, len(self.keys[name]) * KEY_DTYPE.itemsize)
+        _append(self._file("segments.bin"), segment, len(self.segments) * SEGMENT_DTYPE.itemsize)
+        self._open()
+        return n
+
+    #----------------------------------------------------------------------------
+    #                                 Query
+    #----------------------------------------------------------------------------
+
+    def _ranges(self, name, segment, ranges):
+        '''Rows of the segment with index keys in the (low, high) ranges.'''
+        keys = self.keys[name][segment[name + "_start"]:segment[name + "_start"] + segment[name + "_count"]]
+        rows = []
+        for low, high in ranges:
+            i = np.searchsorted(keys["key"], low, side="left")
+            j = np.searchsorted(keys["key"], high, side="right")
+            if j > i:
+                rows.append(self.orders[name][keys["start"][i]:keys["start"][j - 1] + keys["count"][j - 1]])
+        return rows
+
+    def _cells(self, west, south, east, north):
+        '''Key ranges of the grid cells overlapping a bounding box.'''
+        lo = self.cell(west, south)
+        hi = self.cell(east, north)
+        c0, c1 = lo % self.columns, hi % self.columns
+        ranges = []
+        for row in range(lo // self.columns, hi // self.columns + 1):
+            base = row * self.columns
+            if c0 <= c1:
+                ranges.append((base + c0, base + c1))
+            else:
+                ## Across the antimeridian
+                ranges += [(base + c0, base + self.columns - 1), (base, base + c1)]
+        return ranges
+
+    def query(self, animal=None, start=None, end=None, bbox=None):
+        '''
+        Records (RECORD_DTYPE, in time order) of animal (an ID) from start
+        (inclusive) to end (exclusive) within bbox = (west, south, east,
+        north) in WGS84; every criterion is optional. animal_ids turns the
+        animal numbers of the records into IDs.
+        '''
+        low = -np.inf if start is None else float(_seconds(start))
+        high = np.inf if end is None else float(_seconds(end))
+        seg = self.segments
+        keep = (seg["tmax"] >= low) & (seg["tmin"] < high)
+        number = None
+        if animal is not None:
+            number = self.numbers.get(str(animal))
+            if number is None:
+                return np.zeros(0, dtype=RECORD_DTYPE)
+        if bbox is not None:
+            west, south, east, north = bbox
+            keep &= (seg["latmax"] >= south) & (seg["latmin"] <= north)
+            if west <= east:
+                keep &= (seg["lonmax"] >= west) & (seg["lonmin"] <= east)
+            ranges = self._cells(west, south, east, north)
+
+        parts = []
+        for segment in seg[keep]:
+            first, count = int(segment["start"]), int(segment["count"])
+            if number is not None:
+                ## The rows of an animal are in time order within a segment
+                for rows in self._ranges("animal", segment, [(number, number)]):
+                    if start is not None or end is not None:
+                        i, j = np.searchsorted(self.records["time"][rows], [low, high], side="left")
+                        rows = rows[i:j]
+                    parts.append(rows)
+            elif bbox is not None:
+                parts += self._ranges("grid", segment, ranges)
+            else:
+                ## The records of a segment are in time order
+                i, j = first + np.searchsorted(self.records["time"][first:first + count],
+                                               [low, high], side="left")
+                parts.append(np.arange(i, j))
+        if not parts:
+            return np.zeros(0, dtype=RECORD_DTYPE)
+        rows = np.concatenate(parts)
+        records = self.records[np.sort(rows)]
+        t = records["time"]
+        mask = (t >= low) & (t < high)
+        if number is not None:
+            mask &= records["animal"] == number
+        if bbox is not None:
+            x, y = records["Xin"], records["Yin"]
+            inside = (x >= west) & (x <= east) if west <= east else (x >= west) | (x <= east)
+            mask &= inside & (y >= south) & (y <= north)
+        records = np.asarray(records[mask])
+        return records[np.argsort(records["time"], kind="stable")]
+
+    def animal_ids(self, records):
+        '''Animal IDs of records.'''
+        return [self.animals[a] for a in records["animal"].tolist()]
+
+#----------------------------------------------------------------------------
+#                                  Run
+#----------------------------------------------------------------------------
+
+def append_csv(archive, src, animal="animal", time="time", chunksize=CHUNKSIZE):
+    '''
+    Append a result CSV file (e.g. of RemLocXY.cli) with animal, time, Xin,
+    Yin and r columns to archive; fixes with no location (Xin = Yin = 0)
+    are skipped. Returns the number of records appended.
+    '''
+    from RemLocXY import stream
+    total = 0
+    with open(src, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        lower = [h.strip().lower() for h in next(reader)]
+        try:
+            i, j = lower.index(animal.lower()), lower.index(time.lower())
+            index = [lower.index(name) for name in ("xin", "yin", "r")]
+        except ValueError:
+            raise ValueError("Input table needs the fields %s, %s, Xin, Yin and r" % (animal, time))
+        for rows in stream.read_chunks(reader, chunksize):
+            Xin, Yin, r = stream.parse_rows(rows, index).T
+            located = np.nonzero((Xin != 0) | (Yin != 0))[0]
+            total += archive.append([rows[k][i] for k in located.tolist()],
+                                    np.array([rows[k][j] for k in located.tolist()]),
+                                    Xin[located], Yin[located], r[located])
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m RemLocXY.archive",
+                                     description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("archive", help="archive folder (created by the first append)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    add = sub.add_parser("append", help="append a result CSV file")
+    add.add_argument("input", help="CSV file with animal, time, Xin, Yin and r columns")
+    add.add_argument("--animal", default="animal", help="animal ID column (default %(default)s)")
+    add.add_argument("--time", default="time", help="time column, seconds or ISO dates "
+                                                     "(default %(default)s)")
+    add.add_argument("--grid", type=float, default=GRID,
+                     help="grid cell size in degrees of a new archive (default %(default)s)")
+    find = sub.add_parser("query", help="write the matching records as CSV to standard output")
+    find.add_argument("--animal", help="animal ID")
+    find.add_argument("--start", help="first time (seconds or ISO date)")
+    find.add_argument("--end", help="time after the last (seconds or ISO date)")
+    find.add_argument("--bbox", type=float, nargs=4, metavar=("WEST", "SOUTH", "EAST", "NORTH"))
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "append":
+            count = append_csv(Archive(args.archive, args.grid), args.input, args.animal, args.time)
+            sys.stderr.write("%d records appended\n" % count)
+            return 0
+        if not os.path.exists(os.path.join(args.archive, "archive.json")):
+            raise ValueError("No archive in " + args.archive)
+        archive = Archive(args.archive)
+        found = archive.query(args.animal, args.start, args.end, args.bbox)
+    except (OSError, ValueError) as e:
+        parser.exit(1, "%s: error: %s\n" % (parser.prog, e))
+    writer = csv.writer(sys.stdout)
+    writer.writerow(["animal", "time", "Xin", "Yin", "r"])
+    writer.writerows(zip(archive.animal_ids(found), found["time"].tolist(), found["Xin"].tolist(),
+                         found["Yin"].tolist(), found["r"].tolist()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
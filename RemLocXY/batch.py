@@ -0,0 +1,146 @@
+'''
+Vectorized triangulation of many fixes at once.
+
+triangulate_batch does the same math as RemLocXY.solver.triangulate, but
+on NumPy arrays holding one fix per row (the lat1 ... dist columns of the
+tool's txt-file), so a whole field season is solved in one pass with no
+Python loop over the fixes.
+'''
+
+from collections import namedtuple
+
+import numpy as np
+
+from RemLocXY import tmerc
+from RemLocXY.solver import PAIRS
+
+# Input columns of a fix, in the order of the "fields" list of the tool
+FIELDS_IN = ["lat1","lon1","az1","lat2","lon2","az2","lat3","lon3","az3","dist"]
+# Output columns filled in by the triangulation
+FIELDS_OUT = ["Xin","Yin","r"]
+
+Batch = namedtuple("Batch", ["XY1", "XY2", "XY3", "ok", "valid", "Xin", "Yin", "R",
+                             "Xin_UTM", "Yin_UTM", "zone", "north"])
+Batch.__doc__ = '''
+Result of triangulate_batch; every member has one row per fix.
+
+XY1, XY2, XY3  (n, 2) arrays of the (X, Y) = (lon, lat) points of
+               intersection in WGS84, NaN where the lines do not intersect
+ok             (n, 3) bool array, True where lines #2/#3, #1/#3 and #1/#2
+               intersect (False mirrors the "do not intersect" warnings)
+valid          bool array, True where all three intersections exist
+Xin, Yin, R    incenter in WGS84 and incircle radius in meters (NaN if
+               not valid); Xin_UTM, Yin_UTM the incenter in the UTM zone
+zone, north    UTM zone number and hemisphere used for each fix
+'''
+
+#----------------------------------------------------------------------------
+#                       Intersections and incircle
+#----------------------------------------------------------------------------
+
+def intersect(X1, Y1, az1, len1, X2, Y2, az2, len2):
+    '''
+    Vectorized solver.intersect.
+
+    Returns X, Y of the points of intersection and a bool mask of the rows
+    where the lines intersect; X and Y are NaN elsewhere.
+    '''
+    return intersect_dir(X1, Y1, np.sin(np.radians(az1)), np.cos(np.radians(az1)), len1,
+                         X2, Y2, np.sin(np.radians(az2)), np.cos(np.radians(az2)), len2)
+
+
+def intersect_dir(X1, Y1, dx1, dy1, len1, X2, Y2, dx2, dy2, len2):
+    '''intersect with the bearings given as unit vectors (sin az, cos az).'''
+    den = dx1 * dy2 - dy1 * dx2
+    wx = X2 - X1
+    wy = Y2 - Y1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        s = (wx * dy2 - wy * dx2) / den   # distance along line 1
+        t = (wx * dy1 - wy * dx1) / den   # distance along line 2
+    ok = (den != 0) & (s >= 0) & (s <= len1) & (t >= 0) & (t <= len2)
+    X = np.where(ok, X1 + s * dx1, np.nan)
+    Y = np.where(ok, Y1 + s * dy1, np.nan)
+    return X, Y, ok
+
+
+def incircle(X1, Y1, X2, Y2, X3, Y3):
+    '''Vectorized solver.incircle: returns Xin, Yin and R.'''
+    A = np.hypot(X2 - X3, Y2 - Y3)
+    B = np.hypot(X1 - X3, Y1 - Y3)
+    C = np.hypot(X1 - X2, Y1 - Y2)
+    P = A + B + C
+    # All three lines crossing at one point give an exact location (R = 0)
+    exact = P == 0
+    W = np.where(exact, 1.0, P)
+    Xin = np.where(exact, X1, (A * X1 + B * X2 + C * X3) / W)
+    Yin = np.where(exact, Y1, (A * Y1 + B * Y2 + C * Y3) / W)
+    p = W / 2
+    S = np.sqrt(np.maximum(p * (p - A) * (p - B) * (p - C), 0.0))
+    R = np.where(exact, 0.0, S / p)
+    return Xin, Yin, R
+
+#----------------------------------------------------------------------------
+#                              Triangulation
+#----------------------------------------------------------------------------
+
+def stations(lat1, lon1, az1, lat2, lon2, az2, lat3, lon3, az3, dist):
+    '''
+    Project the observation points of many fixes into the UTM zone of their
+    average position. Returns (P, zone, north) where P holds (X, Y, grid
+    bearing, line length on the grid) arrays of observation points 1, 2, 3.
+    '''
+    obs = [[np.asarray(v, dtype=np.float64) for v in o]
+           for o in ((lat1, lon1, az1), (lat2, lon2, az2), (lat3, lon3, az3))]
+    obs = [np.broadcast_arrays(*o) for o in obs]
+    dist = np.asarray(dist, dtype=np.float64)
+
+    # Determine the UTM Zone of each fix from the average latitude and longitude
+    avgLat = (obs[0][0] + obs[1][0] + obs[2][0]) / 3
+    avgLon = (obs[0][1] + obs[1][1] + obs[2][1]) / 3
+    zone, north = tmerc.zone(avgLat, avgLon)
+
+    # Project the observation points and turn azimuths into grid bearings
+    P = []
+    for lat, lon, az in obs:
+        X, Y, gamma, k = tmerc.forward(lat, lon, zone, north)
+        P.append((X, Y, az - gamma, dist * k))
+    return P, zone, north
+
+
+def triangulate_batch(lat1, lon1, az1, lat2, lon2, az2, lat3, lon3, az3, dist):
+    '''
+    Triangulate many fixes. Every argument is an array (or scalar) with one
+    value per fix, as in the lat1 ... dist columns of the tool. Returns a
+    Batch.
+    '''
+    P, zone, north = stations(lat1, lon1, az1, lat2, lon2, az2, lat3, lon3, az3, dist)
+    return triangulate_projected(P, zone, north)
+
+
+def triangulate_projected(P, zone, north):
+    '''
+    Triangulate many fixes from their projected observation points, as
+    returned by stations (or RemLocXY.registry). Returns a Batch.
+    '''
+    # Find the points of intersection XY1, XY2 and XY3
+    XY_UTM = []
+    XY = []
+    for i, j in PAIRS:
+        X, Y, ok = intersect(*(P[i-1] + P[j-1]))
+        XY_UTM.append((X, Y, ok))
+        lat, lon = tmerc.inverse(X, Y, zone, north)
+        XY.append(np.stack([lon, lat], axis=-1))
+    ok = np.stack([xy[2] for xy in XY_UTM], axis=-1)
+    valid = ok.all(axis=-1)
+
+    # Find the center and the radius of the incircle where there is a triangle
+    (X1, Y1, _), (X2, Y2, _), (X3, Y3, _) = XY_UTM
+    Xin_UTM, Yin_UTM, R = incircle(X1, Y1, X2, Y2, X3, Y3)
+    Yin, Xin = tmerc.inverse(Xin_UTM, Yin_UTM, zone, north)
+    return Batch(XY[0], XY[1], XY[2], ok, valid, Xin, Yin, R, Xin_UTM, Yin_UTM, zone, north)
+
+
+def triangulate_columns(columns):
+    '''Triangulate a mapping of FIELDS_IN column name -> array (e.g. a NumPy
+    structured array or a dict of columns).'''
+    return triangulate_batch(*(columns[name] for name in FIELDS_IN))
@@ -0,0 +1,245 @@
+'''
+Benchmarks of the triangulation stages.
+
+Runs without ArcGIS on synthetic fixes and reports, for every stage and
+batch size, the fixes (or points) per second and the peak memory traced
+during one call:
+
+    python -m RemLocXY.bench                        # sizes 1 ... 10^6
+    python -m RemLocXY.bench --max-size 10000 --json bench.json
+    python -m RemLocXY.bench --compare bench.json   # against an older run
+
+Stages: UTM zone selection and projection, intersection of the observation
+lines, incenter/incircle (sides A, B, C, semiperimeter p, Heron's S and
+R = S/p), the geometry pre-check (batch sizes only), the whole
+triangulation (and on the ellipsoid, batch sizes only), the geodesic
+accuracy circles (batch sizes only), and CSV write and read/triangulate.
+Size 1 runs the single-fix code of RemLocXY.solver and RemLocXY.utm.
+The cold import time of the package and of the Pro tool module (which
+must not load arcpy; it loads NumPy for the records of a fix) is measured
+in fresh interpreters.
+'''
+
+import argparse
+import csv
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from RemLocXY import batch, geodesic, precheck, solver, stream, tmerc, utm
+
+SIZES = [1, 10, 100, 1000, 10000, 100000, 1000000]
+# Every case is run repeatedly for at least MIN_TIME seconds
+MIN_TIME = 0.2
+# A case is reported as a regression when it is this much slower
+THRESHOLD = 1.2
+
+#----------------------------------------------------------------------------
+#                            Synthetic fixes
+#----------------------------------------------------------------------------
+
+def fixes(n, seed=0, sd=1.0, dist=10000.0):
+    '''
+    Return a dict of FIELDS_IN columns of n random fixes: three observation
+    points 0.5-5 km around a random object, with bearings off by sd degrees.
+    '''
+    rng = np.random.default_rng(seed)
+    lat = rng.uniform(-60, 60, n)
+    lon = rng.uniform(-179, 179, n)
+    columns = {}
+    for i in (1, 2, 3):
+        ang = np.radians(rng.uniform(0, 360, n))
+        d = rng.uniform(500, 5000, n) / 111195.0
+        lat_i = lat + d * np.cos(ang)
+        lon_i = lon + d * np.sin(ang) / np.cos(np.radians(lat))
+        ## Spherical initial bearing from the observation point to the object
+        p1 = np.radians(lat_i)
+        p2 = np.radians(lat)
+        dl = np.radians(lon - lon_i)
+        az = np.degrees(np.arctan2(np.sin(dl) * np.cos(p2),
+                                   np.cos(p1) * np.sin(p2) - np.sin(p1) * np.cos(p2) * np.cos(dl)))
+        columns["lat%d" % i] = lat_i
+        columns["lon%d" % i] = lon_i
+        columns["az%d" % i] = (az + rng.normal(0, sd, n)) % 360
+    columns["dist"] = np.full(n, dist)
+    return columns
+
+#----------------------------------------------------------------------------
+#                                 Cases
+#----------------------------------------------------------------------------
+
+def _write_csv(path, columns, n):
+    names = batch.FIELDS_IN
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(names)
+        writer.writerows(zip(*(columns[name][:n].tolist() for name in names)))
+
+
+def cases(size, tmpdir):
+    '''Yield (stage, callable) pairs for one batch size.'''
+    c = fixes(size)
+    obs = [(c["lat%d" % i][0], c["lon%d" % i][0], c["az%d" % i][0]) for i in (1, 2, 3)]
+    cols = [c[name] for name in batch.FIELDS_IN]
+    P, zone, north = batch.stations(*cols)
+    XY = [batch.intersect(*(P[i-1] + P[j-1])) for i, j in solver.PAIRS]
+    (X1, Y1, _), (X2, Y2, _), (X3, Y3, _) = XY
+
+    if size == 1:
+        lat, lon = obs[0][0], obs[0][1]
+        z = utm.zone(lat, lon)
+        X, Y, gamma, k = utm.forward(lat, lon, *z)
+        p = [(P[i][0][0], P[i][1][0], P[i][2][0], P[i][3][0]) for i in range(3)]
+        x = [float(v[0]) for v in (X1, Y1, X2, Y2, X3, Y3)]
+        yield "utm.zone", lambda: utm.zone(lat, lon)
+        yield "utm.forward", lambda: utm.forward(lat, lon, *z)
+        yield "utm.inverse", lambda: utm.inverse(X, Y, *z)
+        yield "intersect", lambda: solver.intersect((p[0][0], p[0][1]), p[0][2], p[0][3],
+                                                    (p[1][0], p[1][1]), p[1][2], p[1][3])
+        yield "incircle", lambda: solver.incircle(*x)
+        yield "triangulate", lambda: solver.triangulate(obs[0], obs[1], obs[2], c["dist"][0])
+    else:
+        lat, lon = c["lat1"], c["lon1"]
+        X, Y, _, _ = tmerc.forward(lat, lon, zone, north)
+        yield "utm.zone", lambda: tmerc.zone(lat, lon)
+        yield "utm.forward", lambda: tmerc.forward(lat, lon, zone, north)
+        yield "utm.inverse", lambda: tmerc.inverse(X, Y, zone, north)
+        yield "intersect", lambda: batch.intersect(*(P[1] + P[2]))
+        yield "incircle", lambda: batch.incircle(X1, Y1, X2, Y2, X3, Y3)
+        yield "precheck", lambda: precheck.check_projected(P)
+        yield "triangulate", lambda: batch.triangulate_batch(*cols)
+        yield "geodesic", lambda: geodesic.triangulate_geodesic(*cols)
+        radius = np.full(size, 50.0)
+        yield "circles", lambda: geodesic.circles(lat, lon, radius)
+
+    src = os.path.join(tmpdir, "fixes_%d.csv" % size)
+    dst = os.path.join(tmpdir, "result_%d.csv" % size)
+    _write_csv(src, c, size)
+    yield "csv.write", lambda: _write_csv(dst, c, size)
+    yield "csv.triangulate", lambda: stream.triangulate_csv(src, dst)
+
+
+def import_time(module, repeat=5):
+    '''
+    Cold import time of module in seconds (best of repeat fresh
+    interpreters) and whether arcpy or numpy got imported with it.
+    '''
+    code = "import %s, sys; print(int('arcpy' in sys.modules), int('numpy' in sys.modules))" % module
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(
+        [os.path.dirname(os.path.dirname(os.path.abspath(__file__)))] + sys.path))
+    best = float("inf")
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], env=env,
+                              capture_output=True, text=True, check=True)
+        for line in proc.stderr.splitlines():
+            parts = line.split("|")
+            if len(parts) == 3 and parts[2].strip() == module:
+                best = min(best, int(parts[1]) * 1e-6)
+    arcpy, numpy = (bool(int(v)) for v in proc.stdout.split())
+    return best, arcpy, numpy
+
+
+def measure(fn, min_time=MIN_TIME):
+    '''Return (best seconds per call, peak traced bytes of one call).'''
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    best = float("inf")
+    total = 0.0
+    calls = 0
+    while total < min_time or calls < 3:
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = min(best, elapsed)
+        total += elapsed
+        calls += 1
+    return best, peak
+
+
+def run(sizes=SIZES, stages=None, min_time=MIN_TIME, report=print):
+    '''Run the benchmarks; returns a list of result dicts.'''
+    results = []
+    for module in ("RemLocXY", "RemLocXY.tool"):
+        if stages and "import" not in stages:
+            break
+        seconds, arcpy, numpy = import_time(module)
+        results.append({"stage": "import " + module, "size": 1, "seconds": seconds,
+                        "ops_per_sec": 1 / seconds, "peak_bytes": 0})
+        report("%-25s %10.3f ms cold%s" % ("import " + module, seconds * 1e3,
+                                         "".join(" (loads %s)" % m for m, loaded in
+                                                 (("arcpy", arcpy), ("numpy", numpy)) if loaded)))
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for size in sizes:
+            for stage, fn in cases(size, tmpdir):
+                if stages and stage not in stages:
+                    continue
+                seconds, peak = measure(fn, min_time)
+                result = {"stage": stage, "size": size, "seconds": seconds,
+                          "ops_per_sec": size / seconds, "peak_bytes": peak}
+                results.append(result)
+                report("%-16s %8d  %14.0f ops/s  %10.3f ms  %10.1f KiB peak"
+                       % (stage, size, result["ops_per_sec"], seconds * 1e3, peak / 1024.0))
+    return results
+
+
+def compare(results, baseline, threshold=THRESHOLD, report=print):
+    '''Report the speed of results against an older run; returns the regressions.'''
+    old = {(r["stage"], r["size"]): r for r in baseline["results"]}
+    regressions = []
+    for r in results:
+        o = old.get((r["stage"], r["size"]))
+        if o is None:
+            continue
+        ratio = r["seconds"] / o["seconds"]
+        flag = ""
+        if ratio > threshold:
+            flag = "  REGRESSION"
+            regressions.append((r["stage"], r["size"], ratio))
+        report("%-16s %8d  %6.2fx time  %6.2fx memory%s"
+               % (r["stage"], r["size"], ratio, r["peak_bytes"] / max(o["peak_bytes"], 1), flag))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m RemLocXY.bench", description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--max-size", type=int, default=SIZES[-1], help="largest batch size")
+    parser.add_argument("--stage", action="append", help="run only this stage (repeatable)")
+    parser.add_argument("--min-time", type=float, default=MIN_TIME, help="seconds per case")
+    parser.add_argument("--json", help="save the results to this JSON file")
+    parser.add_argument("--compare", help="compare against the results in this JSON file")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="slowdown reported as a regression (default %(default)s)")
+    args = parser.parse_args(argv)
+
+    results = run([s for s in SIZES if s <= args.max_size], args.stage, args.min_time)
+    output = {"meta": {"date": datetime.datetime.now().isoformat(timespec="seconds"),
+                       "python": platform.python_version(),
+                       "numpy": np.__version__,
+                       "platform": platform.platform(),
+                       "processor": platform.processor()},
+              "results": results}
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(output, f, indent=1)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print()
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+'''
+Checkpoints of long batch runs.
+
+While a CSV file is triangulated (RemLocXY.cli), a small JSON checkpoint
+file records how far the run got: the byte offset in the input after the
+last row written out, the number of rows (and valid fixes) done, a hash of
+that last input row and the size of the output file at that point. A
+restarted run checks the hash, cuts the output back to the recorded size
+(dropping anything written after the checkpoint), seeks the input to the
+offset and appends the remaining rows, so only the work since the last
+checkpoint is repeated.
+'''
+
+import csv
+import hashlib
+import json
+import os
+
+# Seconds between checkpoints by default
+INTERVAL = 10.0
+
+
+class OffsetLines(object):
+    '''
+    Iterate the decoded lines of a binary file for csv.reader, keeping the
+    byte offset after the last line read in offset.
+    '''
+
+    def __init__(self, f, encoding="utf-8"):
+        self.f = f
+        self.encoding = encoding
+        self.offset = f.tell() if f.seekable() else 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = self.f.readline()
+        if not line:
+            raise StopIteration
+        if self.offset == 0 and line.startswith(b"\xef\xbb\xbf"):
+            line = line[3:]
+            self.offset += 3
+        self.offset += len(line)
+        return line.decode(self.encoding, "surrogateescape")
+
+
+def row_hash(row):
+    '''Hash of an input row (list of strings) as read from the CSV file.'''
+    return hashlib.sha1("\x1f".join(row).encode("utf-8", "surrogateescape")).hexdigest()
+
+
+def read_chunks(reader, lines, chunksize):
+    '''
+    Yield (rows, row_offset, offset, hash) chunks of at most chunksize rows
+    from a csv reader over lines (OffsetLines): row_offset is where the last
+    row of the chunk starts, offset where it ends and hash its row_hash.
+    '''
+    while True:
+        rows = []
+        row_offset = lines.offset
+        while len(rows) < chunksize:
+            start = lines.offset
+            row = next(reader, None)
+            if row is None:
+                break
+            row_offset = start
+            rows.append(row)
+        if not rows:
+            return
+        yield rows, row_offset, lines.offset, row_hash(rows[-1])
+
+
+def load(path):
+    '''Return the checkpoint saved in path, or None if there is none.'''
+    if not path or not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save(path, state):
+    '''Write the checkpoint state (a dict) to path, replacing it atomically.'''
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f, indent=1)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def verify(state, fin, options):
+    '''
+    Check that a checkpoint belongs to the binary input file fin and to
+    options, and seek fin to where the run stopped: the row at the recorded
+    row_offset must hash to the recorded hash. Raises ValueError if the
+    checkpoint does not match.
+    '''
+    if state.get("options") != options:
+        raise ValueError("Checkpoint was written with other options: %s" % state.get("options"))
+    if state["rows"]:
+        fin.seek(state["row_offset"])
+        lines = OffsetLines(fin)
+        row = next(csv.reader(lines), None)
+        if row is None or row_hash(row) != state["hash"] or lines.offset != state["offset"]:
+            raise ValueError("Input does not match the checkpoint at row %d" % state["rows"])
+    fin.seek(state["offset"])
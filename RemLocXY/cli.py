@@ -0,0 +1,461 @@
+'''
+Command-line batch triangulation without ArcGIS.
+
+Reads a CSV file laid out like the tool's txt-file (a header row with the
+lat1 ... dist columns, one fix per row), triangulates every fix and writes
+all input columns with Xin, Yin and r filled in:
+
+    python -m RemLocXY fixes.csv result.csv
+    python -m RemLocXY fixes.csv result.jsonl --format jsonl --workers 8
+    python -m RemLocXY fixes.csv result.gpkg --format gpkg
+    python -m RemLocXY fixes.csv result.csv --error montecarlo --sd 2
+
+Error models (the meaning of r):
+    incircle    radius of the incircle of the three intersections, as in
+                the tool (default); Xin, Yin is the incenter
+    lsq         error radius (meters) of the least squares location of
+                RemLocXY.lsq; Xin, Yin is that location. Bearings after
+                the third one are read from lat4, lon4, az4, lat5, ...
+                columns (blank where a fix has fewer bearings); not with
+                --stations
+    montecarlo  percentile radius of RemLocXY.montecarlo at --level for a
+                bearing error of --sd degrees; Xin, Yin is the incenter
+                (the mean of the samples if the bearings give no triangle)
+
+Xin, Yin and r are 0 where a fix has no location, as in the txt-file.
+--format gpkg writes the observation points and lines, locations and
+accuracy circles of all fixes to one GeoPackage (RemLocXY.gpkg). The
+file is processed in chunks of --chunksize rows, spread over --workers
+processes, so memory stays flat however large the input is. "-" reads
+from standard input or writes to standard output. With --checkpoint the
+progress is saved as the run goes (RemLocXY.checkpoint) and an
+interrupted run started again with the same arguments continues where it
+stopped. With --stations the fixes give the IDs of registered towers
+instead of coordinates (RemLocXY.registry); with --stations and --snap
+the fixes give coordinates and every observation point within the
+tolerance of a tower is moved onto it. With --geodesic the incircle
+model intersects the observation lines as geodesics on the ellipsoid
+(RemLocXY.geodesic) instead of in the UTM zone. With --precheck every fix is
+classified by RemLocXY.precheck first; fixes that fail are not solved
+(Xin, Yin and r are 0) and the summary counts them by reason.
+'''
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from RemLocXY import checkpoint as ckpt
+from RemLocXY import geodesic as geod
+from RemLocXY import gpkg, lsq, montecarlo, parallel, precheck, registry, stream
+from RemLocXY.batch import FIELDS_IN, triangulate_batch
+
+FORMATS = ["csv", "jsonl", "gpkg"]
+ERRORS = ["incircle", "lsq", "montecarlo"]
+
+Located = namedtuple("Located", ["valid", "Xin", "Yin", "R"])
+Located.__doc__ = '''
+Result of solve; every member has one row per fix.
+
+valid     bool array, True where the fix has a location
+Xin, Yin  location in WGS84 (NaN if not valid)
+R         r of the error model in meters
+'''
+
+#----------------------------------------------------------------------------
+#                               Error models
+#----------------------------------------------------------------------------
+
+def solve(values, error="incircle", sd=1.0, samples=montecarlo.SAMPLES,
+          level=montecarlo.LEVEL, seed=None, geodesic=False):
+    '''
+    Locate the fixes of an (n, 10) array of lat1 ... dist values with the
+    given error model; geodesic intersects the lines of the incircle model
+    on the ellipsoid. For the lsq model values may go on with lat, lon and
+    az columns of more bearings (NaN where a fix has fewer). Returns a
+    Located.
+    '''
+    if error == "incircle":
+        fix = (geod.triangulate_geodesic if geodesic else triangulate_batch)(*values.T)
+        return Located(fix.valid, fix.Xin, fix.Yin, fix.R)
+    if error == "lsq":
+        ## lat1 ... az3, dist, then the lat, lon, az of any further bearings
+        lat = np.r_[0:9:3, 10:values.shape[1]:3]
+        est = lsq.estimate(values[:, lat], values[:, lat + 1], values[:, lat + 2],
+                           dist=values[:, 9], sigma=sd)
+        return Located(est.valid, est.Xin, est.Yin, est.error)
+    if error == "montecarlo":
+        ell = montecarlo.monte_carlo(*values.T, sd=sd, samples=samples, seed=seed, level=level)
+        valid = np.isfinite(ell.Xin) & np.isfinite(ell.Yin) & np.isfinite(ell.radius)
+        return Located(valid, ell.Xin, ell.Yin, ell.radius)
+    raise ValueError("Unknown error model " + repr(error))
+
+
+def solve_stations(stations, rows, index_in, error="incircle", **options):
+    '''
+    Locate the fixes of CSV rows with the station1, az1 ... dist columns
+    of RemLocXY.registry, stations being the Registry. Returns a Located.
+    '''
+    ids = [stations.lookup([row[i] if i < len(row) else "" for row in rows]) for i in index_in[0:6:2]]
+    values = stream.parse_rows(rows, index_in[1:6:2] + index_in[6:])
+    az1, az2, az3, dist = values.T
+    if error == "incircle" and not options.get("geodesic"):
+        fix = stations.triangulate(ids[0], az1, ids[1], az2, ids[2], az3, dist)
+        return Located(fix.valid, fix.Xin, fix.Yin, fix.R)
+    return solve(station_values(stations, rows, index_in), error, **options)
+
+
+def station_values(stations, rows, index_in):
+    '''The (n, 10) array of lat1 ... dist values of CSV rows with the
+    station1, az1 ... dist columns, stations being the Registry.'''
+    ids = [stations.lookup([row[i] if i < len(row) else "" for row in rows]) for i in index_in[0:6:2]]
+    az1, az2, az3, dist = stream.parse_rows(rows, index_in[1:6:2] + index_in[6:]).T
+    return np.column_stack(stations.coordinates(ids[0], az1, ids[1], az2, ids[2], az3, dist))
+
+
+def snap_rows(stations, rows, index_in, tolerance):
+    '''
+    Snap the observation points of CSV rows with the lat1 ... dist columns
+    to the registered stations within tolerance meters, writing the station
+    coordinates into the rows. Returns the (n, 10) array of snapped values.
+    '''
+    values = stream.parse_rows(rows, index_in)
+    cols, idx = stations.snap_columns(*values.T, tolerance=tolerance)
+    values = np.column_stack(cols)
+    for point in range(3):
+        lat = values[:, 3 * point].tolist()
+        lon = values[:, 3 * point + 1].tolist()
+        i, j = index_in[3 * point], index_in[3 * point + 1]
+        for row in np.nonzero(idx[:, point] >= 0)[0].tolist():
+            rows[row][i] = lat[row]
+            rows[row][j] = lon[row]
+    return values
+
+
+def solve_checked(values, **options):
+    '''
+    solve only the fixes of values that pass RemLocXY.precheck. Returns
+    the Located of all fixes (not valid where rejected) and the reason
+    codes.
+    '''
+    codes = precheck.check(*values[:, :len(FIELDS_IN)].T)
+    ok = codes == precheck.OK
+    result = solve(values[ok], **options)
+    n = len(values)
+    located = Located(np.zeros(n, dtype=bool), np.full(n, np.nan), np.full(n, np.nan),
+                      np.full(n, np.nan))
+    for full, part in zip(located, result):
+        full[ok] = part
+    return located, codes
+
+
+def solve_chunk(rows, index_in, index_out, width, options, stations=None, snap=None,
+                checked=False):
+    '''
+    Locate one chunk of CSV rows (in place) with the solve options. With a
+    stations Registry the rows give station IDs, or, if snap is a
+    tolerance, coordinates that are snapped to the stations first. If
+    checked, the fixes that fail the pre-check are not solved. Returns
+    (rows, bool array of the valid fixes, fixes per reason code or None);
+    runs in the worker processes.
+    '''
+    reasons = None
+    if checked:
+        if stations is None:
+            values = stream.parse_rows(rows, index_in)
+        elif snap:
+            values = snap_rows(stations, rows, index_in, snap)
+        else:
+            values = station_values(stations, rows, index_in)
+        result, codes = solve_checked(values, **options)
+        reasons = precheck.counts(codes).tolist()
+    elif stations is None:
+        result = solve(stream.parse_rows(rows, index_in), **options)
+    elif snap:
+        result = solve(snap_rows(stations, rows, index_in, snap), **options)
+    else:
+        result = solve_stations(stations, rows, index_in, **options)
+    return stream.fill_rows(rows, result, index_out, width), np.asarray(result.valid, dtype=bool), reasons
+
+#----------------------------------------------------------------------------
+#                                 Output
+#----------------------------------------------------------------------------
+
+def _number(value):
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return value
+    return value
+
+
+class JSONLinesWriter(object):
+    '''
+    csv.writer look-alike writing one JSON object per row; the first row
+    written is the header unless it is given.
+    '''
+
+    def __init__(self, f, header=None):
+        self.f = f
+        self.header = header
+
+    def writerow(self, row):
+        if self.header is None:
+            self.header = list(row)
+        else:
+            self.f.write(json.dumps(dict(zip(self.header, map(_number, row)))) + "\n")
+
+    def writerows(self, rows):
+        for row in rows:
+            self.writerow(row)
+
+
+class GeoPackageWriter(object):
+    '''
+    csv.writer look-alike adding the written rows (input columns with Xin,
+    Yin and r filled in) to a RemLocXY.gpkg GeoPackage; writerows takes the
+    valid mask of the rows as well, the header row is skipped. Use it in a
+    with block.
+    '''
+
+    def __init__(self, path, index_in, index_out, stations=None, snap=None):
+        self.gpkg = gpkg.GeoPackage(path)
+        self.index_in = index_in
+        self.index_out = index_out
+        self.stations = None if snap else stations
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, kind, value, traceback):
+        return self.gpkg.__exit__(kind, value, traceback)
+
+    def writerow(self, row):
+        pass
+
+    def writerows(self, rows, valid):
+        if self.stations is None:
+            values = stream.parse_rows(rows, self.index_in)
+        else:
+            values = station_values(self.stations, rows, self.index_in)
+        Xin, Yin, R = stream.parse_rows(rows, self.index_out).T
+        self.gpkg.add(values[:, :len(FIELDS_IN)], Located(valid, Xin, Yin, R))
+
+
+def writer(f, format="csv", header=None):
+    '''
+    Return a csv.writer or JSONLinesWriter for format; header is the header
+    row when appending to an existing file.
+    '''
+    if format == "csv":
+        return csv.writer(f)
+    if format == "jsonl":
+        return JSONLinesWriter(f, header)
+    raise ValueError("Unknown output format " + repr(format))
+
+#----------------------------------------------------------------------------
+#                                  Run
+#----------------------------------------------------------------------------
+
+def _open_in(path):
+    if path == "-":
+        return open(sys.stdin.fileno(), "rb", closefd=False)
+    return open(path, "rb")
+
+
+def _open_out(path, mode):
+    if path == "-":
+        return open(sys.stdout.fileno(), mode, encoding="utf-8", errors="surrogateescape",
+                    newline="", closefd=False)
+    return open(path, mode, encoding="utf-8", errors="surrogateescape", newline="")
+
+
+def triangulate_file(src, dst, format="csv", workers=1, chunksize=stream.CHUNKSIZE,
+                     checkpoint=None, interval=ckpt.INTERVAL, stations=None, snap=None,
+                     checked=False, **options):
+    '''
+    Triangulate every fix of the CSV file src and write the result to dst in
+    format. options are passed to solve. If checkpoint is a path, the
+    progress is saved there every interval seconds and a run that finds a
+    checkpoint of an earlier run continues it, appending to dst. stations
+    is a RemLocXY.registry.Registry if the fixes give station IDs, or give
+    coordinates to be snapped to the stations within snap meters. If
+    checked, fixes that fail RemLocXY.precheck are not solved. Returns
+    (number of fixes, number of valid fixes, fixes per reason code or None).
+    '''
+    workers = parallel._workers(workers)
+    settings = dict(options, format=format)
+    if checked:
+        settings["precheck"] = True
+    if stations is not None:
+        settings["stations"] = os.path.abspath(stations.path) if stations.path else len(stations)
+        settings["snap"] = snap
+    state = ckpt.load(checkpoint)
+    if checkpoint and "-" in (src, dst):
+        raise ValueError("Checkpoints need an input and an output file")
+    if format == "gpkg" and (checkpoint or dst == "-"):
+        raise ValueError("GeoPackage output needs an output file and no checkpoint")
+    total = state["rows"] if state else 0
+    valid = state["valid"] if state else 0
+    reasons = None
+    if checked:
+        reasons = state["reasons"] if state else [0] * len(precheck.REASONS)
+
+    with _open_in(src) as fin:
+        lines = ckpt.OffsetLines(fin)
+        reader = csv.reader(lines)
+        header = next(reader)
+        index_in, index_out, header_out = stream.columns(
+            header, FIELDS_IN if stations is None or snap else registry.FIELDS_IN)
+        if options.get("error") == "lsq" and stations is None:
+            index_in += stream.bearing_columns(header)
+        width = len(header_out)
+        if state:
+            ## Continue after the last checkpoint, dropping later output
+            ckpt.verify(state, fin, settings)
+            lines.offset = state["offset"]
+            os.truncate(dst, state["output"])
+        if format == "gpkg":
+            output = GeoPackageWriter(dst, index_in, index_out, stations, snap)
+        else:
+            output = _open_out(dst, "a" if state else "w")
+        with output as fout:
+            ## A new file starts with the header row; an appending JSONLinesWriter is given it
+            out = fout if format == "gpkg" else writer(fout, format, header_out if state else None)
+            if not state:
+                out.writerow(header_out)
+
+            def save(row_offset, offset, digest):
+                fout.flush()
+                os.fsync(fout.fileno())
+                ckpt.save(checkpoint, {"input": os.path.abspath(src), "offset": offset,
+                                       "row_offset": row_offset, "hash": digest, "rows": total,
+                                       "valid": valid, "reasons": reasons,
+                                       "output": os.fstat(fout.fileno()).st_size,
+                                       "options": settings})
+
+            # marks holds the input position of every chunk handed out, in order
+            marks = deque()
+
+            def tasks():
+                for rows, row_offset, offset, digest in ckpt.read_chunks(reader, lines, chunksize):
+                    marks.append((row_offset, offset, digest))
+                    yield rows, index_in, index_out, width, options, stations, snap, checked
+
+            if workers == 1:
+                results = (solve_chunk(*task) for task in tasks())
+                executor = None
+            else:
+                executor = ProcessPoolExecutor(workers)
+                results = parallel.ordered(executor, solve_chunk, tasks(), 2 * workers)
+            mark = (state["row_offset"], state["offset"], state["hash"]) if state else \
+                (lines.offset, lines.offset, None)
+            saved = time.perf_counter()
+            try:
+                for rows, located, chunk_reasons in results:
+                    if format == "gpkg":
+                        out.writerows(rows, located)
+                    else:
+                        out.writerows(rows)
+                    total += len(rows)
+                    valid += int(located.sum())
+                    if checked:
+                        reasons = [a + b for a, b in zip(reasons, chunk_reasons)]
+                    mark = marks.popleft()
+                    if checkpoint and time.perf_counter() - saved >= interval:
+                        save(*mark)
+                        saved = time.perf_counter()
+            finally:
+                if executor is not None:
+                    executor.shutdown()
+            if checkpoint:
+                save(*mark)
+    return total, valid, reasons
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m RemLocXY", description=__doc__.split("\n\n")[0].strip(),
+                                     epilog="Error models: incircle (the tool's r), lsq, montecarlo.")
+    parser.add_argument("input", help="CSV file with the lat1 ... dist columns (- for stdin)")
+    parser.add_argument("output", help="output file (- for stdout)")
+    parser.add_argument("--format", choices=FORMATS, default="csv", help="output format (default csv)")
+    parser.add_argument("--error", choices=ERRORS, default="incircle",
+                        help="error model giving r (default incircle)")
+    parser.add_argument("--chunksize", type=int, default=stream.CHUNKSIZE,
+                        help="rows per chunk (default %(default)s)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="worker processes, 0 for all cores (default 1)")
+    parser.add_argument("--sd", type=float, default=None,
+                        help="bearing standard deviation in degrees (montecarlo: default 1; "
+                             "lsq: estimated from the residuals if not given)")
+    parser.add_argument("--samples", type=int, default=montecarlo.SAMPLES,
+                        help="montecarlo samples per fix (default %(default)s)")
+    parser.add_argument("--level", type=float, default=montecarlo.LEVEL,
+                        help="montecarlo confidence level (default %(default)s)")
+    parser.add_argument("--seed", type=int, default=None, help="montecarlo random seed")
+    parser.add_argument("--geodesic", action="store_true",
+                        help="incircle: intersect the observation lines as geodesics on the "
+                             "WGS84 ellipsoid instead of in the UTM zone")
+    parser.add_argument("--stations", help="station registry CSV (id, lat, lon); the input then has "
+                                           "the station1, az1 ... az3, dist columns")
+    parser.add_argument("--snap", type=float, metavar="METERS",
+                        help="with --stations: the input has the lat1 ... dist columns and every "
+                             "observation point within METERS of a station is moved onto it")
+    parser.add_argument("--precheck", action="store_true",
+                        help="reject fixes with bad geometry before solving them and count them "
+                             "by reason")
+    parser.add_argument("--checkpoint", help="save the progress to this file; a run that finds "
+                                             "it continues where the last one stopped")
+    parser.add_argument("--checkpoint-interval", type=float, default=ckpt.INTERVAL,
+                        help="seconds between checkpoints (default %(default)s)")
+    parser.add_argument("--quiet", action="store_true", help="do not print the summary")
+    args = parser.parse_args(argv)
+    if args.chunksize < 1:
+        parser.error("--chunksize must be at least 1")
+    if args.snap is not None and (args.snap <= 0 or not args.stations):
+        parser.error("--snap needs --stations and a positive tolerance")
+
+    if args.geodesic and args.error != "incircle":
+        parser.error("--geodesic needs --error incircle")
+
+    options = {"error": args.error}
+    if args.geodesic:
+        options["geodesic"] = True
+    if args.error == "lsq":
+        options["sd"] = args.sd
+    elif args.error == "montecarlo":
+        options.update(sd=1.0 if args.sd is None else args.sd, samples=args.samples,
+                       level=args.level, seed=args.seed)
+
+    start = time.perf_counter()
+    try:
+        state = ckpt.load(args.checkpoint)
+        if state and not args.quiet:
+            sys.stderr.write("Resuming after row %d\n" % state["rows"])
+        stations = registry.load(args.stations) if args.stations else None
+        total, valid, reasons = triangulate_file(args.input, args.output, args.format,
+                                                 args.workers or None, args.chunksize,
+                                                 args.checkpoint, args.checkpoint_interval,
+                                                 stations, args.snap, args.precheck, **options)
+        done = total - (state["rows"] if state else 0)
+    except (OSError, ValueError, StopIteration) as e:
+        parser.exit(1, "%s: error: %s\n" % (parser.prog, str(e) or "empty input"))
+    elapsed = time.perf_counter() - start
+    if not args.quiet:
+        sys.stderr.write("%d fixes, %d valid (%s) in %.2f s, %.0f fixes/s\n"
+                         % (total, valid, args.error, elapsed, done / max(elapsed, 1e-9)))
+        if reasons is not None:
+            sys.stderr.write("precheck: " + ", ".join("%s %d" % item for item in
+                                                      zip(precheck.REASONS, reasons)) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
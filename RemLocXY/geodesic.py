@@ -0,0 +1,352 @@
+'''
+Vectorized intersection of geodesics on the WGS84 ellipsoid.
+
+The tool draws the observation lines as GEODESIC lines (ArcGIS
+BearingDistanceToLine) but intersects them in the UTM zone of the average
+position, which loses accuracy near the zone edges and for long lines.
+Here the lines are intersected on the ellipsoid itself, for many fixes at
+once:
+
+1. the initial guess is the crossing of the great circles of the two
+   lines, i.e. of their straight lines in a gnomonic projection;
+2. the distances s1, s2 along the two geodesics are refined by Newton
+   iteration: both points are found with the direct geodesic problem
+   (Vincenty), and their offset and forward azimuths give the step,
+   until the points (or the steps) are within TOLERANCE meters or after
+   MAX_ITER steps.
+
+Both the direct and the inverse problem (Vincenty) are iterated to a
+tolerance with a cap on the iterations as well. triangulate_geodesic
+uses the kernel for the three pairs of observation lines and returns a
+batch.Batch, so it can replace batch.triangulate_batch.
+
+circles and ellipses give the accuracy polygons of many fixes at once
+(what the tool draws with one Buffer per fix): every vertex is the direct
+problem from the location, along the azimuths of a unit-circle template
+that is computed once per vertex count.
+'''
+
+import functools
+
+import numpy as np
+
+from RemLocXY import tmerc, utm
+from RemLocXY.batch import Batch, incircle
+from RemLocXY.solver import PAIRS
+
+# Newton iteration of the intersection: step (meters) and most steps
+TOLERANCE = 1e-6
+MAX_ITER = 20
+# Vincenty iterations: change of sigma or lambda (radians) and most steps
+VINCENTY_TOLERANCE = 1e-14
+VINCENTY_MAX_ITER = 50
+# Vertices of an accuracy polygon
+VERTICES = 72
+
+_b = utm.a * (1 - utm.f)
+_ep2 = (utm.a**2 - _b**2) / _b**2
+_e2 = utm.f * (2 - utm.f)
+
+#----------------------------------------------------------------------------
+#                         Direct and inverse problem
+#----------------------------------------------------------------------------
+
+def _AB(cos2alpha):
+    u2 = cos2alpha * _ep2
+    A = 1 + u2 / 16384 * (4096 + u2 * (-768 + u2 * (320 - 175 * u2)))
+    B = u2 / 1024 * (256 + u2 * (-128 + u2 * (74 - 47 * u2)))
+    return A, B
+
+
+def _delta_sigma(B, sin_s, cos_s, cos2sm):
+    return B * sin_s * (cos2sm + B / 4 * (cos_s * (-1 + 2 * cos2sm**2) -
+                                          B / 6 * cos2sm * (-3 + 4 * sin_s**2) * (-3 + 4 * cos2sm**2)))
+
+
+def _line(lat1, az1):
+    '''Constants of the geodesics from latitudes lat1 at azimuths az1.'''
+    alpha1 = np.radians(az1)
+    sin_a1 = np.sin(alpha1)
+    cos_a1 = np.cos(alpha1)
+    tanU1 = (1 - utm.f) * np.tan(np.radians(lat1))
+    cosU1 = 1 / np.sqrt(1 + tanU1**2)
+    sinU1 = tanU1 * cosU1
+    sigma1 = np.arctan2(tanU1, cos_a1)
+    sin_alpha = cosU1 * sin_a1
+    cos2alpha = 1 - sin_alpha**2
+    A, B = _AB(cos2alpha)
+    C = utm.f / 16 * cos2alpha * (4 + utm.f * (4 - 3 * cos2alpha))
+    return sin_a1, cos_a1, sinU1, cosU1, sigma1, sin_alpha, cos2alpha, A, B, C
+
+
+def _along(line, lon1, s):
+    '''direct for the geodesics of _line.'''
+    sin_a1, cos_a1, sinU1, cosU1, sigma1, sin_alpha, cos2alpha, A, B, C = line
+    sigma0 = np.asarray(s, dtype=np.float64) / (_b * A)
+    sigma = sigma0
+    for _ in range(VINCENTY_MAX_ITER):
+        cos2sm = np.cos(2 * sigma1 + sigma)
+        sin_s = np.sin(sigma)
+        cos_s = np.cos(sigma)
+        previous = sigma
+        sigma = sigma0 + _delta_sigma(B, sin_s, cos_s, cos2sm)
+        if not np.any(np.abs(sigma - previous) > VINCENTY_TOLERANCE):
+            break
+    cos2sm = np.cos(2 * sigma1 + sigma)
+    sin_s = np.sin(sigma)
+    cos_s = np.cos(sigma)
+
+    x = sinU1 * sin_s - cosU1 * cos_s * cos_a1
+    phi2 = np.arctan2(sinU1 * cos_s + cosU1 * sin_s * cos_a1,
+                      (1 - utm.f) * np.sqrt(sin_alpha**2 + x**2))
+    lam = np.arctan2(sin_s * sin_a1, cosU1 * cos_s - sinU1 * sin_s * cos_a1)
+    L = lam - (1 - C) * utm.f * sin_alpha * (
+        sigma + C * sin_s * (cos2sm + C * cos_s * (-1 + 2 * cos2sm**2)))
+    lon2 = (np.asarray(lon1) + np.degrees(L) + 180) % 360 - 180
+    az2 = np.degrees(np.arctan2(sin_alpha, -x))
+    return np.degrees(phi2), lon2, az2
+
+
+def direct(lat1, lon1, az1, s):
+    '''
+    Point s meters along the geodesic from (lat1, lon1) at azimuth az1
+    (degrees; s may be negative). Returns lat2, lon2 and the forward
+    azimuth az2 there.
+    '''
+    return _along(_line(lat1, az1), lon1, s)
+
+
+def inverse(lat1, lon1, lat2, lon2):
+    '''
+    Geodesic between two points: returns the distance (meters) and the
+    azimuths at both ends (degrees). Points that do not converge (nearly
+    antipodal) give NaN.
+    '''
+    U1 = np.arctan((1 - utm.f) * np.tan(np.radians(lat1)))
+    U2 = np.arctan((1 - utm.f) * np.tan(np.radians(lat2)))
+    sinU1, cosU1 = np.sin(U1), np.cos(U1)
+    sinU2, cosU2 = np.sin(U2), np.cos(U2)
+    L = np.radians((np.asarray(lon2) - lon1 + 180) % 360 - 180)
+    lam = L
+    done = np.zeros(np.shape(L), dtype=bool)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for _ in range(VINCENTY_MAX_ITER):
+            sin_l, cos_l = np.sin(lam), np.cos(lam)
+            sin_s = np.hypot(cosU2 * sin_l, cosU1 * sinU2 - sinU1 * cosU2 * cos_l)
+            cos_s = sinU1 * sinU2 + cosU1 * cosU2 * cos_l
+            sigma = np.arctan2(sin_s, cos_s)
+            sin_alpha = np.where(sin_s == 0, 0.0, cosU1 * cosU2 * sin_l / sin_s)
+            cos2alpha = 1 - sin_alpha**2
+            ## cos2alpha is 0 on the equator
+            cos2sm = np.where(cos2alpha == 0, 0.0, cos_s - 2 * sinU1 * sinU2 / cos2alpha)
+            C = utm.f / 16 * cos2alpha * (4 + utm.f * (4 - 3 * cos2alpha))
+            previous = lam
+            lam = L + (1 - C) * utm.f * sin_alpha * (
+                sigma + C * sin_s * (cos2sm + C * cos_s * (-1 + 2 * cos2sm**2)))
+            done = np.abs(lam - previous) <= VINCENTY_TOLERANCE
+            if np.all(done | np.isnan(lam)):
+                break
+        A, B = _AB(cos2alpha)
+        s = _b * A * (sigma - _delta_sigma(B, sin_s, cos_s, cos2sm))
+        sin_l, cos_l = np.sin(lam), np.cos(lam)
+        az1 = np.degrees(np.arctan2(cosU2 * sin_l, cosU1 * sinU2 - sinU1 * cosU2 * cos_l))
+        az2 = np.degrees(np.arctan2(cosU1 * sin_l, -sinU1 * cosU2 + cosU1 * sinU2 * cos_l))
+    s = np.where(done, s, np.nan)
+    return s, az1, az2
+
+#----------------------------------------------------------------------------
+#                               Intersection
+#----------------------------------------------------------------------------
+
+def _unit(lat, lon):
+    phi = np.radians(lat)
+    lam = np.radians(lon)
+    return np.stack([np.cos(phi) * np.cos(lam), np.cos(phi) * np.sin(lam), np.sin(phi)], axis=-1)
+
+
+def _heading(lat, lon, az):
+    '''Unit vectors pointing along azimuth az at points of the sphere.'''
+    phi = np.radians(lat)
+    lam = np.radians(lon)
+    alpha = np.radians(az)
+    east = np.stack([-np.sin(lam), np.cos(lam), np.zeros_like(lam)], axis=-1)
+    north = np.stack([-np.sin(phi) * np.cos(lam), -np.sin(phi) * np.sin(lam), np.cos(phi)], axis=-1)
+    return east * np.sin(alpha)[..., None] + north * np.cos(alpha)[..., None]
+
+
+def _guess(lat1, lon1, az1, lat2, lon2, az2):
+    '''
+    Distances s1, s2 to the crossing of the two great circles (straight
+    lines of the gnomonic projection), negative behind the point; the
+    crossing nearer to the two points is taken.
+    '''
+    P1, P2 = _unit(lat1, lon1), _unit(lat2, lon2)
+    D1, D2 = _heading(lat1, lon1, az1), _heading(lat2, lon2, az2)
+    X = np.cross(np.cross(P1, D1), np.cross(P2, D2))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        X /= np.linalg.norm(X, axis=-1)[..., None]
+    X *= np.where(((P1 + P2) * X).sum(axis=-1) < 0, -1.0, 1.0)[..., None]
+    radius = utm.a * (1 - utm.f / 3)
+    s1 = radius * np.arctan2((X * D1).sum(axis=-1), (X * P1).sum(axis=-1))
+    s2 = radius * np.arctan2((X * D2).sum(axis=-1), (X * P2).sum(axis=-1))
+    return s1, s2
+
+
+def intersect(lat1, lon1, az1, lat2, lon2, az2, tolerance=TOLERANCE, max_iter=MAX_ITER,
+              limit=np.inf):
+    '''
+    Intersect the geodesics from (lat1, lon1) at azimuth az1 and from
+    (lat2, lon2) at az2 (arrays, degrees). Returns lat, lon of the
+    crossing, the distances s1, s2 (meters, negative behind the start)
+    and a bool mask of the rows that converged; the others are NaN.
+    Rows whose crossing gets farther than limit meters from either point
+    (nearly parallel lines) are given up.
+    '''
+    lat1, lon1, az1, lat2, lon2, az2, limit = np.broadcast_arrays(
+        *(np.asarray(v, dtype=np.float64) for v in (lat1, lon1, az1, lat2, lon2, az2, limit)))
+    shape = lat1.shape
+    lat1, lon1, az1, lat2, lon2, az2, limit = (v.ravel() for v in
+                                               (lat1, lon1, az1, lat2, lon2, az2, limit))
+    s1, s2 = _guess(lat1, lon1, az1, lat2, lon2, az2)
+    lat = np.full(len(s1), np.nan)
+    lon = np.full(len(s1), np.nan)
+    converged = np.zeros(len(s1), dtype=bool)
+
+    # Newton steps on the rows that have not converged yet
+    ## The constants of both geodesics are computed once
+    line1 = _line(lat1, az1)
+    line2 = _line(lat2, az2)
+    with np.errstate(invalid="ignore"):
+        rows = np.nonzero((np.abs(s1) <= limit) & (np.abs(s2) <= limit))[0]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for _ in range(max_iter):
+            if not len(rows):
+                break
+            la1, lo1, b1 = _along([v[rows] for v in line1], lon1[rows], s1[rows])
+            la2, lo2, b2 = _along([v[rows] for v in line2], lon2[rows], s2[rows])
+            ## Offset of the two points (meters east, north) from the radii of curvature
+            phi = np.radians((la1 + la2) / 2)
+            w = 1 - _e2 * np.sin(phi)**2
+            N = utm.a / np.sqrt(w)
+            M = N * (1 - _e2) / w
+            dE = np.radians((lo2 - lo1 + 180) % 360 - 180) * N * np.cos(phi)
+            dN = np.radians(la2 - la1) * M
+            ## Solve ds1 * t1 - ds2 * t2 = offset for the steps along both lines
+            t1x, t1y = np.sin(np.radians(b1)), np.cos(np.radians(b1))
+            t2x, t2y = np.sin(np.radians(b2)), np.cos(np.radians(b2))
+            det = t2x * t1y - t1x * t2y
+            ds1 = (t2x * dN - t2y * dE) / det
+            ds2 = (t1x * dN - t1y * dE) / det
+            s1[rows] += ds1
+            s2[rows] += ds2
+            ## Done when the two points meet (the steps of nearly parallel
+            ## lines stay above the tolerance from rounding alone) or stop moving
+            done = (np.hypot(dE, dN) <= tolerance) | (np.abs(ds1) + np.abs(ds2) <= tolerance)
+            lat[rows[done]] = la1[done]
+            lon[rows[done]] = lo1[done]
+            converged[rows[done]] = True
+            rows = rows[~done & (np.abs(s1[rows]) <= limit[rows]) & (np.abs(s2[rows]) <= limit[rows])]
+    ## The points of the last step are within the tolerance of the crossing
+    s1 = np.where(converged, s1, np.nan)
+    s2 = np.where(converged, s2, np.nan)
+    return (lat.reshape(shape), lon.reshape(shape), s1.reshape(shape), s2.reshape(shape),
+            converged.reshape(shape))
+
+
+def triangulate_geodesic(lat1, lon1, az1, lat2, lon2, az2, lat3, lon3, az3, dist,
+                         tolerance=TOLERANCE, max_iter=MAX_ITER):
+    '''
+    Triangulate many fixes as batch.triangulate_batch does, with the
+    observation lines intersected as geodesics dist meters long. The
+    incircle is found in the local plane of the triangle; Xin_UTM, Yin_UTM
+    are the incenter in the UTM zone of the average position. Returns a
+    batch.Batch.
+    '''
+    obs = [np.broadcast_arrays(*(np.asarray(v, dtype=np.float64) for v in o))
+           for o in ((lat1, lon1, az1), (lat2, lon2, az2), (lat3, lon3, az3))]
+    dist = np.asarray(dist, dtype=np.float64)
+
+    # Intersect every pair of geodesics within dist of both observation points
+    points = []
+    for i, j in PAIRS:
+        lat, lon, s1, s2, converged = intersect(*(obs[i-1] + obs[j-1]), tolerance=tolerance,
+                                                max_iter=max_iter, limit=2 * dist)
+        with np.errstate(invalid="ignore"):
+            ok = converged & (s1 >= 0) & (s1 <= dist) & (s2 >= 0) & (s2 <= dist)
+        points.append((np.where(ok, lat, np.nan), np.where(ok, lon, np.nan), ok))
+    ok = np.stack([p[2] for p in points], axis=-1)
+    valid = ok.all(axis=-1)
+
+    # Incircle in the local plane (meters east and north) of the first point
+    lat0, lon0 = points[0][0], points[0][1]
+    phi = np.radians(lat0)
+    w = 1 - _e2 * np.sin(phi)**2
+    N = utm.a / np.sqrt(w)
+    M = N * (1 - _e2) / w
+    XY = [(np.radians((lon - lon0 + 180) % 360 - 180) * N * np.cos(phi), np.radians(lat - lat0) * M)
+          for lat, lon, _ in points]
+    (X1, Y1), (X2, Y2), (X3, Y3) = XY
+    E, Nn, R = incircle(X1, Y1, X2, Y2, X3, Y3)
+    Yin = lat0 + np.degrees(Nn / M)
+    Xin = (lon0 + np.degrees(E / (N * np.cos(phi))) + 180) % 360 - 180
+
+    # The incenter in the UTM zone of the average position, as the tool does
+    avgLat = (obs[0][0] + obs[1][0] + obs[2][0]) / 3
+    avgLon = (obs[0][1] + obs[1][1] + obs[2][1]) / 3
+    zone, north = tmerc.zone(avgLat, avgLon)
+    Xin_UTM, Yin_UTM, _, _ = tmerc.forward(Yin, Xin, zone, north)
+    return Batch(*(np.stack([lon, lat], axis=-1) for lat, lon, _ in points), ok, valid,
+                 Xin, Yin, R, Xin_UTM, Yin_UTM, zone, north)
+
+#----------------------------------------------------------------------------
+#                             Accuracy polygons
+#----------------------------------------------------------------------------
+
+@functools.lru_cache(maxsize=None)
+def template(vertices=VERTICES):
+    '''
+    Unit circle of a closed ring of vertices: the angles (degrees
+    clockwise from north) and their sin and cos, vertices + 1 of each with
+    the first repeated at the end. Cached, the arrays are read-only.
+    '''
+    angle = np.linspace(0.0, 360.0, vertices + 1)
+    angle[-1] = 0.0
+    ring = (angle, np.sin(np.radians(angle)), np.cos(np.radians(angle)))
+    for a in ring:
+        a.flags.writeable = False
+    return ring
+
+
+def _ring(lat, lon, az, s):
+    '''Vertices at azimuths az and distances s ((n, m)) from the centers.'''
+    lat = np.asarray(lat, dtype=np.float64)[..., None]
+    lon = np.asarray(lon, dtype=np.float64)[..., None]
+    lat2, lon2, _ = direct(lat, lon, az, s)
+    ## Keep rings across the antimeridian in one piece
+    return lat2, lon + (lon2 - lon + 180) % 360 - 180
+
+
+def circles(lat, lon, radius, vertices=VERTICES):
+    '''
+    Geodesic circles of radius meters around (lat, lon) (arrays of n
+    fixes): returns lat, lon of closed rings, (n, vertices + 1) arrays.
+    '''
+    angle, _, _ = template(vertices)
+    return _ring(lat, lon, angle, np.asarray(radius, dtype=np.float64)[..., None])
+
+
+def ellipses(lat, lon, major, minor, orientation, vertices=VERTICES):
+    '''
+    Error ellipses around (lat, lon) with semi-axes major, minor (meters)
+    and the azimuth of the major axis orientation (degrees), as
+    RemLocXY.montecarlo gives: every vertex of the template is scaled
+    onto the ellipse in the local plane and reached along a geodesic.
+    Returns lat, lon of closed rings, (n, vertices + 1) arrays.
+    '''
+    _, sin, cos = template(vertices)
+    a = np.asarray(major, dtype=np.float64)[..., None]
+    b = np.asarray(minor, dtype=np.float64)[..., None]
+    theta = np.radians(np.asarray(orientation, dtype=np.float64))[..., None]
+    E = a * cos * np.sin(theta) + b * sin * np.cos(theta)
+    N = a * cos * np.cos(theta) - b * sin * np.sin(theta)
+    return _ring(lat, lon, np.degrees(np.arctan2(E, N)), np.hypot(E, N))
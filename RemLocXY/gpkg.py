@@ -0,0 +1,314 @@
+'''
+GeoPackage output of many fixes.
+
+The tool writes every run to several shapefiles (ObservationPoints,
+ObservationLines, ObjectLocation, Accuracy), a txt-file and an Excel
+table. For batch runs GeoPackage puts the same four layers of all fixes
+into one SQLite file, written with Python's sqlite3 only (no arcpy, GDAL
+or other packages):
+
+    with GeoPackage("fixes.gpkg") as gpkg:
+        gpkg.add(values)        # (n, 10) lat1 ... dist array, any number of times
+
+The features are inserted with executemany in one transaction and the
+R-tree spatial index of every layer is filled as the rows go in (SQLite
+takes as long to fill it from the finished table, and this keeps no
+copy of the extents in memory); the index triggers and the layer extents
+are added when the file is closed.
+
+All layers are in WGS84 (EPSG:4326). Lines run from the observation point
+along the azimuth for dist meters, straight on the UTM grid the fix is
+triangulated on; the accuracy circle is the geodesic circle of radius r
+around the location (RemLocXY.geodesic.circles, all fixes of a batch at
+once), or the error ellipse if one is given.
+'''
+
+import os
+import sqlite3
+import time
+
+import numpy as np
+
+from RemLocXY import batch, geodesic, tmerc
+from RemLocXY.batch import FIELDS_IN
+from RemLocXY.geodesic import VERTICES
+
+SRS_ID = 4326
+
+WGS84_WKT = ('GEOGCS["WGS 84",DATUM["WGS_1984",SPHEROID["WGS 84",6378137,298.257223563,'
+             'AUTHORITY["EPSG","7030"]],AUTHORITY["EPSG","6326"]],PRIMEM["Greenwich",0,'
+             'AUTHORITY["EPSG","8901"]],UNIT["degree",0.0174532925199433,'
+             'AUTHORITY["EPSG","9122"]],AUTHORITY["EPSG","4326"]]')
+
+# Layer name -> (geometry type, attribute columns)
+LAYERS = {"ObservationPoints": ("POINT", [("fix", "INTEGER"), ("obs", "INTEGER"), ("lat", "REAL"),
+                                          ("lon", "REAL"), ("az", "REAL")]),
+          "ObservationLines": ("LINESTRING", [("fix", "INTEGER"), ("obs", "INTEGER"),
+                                              ("az", "REAL"), ("dist", "REAL")]),
+          "ObjectLocation": ("POINT", [("fix", "INTEGER")] + [(name, "REAL") for name in FIELDS_IN] +
+                                      [("Xin", "REAL"), ("Yin", "REAL"), ("r", "REAL")]),
+          "Accuracy": ("POLYGON", [("fix", "INTEGER"), ("r", "REAL")])}
+
+#----------------------------------------------------------------------------
+#                          Geometry blobs
+#----------------------------------------------------------------------------
+
+def _header(flags):
+    return [("magic", "S2"), ("version", "u1"), ("flags", "u1"), ("srs_id", "<i4")] + \
+        ([("envelope", "<f8", (4,))] if flags & 2 else [])
+
+
+def _blobs(records):
+    '''Split a packed structured array into one bytes object per row.'''
+    data = records.tobytes()
+    size = records.dtype.itemsize
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def _fill_header(records, envelope=None):
+    records["magic"] = b"GP"
+    records["version"] = 0
+    records["srs_id"] = SRS_ID
+    records["order"] = 1
+    if envelope is not None:
+        records["flags"] = 3   # little endian, xy envelope
+        records["envelope"] = envelope
+    else:
+        records["flags"] = 1   # little endian, no envelope
+
+
+def points(x, y):
+    '''GeoPackage blobs of points.'''
+    dt = np.dtype(_header(1) + [("order", "u1"), ("type", "<u4"), ("xy", "<f8", (2,))])
+    records = np.zeros(len(x), dtype=dt)
+    _fill_header(records)
+    records["type"] = 1
+    records["xy"] = np.stack([x, y], axis=-1)
+    return _blobs(records)
+
+
+def _envelope(x, y):
+    return np.stack([x.min(axis=-1), x.max(axis=-1), y.min(axis=-1), y.max(axis=-1)], axis=-1)
+
+
+def linestrings(x, y):
+    '''GeoPackage blobs of lines from (n, m) vertex arrays.'''
+    m = x.shape[-1]
+    dt = np.dtype(_header(3) + [("order", "u1"), ("type", "<u4"), ("count", "<u4"),
+                                ("xy", "<f8", (m, 2))])
+    records = np.zeros(len(x), dtype=dt)
+    _fill_header(records, _envelope(x, y))
+    records["type"] = 2
+    records["count"] = m
+    records["xy"] = np.stack([x, y], axis=-1)
+    return _blobs(records)
+
+
+def polygons(x, y):
+    '''GeoPackage blobs of one-ring polygons from closed (n, m) vertex arrays.'''
+    m = x.shape[-1]
+    dt = np.dtype(_header(3) + [("order", "u1"), ("type", "<u4"), ("rings", "<u4"),
+                                ("count", "<u4"), ("xy", "<f8", (m, 2))])
+    records = np.zeros(len(x), dtype=dt)
+    _fill_header(records, _envelope(x, y))
+    records["type"] = 3
+    records["rings"] = 1
+    records["count"] = m
+    records["xy"] = np.stack([x, y], axis=-1)
+    return _blobs(records)
+
+#----------------------------------------------------------------------------
+#                              GeoPackage
+#----------------------------------------------------------------------------
+
+class GeoPackage(object):
+    '''
+    A GeoPackage file being written; path is replaced if it exists.
+    Call add for every batch of fixes and close (or use a with block).
+    '''
+
+    def __init__(self, path, vertices=VERTICES):
+        if os.path.exists(path):
+            os.remove(path)
+        self.path = path
+        self.fixes = 0
+        self.counts = dict.fromkeys(LAYERS, 0)
+        self.extent = {name: [np.inf, np.inf, -np.inf, -np.inf] for name in LAYERS}
+        self.vertices = vertices
+
+        self.db = sqlite3.connect(path, isolation_level=None)
+        db = self.db
+        db.execute("PRAGMA application_id = 1196444487")   # "GPKG"
+        db.execute("PRAGMA user_version = 10200")
+        db.execute("PRAGMA journal_mode = OFF")
+        db.execute("PRAGMA synchronous = OFF")
+        db.execute("BEGIN")
+        db.execute("CREATE TABLE gpkg_spatial_ref_sys (srs_name TEXT NOT NULL, srs_id INTEGER "
+                   "PRIMARY KEY, organization TEXT NOT NULL, organization_coordsys_id INTEGER "
+                   "NOT NULL, definition TEXT NOT NULL, description TEXT)")
+        db.executemany("INSERT INTO gpkg_spatial_ref_sys VALUES (?, ?, ?, ?, ?, ?)",
+                       [("Undefined cartesian SRS", -1, "NONE", -1, "undefined", None),
+                        ("Undefined geographic SRS", 0, "NONE", 0, "undefined", None),
+                        ("WGS 84 geodetic", SRS_ID, "EPSG", SRS_ID, WGS84_WKT, None)])
+        db.execute("CREATE TABLE gpkg_contents (table_name TEXT NOT NULL PRIMARY KEY, data_type "
+                   "TEXT NOT NULL, identifier TEXT UNIQUE, description TEXT DEFAULT '', "
+                   "last_change DATETIME NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ','now')), "
+                   "min_x DOUBLE, min_y DOUBLE, max_x DOUBLE, max_y DOUBLE, srs_id INTEGER, "
+                   "CONSTRAINT fk_gc_r_srs_id FOREIGN KEY (srs_id) REFERENCES "
+                   "gpkg_spatial_ref_sys(srs_id))")
+        db.execute("CREATE TABLE gpkg_geometry_columns (table_name TEXT NOT NULL, column_name "
+                   "TEXT NOT NULL, geometry_type_name TEXT NOT NULL, srs_id INTEGER NOT NULL, "
+                   "z TINYINT NOT NULL, m TINYINT NOT NULL, CONSTRAINT pk_geom_cols PRIMARY KEY "
+                   "(table_name, column_name))")
+        db.execute("CREATE TABLE gpkg_extensions (table_name TEXT, column_name TEXT, "
+                   "extension_name TEXT NOT NULL, definition TEXT NOT NULL, scope TEXT NOT NULL, "
+                   "CONSTRAINT ge_tce UNIQUE (table_name, column_name, extension_name))")
+        self._insert = {}
+        for name, (geometry, fields) in LAYERS.items():
+            db.execute("CREATE TABLE \"%s\" (fid INTEGER PRIMARY KEY AUTOINCREMENT, geom %s, %s)"
+                       % (name, geometry, ", ".join("\"%s\" %s" % f for f in fields)))
+            db.execute("INSERT INTO gpkg_contents (table_name, data_type, identifier, srs_id) "
+                       "VALUES (?, 'features', ?, ?)", (name, name, SRS_ID))
+            db.execute("INSERT INTO gpkg_geometry_columns VALUES (?, 'geom', ?, ?, 0, 0)",
+                       (name, geometry, SRS_ID))
+            db.execute("INSERT INTO gpkg_extensions VALUES (?, 'geom', 'gpkg_rtree_index', "
+                       "'http://www.geopackage.org/spec120/#extension_rtree', 'write-only')", (name,))
+            db.execute("CREATE VIRTUAL TABLE \"rtree_%s_geom\" USING rtree(id, minx, maxx, miny, maxy)"
+                       % name)
+            self._insert[name] = "INSERT INTO \"%s\" VALUES (?, ?%s)" % (name, ", ?" * len(fields))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, kind, value, traceback):
+        if kind is None:
+            self.close()
+        else:
+            ## Without a journal a rolled back file is not usable: remove it
+            self.db.close()
+            os.remove(self.path)
+
+    def _write(self, name, blobs, minx, maxx, miny, maxy, *columns):
+        '''
+        Insert features and their index entries; columns are attribute
+        arrays. Features whose envelope is not finite are not indexed and
+        leave the layer extent alone.
+        '''
+        n = len(blobs)
+        if not n:
+            return
+        fid = np.arange(self.counts[name] + 1, self.counts[name] + n + 1)
+        self.counts[name] += n
+        rows = zip(fid.tolist(), blobs, *(np.asarray(c).tolist() for c in columns))
+        self.db.executemany(self._insert[name], rows)
+        finite = np.isfinite(minx) & np.isfinite(maxx) & np.isfinite(miny) & np.isfinite(maxy)
+        if not finite.all():
+            fid, minx, maxx, miny, maxy = (v[finite] for v in (fid, minx, maxx, miny, maxy))
+            if not len(fid):
+                return
+        self.db.executemany("INSERT INTO \"rtree_%s_geom\" VALUES (?, ?, ?, ?, ?)" % name,
+                            zip(fid.tolist(), minx.tolist(), maxx.tolist(), miny.tolist(),
+                                maxy.tolist()))
+        e = self.extent[name]
+        e[:] = [min(e[0], minx.min()), min(e[1], miny.min()), max(e[2], maxx.max()),
+                max(e[3], maxy.max())]
+
+    def add(self, values, result=None, ellipse=None):
+        '''
+        Add fixes: values is an (n, 10) array of lat1 ... dist and result
+        anything with valid, Xin, Yin and R per fix (a Batch by default, as
+        batch.triangulate_batch gives). With ellipse, anything with major,
+        minor and orientation per fix (a montecarlo.Ellipse), the accuracy
+        polygons are the error ellipses. Returns the number of fixes added.
+        '''
+        values = np.atleast_2d(np.asarray(values, dtype=np.float64))
+        if result is None:
+            result = batch.triangulate_batch(*values.T)
+        n = len(values)
+        fix = np.arange(self.fixes + 1, self.fixes + n + 1)
+        self.fixes += n
+        P, zone, north = batch.stations(*values.T)
+
+        # Observation points and lines, in the order of the tool's Merge
+        for i in range(3):
+            lat, lon, az, dist = values[:, 3 * i], values[:, 3 * i + 1], values[:, 3 * i + 2], values[:, 9]
+            ok = np.isfinite(lat) & np.isfinite(lon)
+            self._write("ObservationPoints", points(lon[ok], lat[ok]), lon[ok], lon[ok], lat[ok],
+                        lat[ok], fix[ok], np.full(ok.sum(), i + 1), lat[ok], lon[ok], az[ok])
+        for i in range(3):
+            X, Y, theta, length = P[i]
+            lat_end, lon_end = tmerc.inverse(X + length * np.sin(np.radians(theta)),
+                                             Y + length * np.cos(np.radians(theta)), zone, north)
+            x = np.stack([values[:, 3 * i + 1], lon_end], axis=-1)
+            y = np.stack([values[:, 3 * i], lat_end], axis=-1)
+            ok = np.isfinite(x).all(axis=-1) & np.isfinite(y).all(axis=-1)
+            x = x[ok]
+            y = y[ok]
+            self._write("ObservationLines", linestrings(x, y), x.min(axis=-1), x.max(axis=-1),
+                        y.min(axis=-1), y.max(axis=-1), fix[ok], np.full(ok.sum(), i + 1),
+                        values[ok, 3 * i + 2], values[ok, 9])
+
+        # Location and accuracy polygon of the valid fixes
+        ok = np.asarray(result.valid, dtype=bool) & np.isfinite(result.Xin) & np.isfinite(result.Yin)
+        Xin = np.asarray(result.Xin, dtype=np.float64)[ok]
+        Yin = np.asarray(result.Yin, dtype=np.float64)[ok]
+        R = np.asarray(result.R, dtype=np.float64)[ok]
+        self._write("ObjectLocation", points(Xin, Yin), Xin, Xin, Yin, Yin, fix[ok],
+                    *(list(values[ok].T) + [Xin, Yin, R]))
+        ## No polygon where the error (e.g. of lsq) is not finite
+        with np.errstate(invalid="ignore"):
+            area = np.isfinite(R) & (R >= 0)
+        if ellipse is None:
+            lat, lon = geodesic.circles(Yin[area], Xin[area], R[area], self.vertices)
+        else:
+            axes = [np.asarray(v, dtype=np.float64)[ok] for v in
+                    (ellipse.major, ellipse.minor, ellipse.orientation)]
+            area &= np.logical_and.reduce([np.isfinite(v) for v in axes])
+            lat, lon = geodesic.ellipses(Yin[area], Xin[area], *(v[area] for v in axes),
+                                         vertices=self.vertices)
+        self._write("Accuracy", polygons(lon, lat), lon.min(axis=-1), lon.max(axis=-1),
+                    lat.min(axis=-1), lat.max(axis=-1), fix[ok][area], R[area])
+        return n
+
+    def close(self):
+        '''Add the index triggers and layer extents and commit.'''
+        db = self.db
+        now = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        for name in LAYERS:
+            e = self.extent[name]
+            extent = e if np.isfinite(e).all() else [None] * 4
+            db.execute("UPDATE gpkg_contents SET min_x = ?, min_y = ?, max_x = ?, max_y = ?, "
+                       "last_change = ? WHERE table_name = ?",
+                       [None if v is None else float(v) for v in extent] + [now, name])
+            for trigger in _rtree_triggers(name):
+                db.execute(trigger)
+        db.execute("COMMIT")
+        db.close()
+
+
+def _rtree_triggers(t):
+    '''The R-tree maintenance triggers of the GeoPackage 1.2 rtree extension.'''
+    r = "rtree_%s_geom" % t
+    insert = ("INSERT OR REPLACE INTO \"{r}\" VALUES (NEW.fid, ST_MinX(NEW.geom), ST_MaxX(NEW.geom), "
+              "ST_MinY(NEW.geom), ST_MaxY(NEW.geom))")
+    return [s.format(t=t, r=r) for s in (
+        "CREATE TRIGGER \"{r}_insert\" AFTER INSERT ON \"{t}\" WHEN (NEW.geom NOT NULL AND NOT "
+        "ST_IsEmpty(NEW.geom)) BEGIN " + insert + "; END",
+        "CREATE TRIGGER \"{r}_update1\" AFTER UPDATE OF geom ON \"{t}\" WHEN OLD.fid = NEW.fid AND "
+        "(NEW.geom NOTNULL AND NOT ST_IsEmpty(NEW.geom)) BEGIN " + insert + "; END",
+        "CREATE TRIGGER \"{r}_update2\" AFTER UPDATE OF geom ON \"{t}\" WHEN OLD.fid = NEW.fid AND "
+        "(NEW.geom ISNULL OR ST_IsEmpty(NEW.geom)) BEGIN DELETE FROM \"{r}\" WHERE id = OLD.fid; END",
+        "CREATE TRIGGER \"{r}_update3\" AFTER UPDATE OF geom ON \"{t}\" WHEN OLD.fid != NEW.fid AND "
+        "(NEW.geom NOTNULL AND NOT ST_IsEmpty(NEW.geom)) BEGIN DELETE FROM \"{r}\" WHERE id = "
+        "OLD.fid; " + insert + "; END",
+        "CREATE TRIGGER \"{r}_update4\" AFTER UPDATE ON \"{t}\" WHEN OLD.fid != NEW.fid AND "
+        "(NEW.geom ISNULL OR ST_IsEmpty(NEW.geom)) BEGIN DELETE FROM \"{r}\" WHERE id IN "
+        "(OLD.fid, NEW.fid); END",
+        "CREATE TRIGGER \"{r}_delete\" AFTER DELETE ON \"{t}\" WHEN old.geom NOT NULL BEGIN "
+        "DELETE FROM \"{r}\" WHERE id = OLD.fid; END")]
+
+
+def write_gpkg(path, values, result=None, ellipse=None):
+    '''Write fixes (an (n, 10) lat1 ... dist array) to a new GeoPackage.'''
+    with GeoPackage(path) as gpkg:
+        return gpkg.add(values, result, ellipse)
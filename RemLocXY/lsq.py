@@ -0,0 +1,195 @@
+'''
+Location estimate from any number of bearings.
+
+The triangle of the tool needs exactly three observation points. With
+N >= 2 bearings per fix the location is found here by iteratively
+reweighted least squares (Lenth 1981): every bearing is a line through its
+observation point, the location minimizes the weighted squared distances
+to the lines, and the weights 1/d^2 (d = distance from the observation
+point to the current estimate) turn those distances into bearing errors,
+which gives the maximum likelihood estimate for small bearing errors. With
+robust=True bearings far off the others are down-weighted with Andrews'
+wave function, as in Lenth's robust estimator.
+
+All fixes are solved at once: the inputs are (fixes, N) arrays, padded
+with NaN where a fix has fewer bearings. The covariance of the location
+replaces the incircle radius R as the error of the measurements.
+'''
+
+from collections import namedtuple
+
+import numpy as np
+
+from RemLocXY import tmerc
+
+# Iterations stop when the estimate moves less than TOLERANCE meters ...
+TOLERANCE = 0.01
+# ... or after MAXITER iterations
+MAXITER = 25
+# The robust scale of the bearing errors is updated in the first SCALE_ITER
+# iterations only, then kept fixed so the iterations settle
+SCALE_ITER = 3
+# Tuning constant of Andrews' wave function (in bearing standard deviations)
+ANDREWS_C = 1.5
+
+Estimate = namedtuple("Estimate", ["Xin", "Yin", "Xin_UTM", "Yin_UTM", "cov", "error", "sigma",
+                                   "iterations", "converged", "valid", "zone", "north"])
+Estimate.__doc__ = '''
+Result of estimate; every member has one row per fix.
+
+Xin, Yin          location in WGS84 (lon, lat)
+Xin_UTM, Yin_UTM  location in the UTM zone of the fix
+cov               (fixes, 2, 2) covariance of Xin_UTM, Yin_UTM in m^2
+error             distance root mean square error sqrt(cov_xx + cov_yy) in
+                  meters, the counterpart of the incircle radius R
+sigma             bearing standard deviation used for cov (degrees)
+iterations        iterations run; converged: moved less than TOLERANCE
+valid             converged with a finite location and error, in front of
+                  (bearing residual below 90 degrees) and within dist of
+                  every observation point; without sigma a fix needs more
+                  than two bearings for its error
+zone, north       UTM zone of the fix
+'''
+
+
+def _wrap(angle):
+    '''Wrap angles in radians to [-pi, pi).'''
+    return (angle + np.pi) % (2 * np.pi) - np.pi
+
+
+def _scale(r, used, count):
+    '''
+    Robust standard deviation of the bearing residuals r (radians) of each
+    fix from their median absolute value; inf for fixes with three bearings
+    or less, whose residuals cannot tell an outlier.
+    '''
+    a = np.sort(np.where(used, np.abs(r), np.inf), axis=-1)
+    rows = np.arange(len(a))
+    half = np.maximum(count - 1, 0)
+    median = (a[rows, half // 2] + a[rows, (half + 1) // 2]) / 2
+    k = 1.4826 * median[:, None]
+    return np.where((count[:, None] > 3) & (k > 0), k, np.inf)
+
+
+def _solve(X, Y, c, s, w):
+    '''
+    Weighted least squares point closest to the lines through (X, Y) with
+    normals (c, -s). Returns x, y and the 2x2 normal matrix (a, b, d).
+    '''
+    wc = w * c
+    ws = w * s
+    a = np.sum(wc * c, axis=-1)
+    b = -np.sum(wc * s, axis=-1)
+    d = np.sum(ws * s, axis=-1)
+    h = c * X - s * Y
+    u = np.sum(wc * h, axis=-1)
+    v = -np.sum(ws * h, axis=-1)
+    det = a * d - b * b
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x = (d * u - b * v) / det
+        y = (a * v - b * u) / det
+    return x, y, (a, b, d)
+
+
+def estimate(lat, lon, az, dist=None, sigma=None, robust=True,
+             tolerance=TOLERANCE, maxiter=MAXITER):
+    '''
+    Estimate the location of every fix from its bearings.
+
+    lat, lon and az are (fixes, N) arrays of the observation points (WGS84
+    decimal degrees) and azimuths, NaN where a fix has fewer than N
+    bearings. dist (meters, scalar or per fix) limits the valid locations as
+    the length of the observation lines does in the tool. sigma is the
+    bearing standard deviation in degrees; if None it is estimated from the
+    residuals of every fix with more than two bearings. Returns an Estimate.
+    '''
+    lat = np.atleast_2d(np.asarray(lat, dtype=np.float64))
+    lon = np.atleast_2d(np.asarray(lon, dtype=np.float64))
+    az = np.atleast_2d(np.asarray(az, dtype=np.float64))
+    used = np.isfinite(lat) & np.isfinite(lon) & np.isfinite(az)
+    count = used.sum(axis=-1)
+
+    # Project every fix into the UTM zone of its average observation point
+    with np.errstate(divide="ignore", invalid="ignore"):
+        avgLat = np.where(used, lat, 0.0).sum(axis=-1) / count
+        avgLon = np.where(used, lon, 0.0).sum(axis=-1) / count
+    zone, north = tmerc.zone(avgLat, avgLon)
+    X, Y, gamma, _ = tmerc.forward(lat, lon, zone[:, None], north[:, None])
+
+    ## Work relative to the mean observation point to keep the precision
+    with np.errstate(divide="ignore", invalid="ignore"):
+        X0 = np.where(used, X, 0.0).sum(axis=-1, keepdims=True) / count[:, None]
+        Y0 = np.where(used, Y, 0.0).sum(axis=-1, keepdims=True) / count[:, None]
+    X = np.where(used, X - X0, 0.0)
+    Y = np.where(used, Y - Y0, 0.0)
+    theta = np.radians(np.where(used, az - gamma, 0.0))
+    c = np.cos(theta)
+    s = np.sin(theta)
+    w0 = used.astype(np.float64)
+
+    # Start from the unweighted least squares point, then iterate on the
+    # fixes that have not converged yet
+    x, y, _ = _solve(X, Y, c, s, w0)
+    converged = np.zeros(len(x), dtype=bool)
+    iterations = np.zeros(len(x), dtype=np.int64)
+    scale = np.radians(sigma) if sigma is not None else None
+    kfix = np.full(len(x), np.inf)
+    todo = np.arange(len(x))
+    for iteration in range(1, maxiter + 1):
+        Xa, Ya, ca, sa, wa = X[todo], Y[todo], c[todo], s[todo], w0[todo]
+        dx = x[todo, None] - Xa
+        dy = y[todo, None] - Ya
+        w = wa / np.maximum(dx * dx + dy * dy, 1.0)
+        if robust:
+            r = _wrap(theta[todo] - np.arctan2(dx, dy))
+            if scale is not None:
+                k = scale
+            elif iteration <= SCALE_ITER:
+                k = _scale(r, used[todo], count[todo])
+                kfix[todo] = k[:, 0]
+            else:
+                k = kfix[todo, None]
+            u = r / (ANDREWS_C * k)
+            w = w * np.where(np.abs(u) < np.pi, np.sinc(u / np.pi), 0.0)
+        xn, yn, _ = _solve(Xa, Ya, ca, sa, w)
+        shift = np.hypot(xn - x[todo], yn - y[todo])
+        x[todo] = xn
+        y[todo] = yn
+        iterations[todo] = iteration
+        done = ~(shift >= tolerance)   # converged, or no solution (NaN)
+        converged[todo[done]] = shift[done] < tolerance
+        todo = todo[~done]
+        if not len(todo):
+            break
+
+    # Covariance of the location from the bearing errors
+    dx = x[:, None] - X
+    dy = y[:, None] - Y
+    d2 = np.maximum(dx * dx + dy * dy, 1.0)
+    r = np.where(used, _wrap(theta - np.arctan2(dx, dy)), 0.0)
+    if sigma is None:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            var = np.sum(r * r, axis=-1) / (count - 2)
+    else:
+        var = np.full(len(x), np.radians(sigma)**2)
+    _, _, (a, b, d) = _solve(X, Y, c, s, w0 / d2)
+    det = a * d - b * b
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cov = np.stack([np.stack([d, -b], axis=-1), np.stack([-b, a], axis=-1)], axis=-2)
+        cov *= (var / det)[:, None, None]
+    error = np.sqrt(cov[:, 0, 0] + cov[:, 1, 1])
+
+    Xin_UTM = x + X0[:, 0]
+    Yin_UTM = y + Y0[:, 0]
+    Yin, Xin = tmerc.inverse(Xin_UTM, Yin_UTM, zone, north)
+    valid = converged & (count >= (2 if sigma is not None else 3)) & np.isfinite(Xin) & \
+        np.isfinite(Yin) & np.isfinite(error)
+    ## A bearing off by more than 90 degrees points away from the location: it is behind the observer
+    valid &= ~(np.abs(r) > np.pi / 2).any(axis=-1)
+    if dist is not None:
+        limit = np.asarray(dist, dtype=np.float64)
+        if limit.ndim:
+            limit = limit[:, None]
+        valid &= ~(used & (d2 > limit * limit)).any(axis=-1)
+    return Estimate(Xin, Yin, Xin_UTM, Yin_UTM, cov, error, np.degrees(np.sqrt(var)),
+                    iterations, converged, valid, zone, north)
@@ -0,0 +1,151 @@
+'''
+Monte Carlo error ellipse of triangulated locations.
+
+The incircle radius R only tells how well the three bearings agree. Given
+the standard deviation of a bearing, this module draws K perturbed bearing
+sets per fix, triangulates every set (intersections and incenter, as the
+tool does) and summarizes the cloud of locations as an error ellipse and a
+percentile radius. All samples of a chunk of fixes are solved in one
+NumPy computation; chunks keep the memory bounded for large K.
+'''
+
+from collections import namedtuple
+
+import numpy as np
+
+from RemLocXY import batch, tmerc
+from RemLocXY.solver import PAIRS
+
+# Samples per fix by default
+SAMPLES = 1000
+# Confidence level of the error ellipse and the percentile radius
+LEVEL = 0.95
+# Largest number of samples (fixes x K) solved at a time
+MAXSIZE = 2000000
+
+Ellipse = namedtuple("Ellipse", ["Xin", "Yin", "Xin_UTM", "Yin_UTM", "major", "minor",
+                                 "orientation", "radius", "cov", "fraction", "zone", "north"])
+Ellipse.__doc__ = '''
+Result of monte_carlo; every member has one row per fix.
+
+Xin, Yin          location (WGS84) the ellipse and radius are centered on:
+                  the incenter of the measured bearings, or the mean of the
+                  samples if the measured bearings give no triangle
+Xin_UTM, Yin_UTM  the same point in the UTM zone of the fix
+major, minor      semi-axes of the error ellipse at the confidence level
+                  (meters)
+orientation       azimuth of the major axis, degrees clockwise from true
+                  north in [0, 180)
+radius            percentile radius: the confidence level share of the
+                  sampled locations is within radius meters of Xin, Yin
+cov               (fixes, 2, 2) covariance of the sampled locations (m^2)
+fraction          share of the samples that gave a triangle
+zone, north       UTM zone of the fix
+'''
+
+
+def _row_percentile(d, q):
+    '''Percentile q (0-100) of every row of d, ignoring NaN.'''
+    count = np.isfinite(d).sum(axis=-1)
+    d = np.sort(np.where(np.isfinite(d), d, np.inf), axis=-1)
+    pos = np.maximum(count - 1, 0) * (q / 100.0)
+    lo = np.floor(pos).astype(np.int64)
+    hi = np.minimum(lo + 1, np.maximum(count - 1, 0))
+    rows = np.arange(len(d))
+    with np.errstate(invalid="ignore"):
+        value = d[rows, lo] + (d[rows, hi] - d[rows, lo]) * (pos - lo)
+    return np.where(count > 0, value, np.nan)
+
+
+def _chunk(P, sd, samples, rng):
+    '''
+    Sample one chunk of fixes; P as from batch.stations, sd a (fixes, 3)
+    array. Returns the sampled incenters, their mask and their moments.
+    '''
+    n = len(P[0][0])
+    # Perturb every bearing of every sample at once: (fixes, samples) arrays
+    S = []
+    for i, (X, Y, az, length) in enumerate(P):
+        theta = np.radians(az[:, None] + rng.standard_normal((n, samples)) * sd[:, i:i+1])
+        S.append((X[:, None], Y[:, None], np.sin(theta), np.cos(theta), length[:, None]))
+
+    XY = []
+    for i, j in PAIRS:
+        XY.append(batch.intersect_dir(*(S[i-1] + S[j-1])))
+    (X1, Y1, ok1), (X2, Y2, ok2), (X3, Y3, ok3) = XY
+    Xs, Ys, _ = batch.incircle(X1, Y1, X2, Y2, X3, Y3)
+    ok = ok1 & ok2 & ok3
+    good = ok.sum(axis=-1)
+
+    # Mean and covariance of the sampled locations
+    with np.errstate(divide="ignore", invalid="ignore"):
+        Xm = np.where(ok, Xs, 0.0).sum(axis=-1) / good
+        Ym = np.where(ok, Ys, 0.0).sum(axis=-1) / good
+        dx = np.where(ok, Xs - Xm[:, None], 0.0)
+        dy = np.where(ok, Ys - Ym[:, None], 0.0)
+        dof = np.where(good > 1, good - 1, np.nan)
+        a = (dx * dx).sum(axis=-1) / dof
+        b = (dx * dy).sum(axis=-1) / dof
+        d = (dy * dy).sum(axis=-1) / dof
+    return Xs, Ys, ok, Xm, Ym, a, b, d, good / samples
+
+
+def monte_carlo(lat1, lon1, az1, lat2, lon2, az2, lat3, lon3, az3, dist, sd,
+                samples=SAMPLES, seed=None, level=LEVEL, maxsize=MAXSIZE):
+    '''
+    Monte Carlo error ellipses of many fixes.
+
+    The first ten arguments are the lat1 ... dist columns as in
+    batch.triangulate_batch; sd is the bearing standard deviation in degrees
+    (scalar, one per fix, or a (fixes, 3) array of one per bearing). samples
+    bearing sets are drawn per fix; seed makes the draw reproducible. Returns
+    an Ellipse.
+    '''
+    ## Project the observation points once for the fix and the samples
+    P, zone, north = batch.stations(lat1, lon1, az1, lat2, lon2, az2, lat3, lon3, az3, dist)
+    fix = batch.triangulate_projected(P, zone, north)
+    P = [tuple(np.atleast_1d(v) for v in p) for p in P]
+    n = len(P[0][0])
+    sd = np.asarray(sd, dtype=np.float64)
+    if sd.ndim == 1:
+        sd = sd[:, None]
+    sd = np.broadcast_to(sd, (n, 3))
+    rng = np.random.default_rng(seed)
+    q = 100.0 * level
+
+    Xc = np.empty(n)
+    Yc = np.empty(n)
+    cov = np.empty((n, 2, 2))
+    radius = np.empty(n)
+    fraction = np.empty(n)
+    step = max(1, maxsize // samples)
+    for start in range(0, n, step):
+        part = slice(start, start + step)
+        Xs, Ys, ok, Xm, Ym, a, b, d, frac = _chunk([tuple(v[part] for v in p) for p in P],
+                                                   sd[part], samples, rng)
+        ## Center on the incenter of the measured bearings where there is one
+        Xi = np.atleast_1d(fix.Xin_UTM)[part]
+        Yi = np.atleast_1d(fix.Yin_UTM)[part]
+        has = np.isfinite(Xi)
+        Xc[part] = np.where(has, Xi, Xm)
+        Yc[part] = np.where(has, Yi, Ym)
+        dist_s = np.where(ok, np.hypot(Xs - Xc[part, None], Ys - Yc[part, None]), np.nan)
+        radius[part] = _row_percentile(dist_s, q)
+        cov[part] = np.stack([np.stack([a, b], axis=-1), np.stack([b, d], axis=-1)], axis=-2)
+        fraction[part] = frac
+
+    # Error ellipse from the eigenvalues of the covariance
+    a = cov[:, 0, 0]
+    b = cov[:, 0, 1]
+    d = cov[:, 1, 1]
+    half = np.sqrt(((a - d) / 2)**2 + b * b)
+    scale = -2.0 * np.log(1.0 - level)   # chi-square quantile, 2 degrees of freedom
+    major = np.sqrt(np.maximum((a + d) / 2 + half, 0.0) * scale)
+    minor = np.sqrt(np.maximum((a + d) / 2 - half, 0.0) * scale)
+    ## Angle of the major axis from east, then as an azimuth from true north
+    angle = np.degrees(0.5 * np.arctan2(2 * b, a - d))
+    Yin, Xin = tmerc.inverse(Xc, Yc, zone, north)
+    _, _, gamma, _ = tmerc.forward(Yin, Xin, zone, north)
+    orientation = (90.0 - angle + gamma) % 180.0
+    return Ellipse(Xin, Yin, Xc, Yc, major, minor, orientation, radius, cov, fraction,
+                   np.atleast_1d(zone), np.atleast_1d(north))
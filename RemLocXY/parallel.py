@@ -0,0 +1,121 @@
+'''
+Multi-core batch triangulation.
+
+The fixes are cut into chunks that are triangulated in a pool of worker
+processes (RemLocXY.batch for arrays, RemLocXY.stream for CSV files) and
+the results are merged back in input order. Inputs that fit in one chunk,
+or a pool of one worker, are triangulated in the calling process.
+'''
+
+import csv
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from RemLocXY import stream
+from RemLocXY.batch import Batch, FIELDS_IN, triangulate_batch
+
+# Rows per chunk handed to a worker by default
+CHUNKSIZE = 50000
+
+
+def _workers(workers):
+    return workers or os.cpu_count() or 1
+
+
+def ordered(executor, fn, chunks, window):
+    '''
+    Run fn on every chunk in the executor and yield the results in input
+    order, with at most window chunks in flight so memory stays bounded.
+    '''
+    pending = deque()
+    for chunk in chunks:
+        pending.append(executor.submit(fn, *chunk))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def merge(results):
+    '''Concatenate a list of Batch results row-wise.'''
+    return Batch(*(np.concatenate(parts) for parts in zip(*results)))
+
+#----------------------------------------------------------------------------
+#                                 Arrays
+#----------------------------------------------------------------------------
+
+def triangulate_parallel(lat1, lon1, az1, lat2, lon2, az2, lat3, lon3, az3, dist,
+                         workers=None, chunksize=CHUNKSIZE):
+    '''
+    Same as batch.triangulate_batch, with the fixes spread over a pool of
+    workers processes (all cores by default) in chunks of chunksize rows.
+    '''
+    cols = np.broadcast_arrays(*(np.asarray(v, dtype=np.float64) for v in
+                                 (lat1, lon1, az1, lat2, lon2, az2, lat3, lon3, az3, dist)))
+    n = len(cols[0]) if cols[0].ndim else 1
+    workers = _workers(workers)
+    if workers == 1 or n <= chunksize:
+        return triangulate_batch(*cols)
+
+    chunks = ([c[start:start + chunksize] for c in cols] for start in range(0, n, chunksize))
+    with ProcessPoolExecutor(min(workers, -(-n // chunksize))) as executor:
+        return merge(list(ordered(executor, triangulate_batch, chunks, 2 * workers)))
+
+
+def triangulate_columns_parallel(columns, workers=None, chunksize=CHUNKSIZE):
+    '''Parallel batch.triangulate_columns.'''
+    return triangulate_parallel(*(columns[name] for name in FIELDS_IN),
+                                workers=workers, chunksize=chunksize)
+
+#----------------------------------------------------------------------------
+#                               CSV files
+#----------------------------------------------------------------------------
+
+def _solve_csv_chunk(rows, index_in, index_out, width):
+    result, _ = stream.solve_rows(rows, index_in)
+    return stream.fill_rows(rows, result, index_out, width), int(result.valid.sum())
+
+
+def triangulate_csv_parallel(src, dst, workers=None, chunksize=stream.CHUNKSIZE):
+    '''
+    Same as stream.triangulate_csv, with the chunks triangulated in a pool of
+    workers processes. Returns (number of fixes, number of valid fixes).
+    '''
+    workers = _workers(workers)
+    if workers == 1:
+        return stream.triangulate_csv(src, dst, chunksize)
+
+    total = 0
+    valid = 0
+    with open(src, newline="") as fin, open(dst, "w", newline="") as fout:
+        reader = csv.reader(fin)
+        writer = csv.writer(fout)
+        index_in, index_out, header_out = stream.columns(next(reader))
+        writer.writerow(header_out)
+        chunks = stream.read_chunks(reader, chunksize)
+
+        ## Small inputs: one chunk only, no need to start the pool
+        first = next(chunks, None)
+        second = next(chunks, None)
+        if second is None:
+            if first is not None:
+                rows, valid = _solve_csv_chunk(first, index_in, index_out, len(header_out))
+                writer.writerows(rows)
+                total = len(rows)
+            return total, valid
+
+        def tasks():
+            yield first, index_in, index_out, len(header_out)
+            yield second, index_in, index_out, len(header_out)
+            for rows in chunks:
+                yield rows, index_in, index_out, len(header_out)
+
+        with ProcessPoolExecutor(workers) as executor:
+            for rows, count in ordered(executor, _solve_csv_chunk, tasks(), 2 * workers):
+                writer.writerows(rows)
+                total += len(rows)
+                valid += count
+    return total, valid
@@ -0,0 +1,144 @@
+'''
+Geometry pre-check of fixes before they are triangulated.
+
+check classifies every fix of the lat1 ... dist columns with one reason
+code, from cheap tests on the projected observation points and bearings
+only, so bad fixes are rejected before any real work (the error models of
+RemLocXY.cli, the geoprocessing of the tool):
+
+    codes = check(lat1, lon1, az1, lat2, lon2, az2, lat3, lon3, az3, dist)
+    summary(codes)      # {"ok": 9812, "diverging": 140, ...}
+
+Reasons, the first one that applies is given:
+
+    ok              all three pairs of lines intersect within dist and form
+                    a proper triangle
+    missing         a value is missing or out of range (unknown station)
+    stations_close  two observation points are closer than MIN_BASELINE
+    parallel        two bearings are parallel (within MIN_ANGLE degrees)
+    diverging       two lines only cross behind an observation point
+    beyond_dist     two lines only cross farther than dist
+    degenerate      the triangle is a sliver: Heron's S is about 0 for its
+                    perimeter (the incircle radius would hide the error)
+
+Every fix that passes has a valid incircle triangulation.
+'''
+
+import numpy as np
+
+from RemLocXY import batch
+from RemLocXY.solver import PAIRS
+
+REASONS = ["ok", "missing", "stations_close", "parallel", "diverging", "beyond_dist", "degenerate"]
+OK, MISSING, STATIONS_CLOSE, PARALLEL, DIVERGING, BEYOND_DIST, DEGENERATE = range(len(REASONS))
+
+# Warnings of the tool for every reason
+MESSAGES = ["",
+            "A coordinate, azimuth or the distance is missing or out of range.",
+            "Two observation points are less than %g m apart.",
+            "Two azimuths are parallel (less than %g degrees apart).",
+            "Two observation lines diverge: they could only cross behind an observation point.",
+            "Two observation lines cross farther away than the distance of the lines.",
+            "The points of intersection are (nearly) in line: the triangle is degenerate."]
+
+# Shortest distance (meters) between two observation points
+MIN_BASELINE = 10.0
+# Smallest angle (degrees) between two bearings
+MIN_ANGLE = 0.1
+# Smallest shape factor 12 * sqrt(3) * S / P^2 of the triangle (1 for an
+# equilateral triangle, 0 for three points in line)
+MIN_SHAPE = 0.01
+# Triangles with a shorter perimeter (meters) are a point, as in the tool
+EXACT = 0.01
+
+
+def check_projected(P, min_baseline=MIN_BASELINE, min_angle=MIN_ANGLE, min_shape=MIN_SHAPE):
+    '''
+    Reason codes (uint8 array) of fixes given by their projected
+    observation points P, as returned by batch.stations (or
+    RemLocXY.registry).
+    '''
+    P = [np.broadcast_arrays(*p) for p in P]
+    code = np.zeros(np.broadcast(*(v for p in P for v in p)).shape, dtype=np.uint8)
+
+    def mark(mask, reason):
+        ## Keep the first reason found
+        code[mask & (code == OK)] = reason
+
+    mark(~np.logical_and.reduce([np.isfinite(v) for p in P for v in p]), MISSING)
+    mark(np.logical_or.reduce([p[3] <= 0 for p in P]), MISSING)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # Observation points too close together
+        close = [np.hypot(P[j-1][0] - P[i-1][0], P[j-1][1] - P[i-1][1]) < min_baseline
+                 for i, j in PAIRS]
+        mark(np.logical_or.reduce(close), STATIONS_CLOSE)
+
+        # Every pair of lines: the distances s, t of the crossing along them
+        sin = np.sin(np.radians(min_angle))
+        d = [(np.sin(np.radians(p[2])), np.cos(np.radians(p[2]))) for p in P]
+        parallel = []
+        diverging = []
+        beyond = []
+        XY = []
+        for i, j in PAIRS:
+            (X1, Y1, _, len1), (dx1, dy1) = P[i-1], d[i-1]
+            (X2, Y2, _, len2), (dx2, dy2) = P[j-1], d[j-1]
+            den = dx1 * dy2 - dy1 * dx2
+            s = ((X2 - X1) * dy2 - (Y2 - Y1) * dx2) / den
+            t = ((X2 - X1) * dy1 - (Y2 - Y1) * dx1) / den
+            parallel.append(np.abs(den) < sin)
+            diverging.append((s < 0) | (t < 0))
+            beyond.append((s > len1) | (t > len2))
+            XY.append((X1 + s * dx1, Y1 + s * dy1))
+        mark(np.logical_or.reduce(parallel), PARALLEL)
+        mark(np.logical_or.reduce(diverging), DIVERGING)
+        mark(np.logical_or.reduce(beyond), BEYOND_DIST)
+
+        # Heron's S of the triangle of the points of intersection
+        (X1, Y1), (X2, Y2), (X3, Y3) = XY
+        A = np.hypot(X2 - X3, Y2 - Y3)
+        B = np.hypot(X1 - X3, Y1 - Y3)
+        C = np.hypot(X1 - X2, Y1 - Y2)
+        p = (A + B + C) / 2
+        S = np.sqrt(np.maximum(p * (p - A) * (p - B) * (p - C), 0.0))
+        mark((p > EXACT / 2) & (3 * np.sqrt(3) * S < min_shape * p * p), DEGENERATE)
+    return code
+
+
+def check(lat1, lon1, az1, lat2, lon2, az2, lat3, lon3, az3, dist, P=None, **limits):
+    '''
+    Reason codes (uint8 array, OK = 0) of many fixes given as the lat1 ...
+    dist columns; P are their projected points if batch.stations has been
+    run already, limits the min_* keywords of check_projected.
+    '''
+    with np.errstate(invalid="ignore"):
+        bad = np.logical_or.reduce([np.abs(np.asarray(lat, dtype=np.float64)) > 90
+                                    for lat in (lat1, lat2, lat3)] +
+                                   [np.abs(np.asarray(lon, dtype=np.float64)) > 180
+                                    for lon in (lon1, lon2, lon3)])
+    if P is None:
+        P, _, _ = batch.stations(lat1, lon1, az1, lat2, lon2, az2, lat3, lon3, az3, dist)
+    code = check_projected(P, **limits)
+    code[np.broadcast_to(bad, code.shape)] = MISSING
+    return code
+
+
+def counts(codes):
+    '''Number of fixes of every reason code, as an array indexed by code.'''
+    return np.bincount(np.ravel(codes), minlength=len(REASONS))
+
+
+def summary(codes):
+    '''Number of fixes of every reason, as a dict of reason -> count.'''
+    return dict(zip(REASONS, counts(codes).tolist()))
+
+
+def message(code, min_baseline=MIN_BASELINE, min_angle=MIN_ANGLE):
+    '''The warning of the tool for a reason code ("" for OK).'''
+    text = MESSAGES[code]
+    if code == STATIONS_CLOSE:
+        return text % min_baseline
+    if code == PARALLEL:
+        return text % min_angle
+    return text
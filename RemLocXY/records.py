@@ -0,0 +1,159 @@
+'''
+Compact records of fixes and their results.
+
+Many fixes are held in one NumPy structured array of FIX_DTYPE, one
+85-byte record per fix (the lat1 ... dist values, Xin, Yin, r and a
+status code) instead of a list of 13 str/float objects per fix:
+
+    fixes = from_values(values)          # (n, 10) lat1 ... dist array
+    solve(fixes)                         # fills Xin, Yin, r and status
+    fixes[1000:2000]["Xin"]              # views, nothing is copied
+
+Coordinates are float64; azimuths, dist and r are float32 (a few
+millimeters at 10 km, well below the error of a bearing); status is the
+RemLocXY.precheck reason code, or UNSOLVED. 50M fixes take 4.3 GB. Every
+field of an array (or of a slice of it) is a view that the batch
+functions take as a column, e.g. batch.triangulate_columns(fixes).
+
+Fix is the record of a single fix (the tool), with __slots__.
+'''
+
+import math
+
+import numpy as np
+
+from RemLocXY import batch, precheck, solver
+from RemLocXY.batch import FIELDS_IN, FIELDS_OUT
+
+# Status of a fix that has not been solved yet; otherwise the pre-check reason code
+UNSOLVED = 255
+
+FIX_DTYPE = np.dtype([("lat1", "f8"), ("lon1", "f8"), ("az1", "f4"),
+                      ("lat2", "f8"), ("lon2", "f8"), ("az2", "f4"),
+                      ("lat3", "f8"), ("lon3", "f8"), ("az3", "f4"),
+                      ("dist", "f4"), ("Xin", "f8"), ("Yin", "f8"), ("r", "f4"),
+                      ("status", "u1")])
+
+#----------------------------------------------------------------------------
+#                              Arrays of fixes
+#----------------------------------------------------------------------------
+
+def empty(n):
+    '''Array of n unsolved fixes with all values NaN.'''
+    fixes = np.empty(n, dtype=FIX_DTYPE)
+    for name in FIELDS_IN + FIELDS_OUT:
+        fixes[name] = np.nan
+    fixes["status"] = UNSOLVED
+    return fixes
+
+
+def from_columns(columns):
+    '''Array of fixes from a mapping of FIELDS_IN column name -> array (a
+    dict of columns or a structured array); Xin, Yin, r and status are
+    taken over if present.'''
+    n = len(np.asarray(columns["lat1"]))
+    fixes = empty(n)
+    for name in FIX_DTYPE.names:
+        try:
+            column = columns[name]
+        except (KeyError, ValueError):
+            if name in FIELDS_IN:
+                raise
+            continue
+        fixes[name] = column
+    return fixes
+
+
+def from_values(values):
+    '''Array of fixes from an (n, 10) array of lat1 ... dist values.'''
+    values = np.asarray(values, dtype=np.float64).reshape(-1, len(FIELDS_IN))
+    fixes = empty(len(values))
+    for i, name in enumerate(FIELDS_IN):
+        fixes[name] = values[:, i]
+    return fixes
+
+
+def columns(fixes):
+    '''The lat1 ... dist fields of an array of fixes (views).'''
+    return tuple(fixes[name] for name in FIELDS_IN)
+
+
+def solve(fixes):
+    '''
+    Triangulate an array of fixes in place: Xin, Yin and r of the incircle
+    (NaN where the lines do not form a triangle) and the pre-check reason
+    code as status. Returns the Batch.
+    '''
+    cols = columns(fixes)
+    P, zone, north = batch.stations(*cols)
+    fix = batch.triangulate_projected(P, zone, north)
+    fixes["Xin"] = fix.Xin
+    fixes["Yin"] = fix.Yin
+    fixes["r"] = fix.R
+    fixes["status"] = precheck.check(*cols, P=P)
+    return fix
+
+#----------------------------------------------------------------------------
+#                               A single fix
+#----------------------------------------------------------------------------
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+class Fix(object):
+    '''
+    One fix and its result, e.g. the parameters of the tool. Missing or
+    broken values are NaN; status is UNSOLVED or a pre-check reason code.
+    '''
+
+    __slots__ = tuple(FIX_DTYPE.names)
+
+    def __init__(self, lat1, lon1, az1, lat2, lon2, az2, lat3, lon3, az3, dist,
+                 Xin=math.nan, Yin=math.nan, r=math.nan, status=UNSOLVED):
+        values = (lat1, lon1, az1, lat2, lon2, az2, lat3, lon3, az3, dist, Xin, Yin, r)
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, _float(value))
+        self.status = int(status)
+
+    @classmethod
+    def from_record(cls, record):
+        '''Fix of one element of an array of FIX_DTYPE.'''
+        return cls(*record.tolist())
+
+    def record(self):
+        '''The fix as a 0-d array of FIX_DTYPE.'''
+        return np.array(tuple(getattr(self, name) for name in self.__slots__), dtype=FIX_DTYPE)
+
+    def values(self):
+        '''The lat1 ... dist values.'''
+        return [getattr(self, name) for name in FIELDS_IN]
+
+    @property
+    def valid(self):
+        return not (math.isnan(self.Xin) or math.isnan(self.Yin))
+
+    def triangulate(self):
+        '''Triangulate the fix with RemLocXY.solver, filling in Xin, Yin and
+        r where there is a triangle. Returns the Triangulation.'''
+        v = self.values()
+        fix = solver.triangulate(v[0:3], v[3:6], v[6:9], v[9])
+        if fix.valid:
+            self.Xin, self.Yin, self.r = fix.Xin, fix.Yin, fix.R
+        return fix
+
+    def row(self):
+        '''
+        The 13 values of the tool's txt-file: missing input values are
+        blank and Xin, Yin and r are 0 while there is no location.
+        '''
+        row = ["" if math.isnan(v) else v for v in self.values()]
+        if self.valid:
+            return row + [self.Xin, self.Yin, self.r]
+        return row + [0, 0, 0]
+
+    def __repr__(self):
+        return "Fix(%s)" % ", ".join("%s=%r" % (name, getattr(self, name)) for name in self.__slots__)
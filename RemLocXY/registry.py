@@ -0,0 +1,249 @@
+'''
+Registry of fixed observation stations (towers).
+
+Most fixes are taken from a few fixed towers. A registry is a small CSV
+file of station ID, lat and lon (WGS84 decimal degrees):
+
+    id,lat,lon
+    T1,43.5712,-89.7623
+    T2,43.5790,-89.7451
+
+Fixes then give station IDs instead of coordinates (the station1, az1,
+station2, az2, station3, az3 and dist columns), and everything that only
+depends on a station is computed once and reused for all fixes: sin/cos
+of the latitude, the ECEF position and the projected X, Y, meridian
+convergence and scale factor in every UTM zone the fixes use.
+
+Fixes that do give coordinates can be snapped to the nearest registered
+station within a tolerance (GPS positions taken a few meters off the
+tower), with a grid-bucket spatial index over the stations.
+'''
+
+import csv
+
+import numpy as np
+
+from RemLocXY import batch, tmerc, utm
+
+# Input columns of a fix that references stations by ID
+FIELDS_IN = ["station1","az1","station2","az2","station3","az3","dist"]
+# Largest distance (meters) of an observation point snapped to a station
+SNAP_TOLERANCE = 25.0
+
+
+def ecef(lat, lon):
+    '''Earth-centered, earth-fixed (n, 3) positions (meters) on the ellipsoid.'''
+    phi = np.radians(np.asarray(lat, dtype=np.float64))
+    lam = np.radians(np.asarray(lon, dtype=np.float64))
+    e2 = utm.f * (2 - utm.f)
+    sinlat = np.sin(phi)
+    coslat = np.cos(phi)
+    N = utm.a / np.sqrt(1 - e2 * sinlat**2)
+    return np.stack([N * coslat * np.cos(lam), N * coslat * np.sin(lam),
+                     N * (1 - e2) * sinlat], axis=-1)
+
+
+def _cell_key(cell):
+    '''Hash of (n, 3) int64 grid cells; collisions only add candidates.'''
+    return (cell[..., 0] * 73856093) ^ (cell[..., 1] * 19349663) ^ (cell[..., 2] * 83492791)
+
+
+class StationIndex(object):
+    '''
+    Grid-bucket index of the station positions for snapping within a
+    tolerance. The ECEF positions are binned in cubic cells twice the
+    tolerance wide; every station is filed under each cell its tolerance
+    box touches (at most 2 x 2 x 2), so the stations within the tolerance
+    of a point are all filed under the point's own cell, found by one
+    binary search in the sorted cell keys (O(log n) per point).
+    '''
+
+    def __init__(self, positions, tolerance):
+        self.tolerance = float(tolerance)
+        self.size = 2 * self.tolerance
+        self.positions = positions
+        lo = np.floor((positions - self.tolerance) / self.size).astype(np.int64)
+        hi = np.floor((positions + self.tolerance) / self.size).astype(np.int64)
+        keys = []
+        stations = []
+        for offset in np.ndindex(2, 2, 2):
+            cell = np.where(np.array(offset, dtype=bool), hi, lo)
+            keys.append(_cell_key(cell))
+            stations.append(np.arange(len(positions)))
+        ## Drop the repeats where the box is within one cell along an axis
+        pairs = np.unique(np.stack([np.concatenate(keys), np.concatenate(stations)], axis=-1), axis=0)
+        self.order = pairs[:, 1].astype(np.intp)
+        ## Sorted distinct cell keys with the first station and count of each
+        self.keys, self.start, self.count = np.unique(pairs[:, 0], return_index=True,
+                                                      return_counts=True)
+
+    def query(self, positions):
+        '''
+        Nearest station within the tolerance of every (n, 3) ECEF position.
+        Returns (station index or -1, distance in meters or inf).
+        '''
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+        n = len(positions)
+        best = np.full(n, -1, dtype=np.intp)
+        dist = np.full(n, np.inf)
+        if not len(self.keys):
+            return best, dist
+        finite = np.isfinite(positions).all(axis=-1)
+        cell = np.floor(np.where(finite[:, None], positions, 0.0) / self.size).astype(np.int64)
+        key = _cell_key(cell)
+        pos = np.minimum(np.searchsorted(self.keys, key), len(self.keys) - 1)
+        hit = np.nonzero((self.keys[pos] == key) & finite)[0]
+        first = self.start[pos[hit]]
+        count = self.count[pos[hit]]
+        ## Every cell holds few stations: walk them all at once
+        for j in range(int(count.max(initial=0))):
+            more = count > j
+            rows = hit[more]
+            station = self.order[first[more] + j]
+            d = np.sqrt(((positions[rows] - self.positions[station])**2).sum(axis=-1))
+            better = (d <= self.tolerance) & (d < dist[rows])
+            best[rows[better]] = station[better]
+            dist[rows[better]] = d[better]
+        return best, dist
+
+
+class Registry(object):
+    '''
+    Station ID -> position, with the per-station values cached. Index -1
+    stands for an unknown station and gives NaN everywhere.
+    '''
+
+    def __init__(self, ids, lat, lon, path=None):
+        self.ids = [str(i).strip() for i in ids]
+        self.index = {}
+        for i, station in enumerate(self.ids):
+            if station in self.index:
+                raise ValueError("Station " + station + " is in the registry twice")
+            self.index[station] = i
+        self.path = path
+        ## One extra NaN station at the end, picked by index -1
+        self.lat = np.append(np.asarray(lat, dtype=np.float64), np.nan)
+        self.lon = np.append(np.asarray(lon, dtype=np.float64), np.nan)
+        self.ecef = ecef(self.lat, self.lon)
+        self._projected = {}
+        self._grids = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def lookup(self, ids):
+        '''Array of the registry indices of station IDs (-1 if unknown).'''
+        get = self.index.get
+        return np.fromiter((get(str(i).strip(), -1) for i in ids), dtype=np.intp, count=len(ids))
+
+    def projected(self, number, north):
+        '''X, Y, gamma and k arrays of all stations in a UTM zone (cached).'''
+        key = (int(number), bool(north))
+        if key not in self._projected:
+            self._projected[key] = tmerc.forward(self.lat, self.lon, *key)
+        return self._projected[key]
+
+    def grid(self, tolerance=SNAP_TOLERANCE):
+        '''StationIndex of the registered stations for tolerance (cached).'''
+        if tolerance not in self._grids:
+            self._grids[tolerance] = StationIndex(self.ecef[:-1], tolerance)
+        return self._grids[tolerance]
+
+    def snap(self, lat, lon, tolerance=SNAP_TOLERANCE):
+        '''
+        Nearest station within tolerance meters of every point. Returns
+        (station index or -1, distance in meters or inf) arrays.
+        '''
+        lat = np.asarray(lat, dtype=np.float64)
+        best, dist = self.grid(tolerance).query(ecef(lat, lon))
+        return best.reshape(lat.shape), dist.reshape(lat.shape)
+
+    def snap_columns(self, lat1, lon1, az1, lat2, lon2, az2, lat3, lon3, az3, dist,
+                     tolerance=SNAP_TOLERANCE):
+        '''
+        Snap the observation points of the lat1 ... dist columns to the
+        nearest station within tolerance meters; points farther from every
+        station keep their coordinates. Returns (the ten columns, an (n, 3)
+        array of the station index of every point or -1).
+        '''
+        lat = np.stack(np.broadcast_arrays(lat1, lat2, lat3), axis=-1).astype(np.float64)
+        lon = np.stack(np.broadcast_arrays(lon1, lon2, lon3), axis=-1).astype(np.float64)
+        idx, _ = self.snap(lat, lon, tolerance)
+        snapped = idx >= 0
+        lat = np.where(snapped, self.lat[idx], lat)
+        lon = np.where(snapped, self.lon[idx], lon)
+        return (lat[..., 0], lon[..., 0], az1, lat[..., 1], lon[..., 1], az2,
+                lat[..., 2], lon[..., 2], az3, dist), idx
+
+    def _indices(self, stations):
+        stations = np.asarray(stations)
+        if stations.dtype.kind in "iu":
+            return stations.astype(np.intp)
+        return self.lookup(stations.ravel()).reshape(stations.shape)
+
+    def stations(self, station1, az1, station2, az2, station3, az3, dist):
+        '''
+        Same as batch.stations for fixes given by station IDs (or registry
+        indices): returns (P, zone, north) from the cached projections.
+        '''
+        idx = [np.atleast_1d(self._indices(s)) for s in (station1, station2, station3)]
+        az = [np.asarray(a, dtype=np.float64) for a in (az1, az2, az3)]
+        dist = np.asarray(dist, dtype=np.float64)
+
+        # Determine the UTM Zone of each fix from the average latitude and longitude
+        avgLat = (self.lat[idx[0]] + self.lat[idx[1]] + self.lat[idx[2]]) / 3
+        avgLon = (self.lon[idx[0]] + self.lon[idx[1]] + self.lon[idx[2]]) / 3
+        zone, north = tmerc.zone(avgLat, avgLon)
+
+        ## Gather the station values of every zone used (usually one)
+        key = zone * 2 + north
+        codes = np.unique(key)
+        if len(codes) == 1:
+            X, Y, gamma, k = self.projected(codes[0] // 2, codes[0] % 2)
+            P = [(X[i], Y[i], a - gamma[i], dist * k[i]) for i, a in zip(idx, az)]
+            return P, zone, north
+        n = len(zone)
+        P = [tuple(np.full(n, np.nan) for _ in range(4)) for _ in range(3)]
+        for code in codes:
+            rows = np.nonzero(key == code)[0]
+            X, Y, gamma, k = self.projected(code // 2, code % 2)
+            for (Xs, Ys, azs, lens), i, a in zip(P, idx, az):
+                j = i[rows]
+                Xs[rows] = X[j]
+                Ys[rows] = Y[j]
+                azs[rows] = np.broadcast_to(a, (n,))[rows] - gamma[j]
+                lens[rows] = np.broadcast_to(dist, (n,))[rows] * k[j]
+        return P, zone, north
+
+    def triangulate(self, station1, az1, station2, az2, station3, az3, dist):
+        '''
+        Triangulate many fixes given by station IDs (or registry indices)
+        and azimuths, as batch.triangulate_batch does. Returns a Batch.
+        '''
+        return batch.triangulate_projected(*self.stations(station1, az1, station2, az2,
+                                                          station3, az3, dist))
+
+    def coordinates(self, station1, az1, station2, az2, station3, az3, dist):
+        '''The lat1 ... dist columns of fixes given by station IDs.'''
+        idx = [self._indices(s) for s in (station1, station2, station3)]
+        return (self.lat[idx[0]], self.lon[idx[0]], az1, self.lat[idx[1]], self.lon[idx[1]], az2,
+                self.lat[idx[2]], self.lon[idx[2]], az3, dist)
+
+
+def load(path):
+    '''
+    Read a registry CSV file with id (or station), lat and lon columns;
+    column names are matched case-insensitively.
+    '''
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        lower = [h.strip().lower() for h in next(reader)]
+        try:
+            i = lower.index("id") if "id" in lower else lower.index("station")
+            j = lower.index("lat")
+            k = lower.index("lon")
+        except ValueError:
+            raise ValueError("Station registry " + path + " needs id, lat and lon fields")
+        rows = [row for row in reader if row]
+    return Registry([row[i] for row in rows], [float(row[j]) for row in rows],
+                    [float(row[k]) for row in rows], path)
@@ -0,0 +1,139 @@
+'''
+In-process triangulation of a remote location from three bearings.
+
+This is the math the ArcGIS tool used to do with BearingDistanceToLine,
+Intersect, GetCount, Project and SearchCursor, done directly in Python:
+
+1. the observation points are projected to the UTM zone of their average
+   position and every azimuth is turned into a grid bearing;
+2. each pair of observation lines (length "dist" from its observation
+   point) is intersected in the plane: XY1 = lines #2 and #3,
+   XY2 = lines #1 and #3, XY3 = lines #1 and #2;
+3. the incenter of the triangle XY1-XY2-XY3 is the object location and the
+   radius of the incircle (R) is the error of the measurements.
+
+Only the standard library is used, so the module imports without arcpy.
+'''
+
+import math
+from collections import namedtuple
+
+from RemLocXY import utm
+
+# Observation lines crossing at XY1, XY2 and XY3
+PAIRS = ((2, 3), (1, 3), (1, 2))
+
+
+class Triangulation(namedtuple("Triangulation", ["XY1", "XY2", "XY3", "Xin", "Yin", "R",
+                                                 "Xin_UTM", "Yin_UTM", "zone", "north"])):
+    '''
+    Result of one fix.
+
+    XY1, XY2 and XY3 are the (X, Y) = (lon, lat) points of intersection in
+    WGS84, or None where the lines do not intersect. Xin, Yin (WGS84) and
+    Xin_UTM, Yin_UTM are the incenter and R the incircle radius in meters;
+    they are None unless all three intersections exist.
+    '''
+    __slots__ = ()
+
+    @property
+    def IntersectionCount(self):
+        return sum(xy is not None for xy in (self.XY1, self.XY2, self.XY3))
+
+    @property
+    def valid(self):
+        return self.IntersectionCount == 3
+
+    @property
+    def epsg(self):
+        return utm.epsg(self.zone, self.north)
+
+
+def intersect(P1, az1, len1, P2, az2, len2):
+    '''
+    Intersect two observation lines in the plane.
+
+    Each line starts at P = (X, Y), runs along the grid bearing az (degrees
+    clockwise from north) and is len meters long. Returns the (X, Y) of the
+    point of intersection or None if the lines do not intersect.
+    '''
+    dx1 = math.sin(math.radians(az1))
+    dy1 = math.cos(math.radians(az1))
+    dx2 = math.sin(math.radians(az2))
+    dy2 = math.cos(math.radians(az2))
+    den = dx1 * dy2 - dy1 * dx2
+    if den == 0:   # parallel lines
+        return None
+    wx = P2[0] - P1[0]
+    wy = P2[1] - P1[1]
+    s = (wx * dy2 - wy * dx2) / den   # distance along line 1
+    t = (wx * dy1 - wy * dx1) / den   # distance along line 2
+    if not (0 <= s <= len1 and 0 <= t <= len2):
+        return None
+    return P1[0] + s * dx1, P1[1] + s * dy1
+
+
+def incircle(X1, Y1, X2, Y2, X3, Y3):
+    '''Return (Xin, Yin, R): incenter and incircle radius of a triangle.'''
+    ## Calculate the side A of the triangle (X2Y2 <-----> X3Y3)
+    A = math.sqrt((X2-X3)*(X2-X3)+(Y2-Y3)*(Y2-Y3))
+    ## Calculate the side B of the triangle (X1Y1 <-----> X3Y3)
+    B = math.sqrt((X1-X3)*(X1-X3)+(Y1-Y3)*(Y1-Y3))
+    ## Calculate the side C of the triangle (X1Y1 <-----> X2Y2)
+    C = math.sqrt((X1-X2)*(X1-X2)+(Y1-Y2)*(Y1-Y2))
+
+    # All three lines cross at one point: the location is exact
+    if A+B+C == 0:
+        return X1, Y1, 0.0
+
+    # Calculate the X Y coordinate of the incenter
+    Xin = ((A*X1)+(B*X2)+(C*X3))/(A+B+C)
+    Yin = ((A*Y1)+(B*Y2)+(C*Y3))/(A+B+C)
+
+    # Calculate the error of the measuremet (it equals R of incircle)
+    ## Find semiperimeter: p = (A+B+C)/2
+    p = (A+B+C)/2
+    ## Calculate area of the triangle: S = sqroot(p*(p-A)*(p-B)*(p-C))
+    S = math.sqrt(max(p*(p-A)*(p-B)*(p-C), 0.0))
+    ## Calculate error: R = S/p
+    R = S/p
+    return Xin, Yin, R
+
+
+def triangulate(obs1, obs2, obs3, dist):
+    '''
+    Triangulate one fix.
+
+    obs1, obs2 and obs3 are (lat, lon, azimuth) of the observation points
+    in WGS84 decimal degrees and dist is the length of the observation
+    lines in meters. Strings as returned by arcpy.GetParameterAsText are
+    accepted. Returns a Triangulation.
+    '''
+    obs = [tuple(float(v) for v in o) for o in (obs1, obs2, obs3)]
+    dist = float(dist)
+
+    # Determine the UTM Zone from the average latitude and longitude
+    avgLat = (obs[0][0]+obs[1][0]+obs[2][0])/3
+    avgLon = (obs[0][1]+obs[1][1]+obs[2][1])/3
+    zone, north = utm.zone(avgLat, avgLon)
+
+    # Project the observation points and turn azimuths into grid bearings
+    P = []
+    for lat, lon, az in obs:
+        X, Y, gamma, k = utm.forward(lat, lon, zone, north)
+        P.append(((X, Y), az - gamma, dist * k))
+
+    # Find the points of intersection XY1, XY2 and XY3
+    XY_UTM = []
+    for i, j in PAIRS:
+        (P1, az1, len1), (P2, az2, len2) = P[i-1], P[j-1]
+        XY_UTM.append(intersect(P1, az1, len1, P2, az2, len2))
+    XY = [None if xy is None else utm.inverse(xy[0], xy[1], zone, north)[::-1] for xy in XY_UTM]
+
+    # If there is a triangle then find the center and the radius of the incircle
+    if None in XY_UTM:
+        return Triangulation(XY[0], XY[1], XY[2], None, None, None, None, None, zone, north)
+    (X1, Y1), (X2, Y2), (X3, Y3) = XY_UTM
+    Xin_UTM, Yin_UTM, R = incircle(X1, Y1, X2, Y2, X3, Y3)
+    Yin, Xin = utm.inverse(Xin_UTM, Yin_UTM, zone, north)
+    return Triangulation(XY[0], XY[1], XY[2], Xin, Yin, R, Xin_UTM, Yin_UTM, zone, north)
@@ -0,0 +1,599 @@
+'''
+Stand-in for the part of arcpy the tool uses, so the ArcGIS Pro script
+(RemoteLocationXYPro.py) runs headless (on Linux CI, without a license) and
+every geoprocessing call can be timed. The ArcMap script RemoteLocationXY.py
+is not supported: it is Python 2 (it writes the txt-file through a binary
+file) and draws its layers with arcpy.mapping, which the stand-in leaves out
+as ArcGIS Pro does.
+
+The stand-in keeps feature classes in memory as plain Python geometry
+(points, polylines, polygons in WGS84 or UTM) and writes a small JSON copy
+to disk for every output outside the "memory" workspace, so Exists, Delete
+and the output folder behave as with arcpy. The geometry is simple (great
+circle observation lines, planar intersections, UTM buffers): good enough to
+run and profile the flow of the tool, not to replace ArcGIS.
+
+Run a script through it:
+
+    python -m RemLocXY.standin RemoteLocationXYPro.py 43.5 -89.75 45 ... --workspace /tmp/out
+
+Every call of the stand-in is recorded in arcpy.calls as (name, seconds);
+the run ends with a table of the time spent in every call.
+'''
+
+import argparse
+import csv
+import json
+import math
+import os
+import re
+import runpy
+import sys
+import time
+import types
+
+from RemLocXY import utm
+
+# Mean radius of the earth for the great circle observation lines (meters)
+RADIUS = 6371008.8
+# Vertices of the observation lines and of the buffers
+LINE_VERTICES = 16
+BUFFER_VERTICES = 72
+# The CalculateField expressions of the scripts: a number or !field! [+ number]
+EXPRESSION = re.compile(r"^\s*!(\w+)!\s*(?:\+\s*([-+]?[\d.]+)\s*)?$")
+
+
+class ExecuteError(Exception):
+    '''Raised by a stand-in tool on bad input, as arcpy.ExecuteError.'''
+
+#----------------------------------------------------------------------------
+#                         Feature classes and data
+#----------------------------------------------------------------------------
+
+class SpatialReference(object):
+    '''arcpy.SpatialReference of a WGS84 (4326) or WGS84 / UTM factory code.'''
+
+    def __init__(self, code=4326):
+        self.factoryCode = int(code)
+        if self.factoryCode == 4326:
+            self.name = "GCS_WGS_1984"
+            self.type = "Geographic"
+        else:
+            zone = self.factoryCode % 100
+            north = self.factoryCode // 100 == 326
+            self.name = "WGS_1984_UTM_Zone_%d%s" % (zone, "N" if north else "S")
+            self.type = "Projected"
+
+    def __eq__(self, other):
+        return isinstance(other, SpatialReference) and other.factoryCode == self.factoryCode
+
+    def __repr__(self):
+        return "SpatialReference(%d)" % self.factoryCode
+
+
+class FeatureClass(object):
+    '''Features of one shape type: rows of [attributes dict, geometry].'''
+
+    def __init__(self, shapeType, sr, fields=None, rows=None):
+        self.shapeType = shapeType      # "Point", "Polyline" or "Polygon"
+        self.sr = sr
+        self.fields = list(fields or [])
+        self.rows = rows if rows is not None else []
+
+    def copy(self):
+        return FeatureClass(self.shapeType, self.sr, self.fields,
+                            [[dict(a), g] for a, g in self.rows])
+
+    def to_json(self):
+        return {"shapeType": self.shapeType, "wkid": self.sr.factoryCode,
+                "fields": self.fields, "rows": self.rows}
+
+
+class Point(object):
+    def __init__(self, X, Y):
+        self.X = X
+        self.Y = Y
+
+
+class Geometry(object):
+    '''Shape value of a SearchCursor row.'''
+
+    def __init__(self, shapeType, geometry):
+        self.type = shapeType.lower()
+        self._geometry = geometry
+
+    @property
+    def firstPoint(self):
+        g = self._geometry
+        return Point(*g) if self.type == "point" else Point(*g[0])
+
+    @property
+    def lastPoint(self):
+        g = self._geometry
+        return Point(*g) if self.type == "point" else Point(*g[-1])
+
+
+class Result(object):
+    '''arcpy Result of a tool; getOutput(0) is the output.'''
+
+    def __init__(self, *outputs):
+        self._outputs = outputs
+
+    def getOutput(self, index):
+        return self._outputs[index]
+
+    def __str__(self):
+        return str(self._outputs[0])
+
+#----------------------------------------------------------------------------
+#                                 Geometry
+#----------------------------------------------------------------------------
+
+def _destination(lat, lon, az, distance):
+    '''Great circle destination from (lat, lon) along azimuth az (degrees).'''
+    phi = math.radians(lat)
+    theta = math.radians(az)
+    delta = distance / RADIUS
+    phi2 = math.asin(math.sin(phi) * math.cos(delta) + math.cos(phi) * math.sin(delta) * math.cos(theta))
+    lam = math.atan2(math.sin(theta) * math.sin(delta) * math.cos(phi),
+                     math.cos(delta) - math.sin(phi) * math.sin(phi2))
+    return math.degrees(phi2), (lon + math.degrees(lam) + 540) % 360 - 180
+
+
+def _segment_intersection(p1, p2, q1, q2):
+    '''Planar intersection point of segments p1-p2 and q1-q2, or None.'''
+    rx, ry = p2[0] - p1[0], p2[1] - p1[1]
+    sx, sy = q2[0] - q1[0], q2[1] - q1[1]
+    den = rx * sy - ry * sx
+    if den == 0:
+        return None
+    wx, wy = q1[0] - p1[0], q1[1] - p1[1]
+    t = (wx * sy - wy * sx) / den
+    u = (wx * ry - wy * rx) / den
+    if 0 <= t <= 1 and 0 <= u <= 1:
+        return p1[0] + t * rx, p1[1] + t * ry
+    return None
+
+
+def _utm_of(sr):
+    code = sr.factoryCode
+    return code % 100, code // 100 == 326
+
+
+def _project_point(xy, sr_from, sr_to):
+    if sr_from == sr_to:
+        return xy
+    if sr_from.factoryCode != 4326:
+        lat, lon = utm.inverse(xy[0], xy[1], *_utm_of(sr_from))
+        xy = (lon, lat)
+    if sr_to.factoryCode != 4326:
+        X, Y, _, _ = utm.forward(xy[1], xy[0], *_utm_of(sr_to))
+        xy = (X, Y)
+    return xy
+
+#----------------------------------------------------------------------------
+#                               The stand-in
+#----------------------------------------------------------------------------
+
+def _literal(text):
+    '''The int or float of a number in an expression; ValueError if none.'''
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+def make_arcpy(params=(), echo=True):
+    '''
+    Build a fresh stand-in arcpy module. params are the values returned by
+    GetParameterAsText. The module records every call in arcpy.calls.
+    '''
+    arcpy = types.ModuleType("arcpy")
+    arcpy.__doc__ = "Stand-in for arcpy (RemLocXY.standin)"
+    params = list(params)
+    data = {}            # normalized path or layer name -> FeatureClass
+    calls = []           # (name, seconds) of every call
+    messages = []        # (severity, text)
+    arcpy.calls = calls
+    arcpy.messages = messages
+    arcpy.data = data
+    arcpy.ExecuteError = ExecuteError
+    arcpy.SpatialReference = SpatialReference
+
+    def timed(name):
+        def wrap(fn):
+            def call(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    calls.append((name, time.perf_counter() - start))
+            call.__name__ = fn.__name__
+            call.__doc__ = fn.__doc__
+            return call
+        return wrap
+
+    # Paths: "memory\name" stays in memory, every other path is also a file
+    def key(path):
+        path = str(path).replace("\\", "/")
+        if path.split("/")[0].lower() in ("memory", "in_memory"):
+            return path.lower()
+        return os.path.normcase(os.path.abspath(path))
+
+    def on_disk(path):
+        return str(path).replace("\\", "/").split("/")[0].lower() not in ("memory", "in_memory")
+
+    def get(path):
+        k = key(path)
+        if k in data:
+            return data[k]
+        raise ExecuteError("ERROR 000732: Dataset %s does not exist or is not supported" % path)
+
+    def put(path, fc, layer=False, update=False):
+        if key(path) in data and not (update or layer or arcpy.env.overwriteOutput):
+            raise ExecuteError("ERROR 000725: Dataset %s already exists." % path)
+        data[key(path)] = fc
+        if on_disk(path) and not layer:
+            with open(str(path), "w") as f:
+                json.dump(fc.to_json(), f)
+        return Result(str(path))
+
+    def read_table(path):
+        '''Rows of a CSV file (or feature class attributes) as dicts with lower-case keys.'''
+        if key(path) in data:
+            return [dict((k.lower(), v) for k, v in a.items()) for a, _ in get(path).rows]
+        with open(str(path), newline="") as f:
+            return [dict((k.strip().lower(), v) for k, v in row.items()) for row in csv.DictReader(f)]
+
+    def table_fields(path):
+        if key(path) in data:
+            return list(get(path).fields)
+        with open(str(path), newline="") as f:
+            return [h.strip() for h in next(csv.reader(f))]
+
+    # Messages and parameters
+    def AddMessage(message):
+        messages.append(("message", str(message)))
+        if echo:
+            print(message)
+
+    def AddWarning(message):
+        messages.append(("warning", str(message)))
+        if echo:
+            print("WARNING: " + str(message))
+
+    def AddError(message):
+        messages.append(("error", str(message)))
+        if echo:
+            print("ERROR: " + str(message))
+
+    def GetParameterAsText(index):
+        return str(params[index]) if index < len(params) and params[index] is not None else ""
+
+    def SetParameter(index, value):
+        while len(params) <= index:
+            params.append(None)
+        params[index] = value
+
+    def Exists(path):
+        return key(path) in data or (on_disk(path) and os.path.exists(str(path)))
+
+    def Describe(path):
+        fc = get(path)
+        return types.SimpleNamespace(ShapeFieldName="Shape", shapeType=fc.shapeType,
+                                     spatialReference=fc.sr, dataType="FeatureClass",
+                                     catalogPath=str(path))
+
+    def SearchCursor(path):
+        fc = get(path)
+        rows = []
+        for i, (a, g) in enumerate(fc.rows):
+            values = dict(a, FID=i, Shape=Geometry(fc.shapeType, g))
+            rows.append(types.SimpleNamespace(getValue=values.get))
+        return iter(rows)
+
+    for fn in (AddMessage, AddWarning, AddError, GetParameterAsText, SetParameter, Exists,
+               Describe, SearchCursor):
+        setattr(arcpy, fn.__name__, timed(fn.__name__)(fn))
+
+    arcpy.env = types.SimpleNamespace(workspace=None, scratchWorkspace=None, overwriteOutput=False)
+
+    # arcpy.management
+    management = types.ModuleType("arcpy.management")
+
+    def BearingDistanceToLine(in_table, out_featureclass, x_field, y_field, distance_field=None,
+                              distance_units="METERS", bearing_field=None, bearing_units="DEGREES",
+                              line_type="GEODESIC", id_field=None, spatial_reference=None, *args):
+        fields = table_fields(in_table)
+        rows = []
+        for row in read_table(in_table):
+            lon = float(row[x_field.lower()])
+            lat = float(row[y_field.lower()])
+            az = float(row[bearing_field.lower()])
+            d = float(row[distance_field.lower()])
+            line = []
+            for v in range(LINE_VERTICES + 1):
+                la, lo = _destination(lat, lon, az, d * v / LINE_VERTICES)
+                line.append((lo, la))
+            rows.append([dict((f, row[f.lower()]) for f in fields), line])
+        return put(out_featureclass, FeatureClass("Polyline", spatial_reference or SpatialReference(4326), fields, rows))
+
+    def MakeXYEventLayer(table, in_x_field, in_y_field, out_layer, spatial_reference=None, *args):
+        fields = table_fields(table)
+        rows = [[dict((f, row[f.lower()]) for f in fields),
+                 (float(row[in_x_field.lower()]), float(row[in_y_field.lower()]))]
+                for row in read_table(table)]
+        return put(out_layer, FeatureClass("Point", spatial_reference or SpatialReference(4326), fields, rows),
+                   layer=True)
+
+    def Merge(inputs, output, *args):
+        if isinstance(inputs, str):
+            inputs = inputs.split(";")
+        parts = [get(p) for p in inputs]
+        fields = []
+        for fc in parts:
+            fields += [f for f in fc.fields if f not in fields]
+        rows = [[dict(a), g] for fc in parts for a, g in fc.rows]
+        return put(output, FeatureClass(parts[0].shapeType, parts[0].sr, fields, rows))
+
+    def CopyFeatures(in_features, out_feature_class, *args):
+        return put(out_feature_class, get(in_features).copy())
+
+    def DeleteField(in_table, drop_field):
+        fc = get(in_table)
+        drop = set(f.lower() for f in ([drop_field] if isinstance(drop_field, str) else drop_field))
+        fc.fields = [f for f in fc.fields if f.lower() not in drop]
+        for a, _ in fc.rows:
+            for f in list(a):
+                if f.lower() in drop:
+                    del a[f]
+        return put(in_table, fc, update=True)
+
+    def CalculateField(in_table, field, expression, expression_type="PYTHON", code_block=""):
+        '''Only the expressions of the scripts: a number, or !field! plus a number.'''
+        fc = get(in_table)
+        match = EXPRESSION.match(expression) if isinstance(expression, str) else None
+        if isinstance(expression, str) and match is None:
+            try:
+                expression = _literal(expression)
+            except ValueError:
+                raise ExecuteError("ERROR 000539: Expression %r is not supported by the stand-in"
+                                   % expression)
+        if field not in fc.fields:
+            fc.fields.append(field)
+        for i, (a, _) in enumerate(fc.rows):
+            value = expression
+            if match is not None:
+                name, number = match.groups()
+                value = i if name.upper() in ("FID", "OID") else a.get(name)
+                if number is not None:
+                    value = _literal(str(value)) + _literal(number)
+            a[field] = value
+        return put(in_table, fc, update=True)
+
+    def GetCount(in_rows):
+        return Result(str(len(get(in_rows).rows)))
+
+    def Project(in_dataset, out_dataset, out_coor_system, *args):
+        fc = get(in_dataset).copy()
+        sr = out_coor_system
+        for row in fc.rows:
+            g = row[1]
+            if fc.shapeType == "Point":
+                row[1] = _project_point(g, fc.sr, sr)
+            else:
+                row[1] = [_project_point(p, fc.sr, sr) for p in g]
+        fc.sr = sr
+        return put(out_dataset, fc)
+
+    def Delete(in_data, *args):
+        k = key(in_data)
+        data.pop(k, None)
+        if on_disk(in_data) and os.path.isfile(str(in_data)):
+            os.remove(str(in_data))
+        return Result(True)
+
+    for fn in (BearingDistanceToLine, MakeXYEventLayer, Merge, CopyFeatures, DeleteField,
+               CalculateField, GetCount, Project, Delete):
+        setattr(management, fn.__name__, timed("management." + fn.__name__)(fn))
+    arcpy.management = management
+
+    # arcpy.analysis
+    analysis = types.ModuleType("arcpy.analysis")
+
+    def Intersect(in_features, out_feature_class, join_attributes="ALL", cluster_tolerance="",
+                  output_type="INPUT"):
+        if isinstance(in_features, str):
+            in_features = [p.strip().rsplit(" #", 1)[0].strip() for p in in_features.split(";")]
+        fc1, fc2 = (get(p) for p in in_features)
+        rows = []
+        for a1, g1 in fc1.rows:
+            for a2, g2 in fc2.rows:
+                for p1, p2 in zip(g1, g1[1:]):
+                    for q1, q2 in zip(g2, g2[1:]):
+                        xy = _segment_intersection(p1, p2, q1, q2)
+                        if xy is not None:
+                            rows.append([dict(a1, **a2), xy])
+        fields = fc1.fields + [f for f in fc2.fields if f not in fc1.fields]
+        return put(out_feature_class, FeatureClass("Point", fc1.sr, fields, rows))
+
+    def Buffer(in_features, out_feature_class, buffer_distance_or_field, *args):
+        fc = get(in_features)
+        distance = float(str(buffer_distance_or_field).split()[0])
+        rows = []
+        for a, g in fc.rows:
+            lon, lat = _project_point(g, fc.sr, SpatialReference(4326))
+            z, north = utm.zone(lat, lon)
+            X, Y, _, _ = utm.forward(lat, lon, z, north)
+            ring = []
+            for v in range(BUFFER_VERTICES + 1):
+                angle = 2 * math.pi * v / BUFFER_VERTICES
+                la, lo = utm.inverse(X + distance * math.sin(angle), Y + distance * math.cos(angle), z, north)
+                ring.append(_project_point((lo, la), SpatialReference(4326), fc.sr))
+            rows.append([dict(a, BUFF_DIST=distance), ring])
+        return put(out_feature_class, FeatureClass("Polygon", fc.sr, fc.fields + ["BUFF_DIST"], rows))
+
+    for fn in (Intersect, Buffer):
+        setattr(analysis, fn.__name__, timed("analysis." + fn.__name__)(fn))
+    arcpy.analysis = analysis
+
+    # arcpy.conversion
+    conversion = types.ModuleType("arcpy.conversion")
+
+    def TableToExcel(Input_Table, Output_Excel_File, *args):
+        fc = get(Input_Table)
+        with open(str(Output_Excel_File), "w", newline="") as f:
+            writer = csv.writer(f, delimiter="\t")
+            writer.writerow(["FID"] + fc.fields)
+            for i, (a, _) in enumerate(fc.rows):
+                writer.writerow([i] + [a.get(field) for field in fc.fields])
+        return Result(str(Output_Excel_File))
+
+    conversion.TableToExcel = timed("conversion.TableToExcel")(TableToExcel)
+    arcpy.conversion = conversion
+
+    # arcpy.mp: one project with one map
+    mp = types.ModuleType("arcpy.mp")
+
+    class LabelClass(object):
+        def __init__(self):
+            self.expression = ""
+            self.expressionEngine = "Arcade"
+            self.visible = False
+
+    class Layer(object):
+        def __init__(self, path):
+            self.dataSource = str(path)
+            self.workspacePath = os.path.dirname(str(path))
+            self.name = os.path.splitext(os.path.basename(str(path)))[0]
+            self.showLabels = False
+            self.transparency = 0
+            self.symbology = None
+            self._labels = [LabelClass()]
+
+        def supports(self, prop):
+            return prop.upper() in ("DATASOURCE", "NAME", "SHOWLABELS", "SYMBOLOGY", "TRANSPARENCY",
+                                    "WORKSPACEPATH")
+
+        def listLabelClasses(self, wildcard=None):
+            return list(self._labels)
+
+    class LayerFile(object):
+        '''A lyr-file; its layer has the file name as symbology.'''
+
+        def __init__(self, path):
+            if not os.path.exists(str(path)):
+                raise OSError("Layer file does not exist: %s" % path)
+            self.filePath = str(path)
+            self._layer = Layer(path)
+            self._layer.symbology = os.path.basename(str(path))
+
+        def listLayers(self, wildcard=None):
+            return [self._layer]
+
+    class Map(object):
+        def __init__(self, name="Map"):
+            self.name = name
+            self._layers = []
+
+        def listLayers(self, wildcard=None):
+            if wildcard in (None, "", "*"):
+                return list(self._layers)
+            return [l for l in self._layers if l.name == wildcard]
+
+        def addDataFromPath(self, path):
+            layer = Layer(path)
+            self._layers.insert(0, layer)
+            return layer
+
+        def removeLayer(self, layer):
+            self._layers.remove(layer)
+
+    class ArcGISProject(object):
+        _maps = [Map()]
+
+        def __init__(self, path="CURRENT"):
+            self.filePath = path
+
+        def listMaps(self, wildcard=None):
+            return list(self._maps)
+
+    for cls, methods in ((Map, ("listLayers", "addDataFromPath", "removeLayer")),
+                         (ArcGISProject, ("listMaps",))):
+        for m in methods:
+            setattr(cls, m, timed("mp.%s.%s" % (cls.__name__, m))(getattr(cls, m)))
+    mp.Layer = Layer
+    mp.LayerFile = timed("mp.LayerFile")(LayerFile)
+    mp.Map = Map
+    mp.ArcGISProject = timed("mp.ArcGISProject")(ArcGISProject)
+    arcpy.mp = mp
+    return arcpy
+
+#----------------------------------------------------------------------------
+#                          Running a script
+#----------------------------------------------------------------------------
+
+def summary(calls):
+    '''Return [(name, count, total seconds)] of the calls, slowest first.'''
+    totals = {}
+    for name, seconds in calls:
+        count, total = totals.get(name, (0, 0.0))
+        totals[name] = (count + 1, total + seconds)
+    return sorted(((n, c, t) for n, (c, t) in totals.items()), key=lambda r: -r[2])
+
+
+def run(script, params=(), echo=True):
+    '''
+    Run an ArcGIS Pro script with the stand-in as arcpy. Returns the
+    stand-in module, whose calls and messages record the run. Raises
+    ValueError for an ArcMap script (one that uses arcpy.mapping).
+    '''
+    with open(script) as f:
+        if "arcpy.mapping" in f.read():
+            raise ValueError("%s is an ArcMap script; only the ArcGIS Pro script "
+                             "(RemoteLocationXYPro.py) runs with the stand-in" % script)
+    arcpy = make_arcpy(params, echo)
+    saved = dict((name, sys.modules.get(name)) for name in
+                 ("arcpy", "arcpy.management", "arcpy.analysis", "arcpy.conversion", "arcpy.mp"))
+    argv = sys.argv
+    sys.modules.update({"arcpy": arcpy, "arcpy.management": arcpy.management,
+                        "arcpy.analysis": arcpy.analysis, "arcpy.conversion": arcpy.conversion,
+                        "arcpy.mp": arcpy.mp})
+    sys.argv = [os.path.abspath(script)]
+    try:
+        runpy.run_path(script, init_globals={"arcpy": arcpy}, run_name="__main__")
+    finally:
+        sys.argv = argv
+        for name, module in saved.items():
+            if module is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = module
+    return arcpy
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m RemLocXY.standin",
+                                     description="Run an ArcGIS script of the tool headless and time every arcpy call.")
+    parser.add_argument("script", help="RemoteLocationXYPro.py (ArcMap scripts are not supported)")
+    parser.add_argument("values", nargs=10, metavar="lat1 lon1 az1 lat2 lon2 az2 lat3 lon3 az3 dist")
+    parser.add_argument("--workspace", default=os.getcwd(), help="output folder (parameter 11)")
+    parser.add_argument("--name", default="", help="name of the output files (parameter 12)")
+    parser.add_argument("--on-disk", action="store_true", help="write intermediate data to the output folder")
+    parser.add_argument("--trace", default="", help="JSON trace file of the stages (parameter 15)")
+    args = parser.parse_args(argv)
+
+    params = list(args.values) + ["", args.workspace, args.name, "false" if args.on_disk else "", args.trace]
+    start = time.perf_counter()
+    arcpy = run(args.script, params)
+    wall = time.perf_counter() - start
+
+    print("\n%-40s %6s %12s %7s" % ("arcpy call", "calls", "seconds", "share"))
+    for name, count, total in summary(arcpy.calls):
+        print("%-40s %6d %12.6f %6.1f%%" % (name, count, total, 100 * total / wall))
+    print("%-40s %6s %12.6f" % ("run", "", wall))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+'''
+Streaming triangulation of field-sheet CSV files.
+
+The input is a comma separated text file laid out like the tool's txt-file:
+a header row with (at least) the lat1 ... dist columns, then one fix per
+row. It is read and triangulated in chunks of a fixed number of rows and
+every chunk is written out before the next one is read, so memory stays
+flat however large the file is. The output keeps all input columns and has
+Xin, Yin and r filled in (0 where the fix could not be triangulated, as in
+the txt-file of the tool).
+'''
+
+import csv
+import itertools
+
+import numpy as np
+
+from RemLocXY.batch import FIELDS_IN, FIELDS_OUT, triangulate_batch
+
+# Rows per chunk by default
+CHUNKSIZE = 50000
+
+
+def _float(value):
+    try:
+        return float(value)
+    except ValueError:
+        return np.nan
+
+
+def columns(header, fields=FIELDS_IN):
+    '''
+    Return (input column indices, output column indices, output header) for
+    a CSV header with the input fields. Field names are matched case-insensitively, as ArcGIS
+    does; missing Xin, Yin and r columns are appended to the output header.
+    '''
+    lower = [h.strip().lower() for h in header]
+    try:
+        index_in = [lower.index(name.lower()) for name in fields]
+    except ValueError:
+        missing = [name for name in fields if name.lower() not in lower]
+        raise ValueError("Input table has no field(s) " + ", ".join(missing))
+    header_out = list(header)
+    index_out = []
+    for name in FIELDS_OUT:
+        if name.lower() in lower:
+            index_out.append(lower.index(name.lower()))
+        else:
+            index_out.append(len(header_out))
+            header_out.append(name)
+    return index_in, index_out, header_out
+
+
+def bearing_columns(header):
+    '''
+    Return the column indices of the bearings after the third one in a CSV
+    header: lat4, lon4, az4, lat5, ... for as long as all three columns of
+    a bearing are there (matched case-insensitively, as columns does).
+    '''
+    lower = [h.strip().lower() for h in header]
+    index = []
+    k = 4
+    while all(name + str(k) in lower for name in ("lat", "lon", "az")):
+        index += [lower.index(name + str(k)) for name in ("lat", "lon", "az")]
+        k += 1
+    return index
+
+
+def read_chunks(reader, chunksize=CHUNKSIZE):
+    '''Yield lists of at most chunksize rows from a csv reader.'''
+    while True:
+        rows = list(itertools.islice(reader, chunksize))
+        if not rows:
+            return
+        yield rows
+
+
+def parse_rows(rows, index_in):
+    '''Return an (n, len(index_in)) float array of the index_in columns of
+    CSV rows (the lat1 ... dist values).'''
+    width = max(index_in) + 1
+    table = [[row[i] for i in index_in] if len(row) >= width else
+             [row[i] if i < len(row) else "" for i in index_in] for row in rows]
+    try:
+        values = np.array(table, dtype=np.float64)
+    except ValueError:
+        # Empty or broken values: these fixes are reported as not valid
+        values = np.array([[_float(v) for v in row] for row in table], dtype=np.float64)
+    return values.reshape(len(rows), len(index_in))
+
+
+def solve_rows(rows, index_in):
+    '''
+    Triangulate a list of CSV rows (lists of strings). Returns the Batch and
+    an (n, 10) float array of the lat1 ... dist values.
+    '''
+    values = parse_rows(rows, index_in)
+    return triangulate_batch(*values.T), values
+
+
+def fill_rows(rows, result, index_out, width):
+    '''Write Xin, Yin and r of a Batch (or any result with valid, Xin, Yin
+    and R) into the CSV rows (in place).'''
+    valid = result.valid
+    Xin = np.where(valid, result.Xin, 0).tolist()
+    Yin = np.where(valid, result.Yin, 0).tolist()
+    R = np.where(valid, result.R, 0).tolist()
+    for row, values in zip(rows, zip(Xin, Yin, R)):
+        if len(row) < width:
+            row.extend([""] * (width - len(row)))
+        for i, v in zip(index_out, values):
+            row[i] = v
+    return rows
+
+
+def triangulate_csv(src, dst, chunksize=CHUNKSIZE):
+    '''
+    Triangulate every fix of the CSV file src and write the result to dst.
+    Returns (number of fixes, number of valid fixes).
+    '''
+    total = 0
+    valid = 0
+    with open(src, newline="") as fin, open(dst, "w", newline="") as fout:
+        reader = csv.reader(fin)
+        writer = csv.writer(fout)
+        index_in, index_out, header_out = columns(next(reader))
+        writer.writerow(header_out)
+        for rows in read_chunks(reader, chunksize):
+            result, _ = solve_rows(rows, index_in)
+            writer.writerows(fill_rows(rows, result, index_out, len(header_out)))
+            total += len(rows)
+            valid += int(result.valid.sum())
+    return total, valid
@@ -0,0 +1,168 @@
+'''
+Vectorized transverse Mercator projection for WGS84 / UTM.
+
+Same Krueger series as RemLocXY.utm, but on NumPy arrays. The series are
+summed on the complex coordinate zeta = xi + i*eta by Horner's rule in
+cos 2z, whose cosine and sine follow from t and the longitude without any
+complex function. Points are projected BLOCK at a time so the temporaries
+stay in the cache: about 0.1 s per million points each way (forward with
+gamma and k), against 0.25 s for whole-array complex sines. Every point
+may be in its own zone, so a batch whose observation points span several
+zones is projected in one call.
+'''
+
+import numpy as np
+
+from RemLocXY import utm
+
+# Points projected per block, so the temporaries of a block stay in the CPU cache
+BLOCK = 16384
+
+_kA = utm.k0 * utm.A
+_kAa = utm.k0 * utm.A / utm.a
+_e1 = (1 - utm.n) / (1 + utm.n)
+
+
+def _horner(coef):
+    '''
+    Horner coefficients of sum c_j sin(2jz) / sin(2z) and of the derivative
+    sum 2j c_j cos(2jz), both as polynomials in c = cos(2z).
+    '''
+    c1, c2, c3 = coef
+    g1, g2, g3 = 2 * c1, 4 * c2, 6 * c3
+    return (c1 - c3, 2 * c2, 4 * c3), (-g2, g1 - 3 * g3, 2 * g2, 4 * g3)
+
+
+_ALPHA, _DALPHA = _horner(utm.alpha)
+_BETA, _ = _horner(utm.beta)
+_DELTA, _ = _horner(utm.delta)
+
+
+def zone(lat, lon):
+    '''Vectorized utm.zone: returns (zone numbers, north flags) of points.'''
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    ## (points with missing values get zone 1)
+    number = np.floor(np.nan_to_num((lon + 180) / 6)).astype(np.int64) + 1
+    return number, lat > 0
+
+
+def _constants(number, north):
+    '''Central meridian and false northing of scalar or per-point zones.'''
+    if np.ndim(number) == 0 and np.ndim(north) == 0:
+        return utm.central_meridian(int(number)), 0.0 if north else utm.N0_SOUTH
+    return np.asarray(number) * 6 - 183, np.where(north, 0.0, utm.N0_SOUTH)
+
+
+def _complex(re, im):
+    '''Complex array re + i*im without the temporaries of the expression.'''
+    z = np.empty(np.shape(re), dtype=np.complex128)
+    z.real = re
+    z.imag = im
+    return z
+
+
+def _blocks(f, *arrays):
+    '''Apply f to arrays (broadcast together) BLOCK points at a time.'''
+    if max(np.size(a) for a in arrays) <= BLOCK:
+        return f(*arrays)
+    arrays = np.broadcast_arrays(*arrays)
+    shape = arrays[0].shape
+    flat = [a.reshape(-1) for a in arrays]
+    size = len(flat[0])
+    out = None
+    for start in range(0, size, BLOCK):
+        part = f(*(a[start:start + BLOCK] for a in flat))
+        if out is None:
+            out = [np.empty(size, dtype=v.dtype) for v in part]
+        for o, v in zip(out, part):
+            o[start:start + BLOCK] = v
+    return tuple(o.reshape(shape) for o in out)
+
+
+def forward(lat, lon, number=None, north=None):
+    '''
+    Project WGS84 decimal degrees to UTM.
+
+    number and north give the zone of every point (scalars or arrays); if
+    number is None each point is projected into its own zone. Returns
+    (X, Y, gamma, k) as in utm.forward.
+    '''
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    if number is None:
+        number, north = zone(lat, lon)
+    return _blocks(_forward, lat, lon, *_constants(number, north))
+
+
+def _forward(lat, lon, lon0, N0):
+    phi = np.radians(lat)
+    dlon = np.radians(lon - lon0)
+    sinphi = np.sin(phi)
+    t = np.sinh(np.arctanh(sinphi) - utm.e * np.arctanh(utm.e * sinphi))
+    cosl = np.cos(dlon)
+    sinl = np.sin(dlon)
+    tt = t * t
+    st = np.sqrt(1 + tt)
+    z = _complex(np.arctan2(t, cosl), np.arctanh(sinl / st))
+
+    ## cos and sin of 2z without complex functions: with D = t^2 + cos^2(l),
+    ## cos 2xi' = (cos^2 l - t^2) / D, sin 2xi' = 2 t cos l / D,
+    ## cosh 2eta' = (1 + t^2 + sin^2 l) / D and sinh 2eta' = 2 st sin l / D
+    D = tt + cosl * cosl
+    D2 = D * D
+    ch = 1 + tt + sinl * sinl
+    sh = 2 * st * sinl
+    cx = cosl * cosl - tt
+    sx = 2 * t * cosl
+    c2 = _complex(cx * ch / D2, -(sx * sh) / D2)
+    s2 = _complex(sx * ch / D2, cx * sh / D2)
+
+    # Sum the series by Horner's rule in cos 2z
+    p0, p1, p2 = _ALPHA
+    zeta = z + s2 * (p0 + c2 * (p1 + p2 * c2))
+    q0, q1, q2, q3 = _DALPHA
+    dz = (1 + q0) + c2 * (q1 + c2 * (q2 + q3 * c2))
+    sigma = dz.real
+    tau = -dz.imag
+
+    X = utm.E0 + _kA * zeta.imag
+    Y = _kA * zeta.real + N0
+    tanl = np.tan(dlon)
+    gamma = np.degrees(np.arctan2(tau * st + sigma * t * tanl, sigma * st - tau * t * tanl))
+    k = _kAa * np.sqrt((1 + (_e1 * np.tan(phi))**2) * (sigma * sigma + tau * tau) / D)
+    return X, Y, gamma, k
+
+
+def inverse(X, Y, number, north):
+    '''Return (lat, lon) in WGS84 decimal degrees of UTM coordinates.'''
+    X = np.asarray(X, dtype=np.float64)
+    Y = np.asarray(Y, dtype=np.float64)
+    return _blocks(_inverse, X, Y, *_constants(number, north))
+
+
+def _inverse(X, Y, lon0, N0):
+    xi = (Y - N0) / _kA
+    eta = (X - utm.E0) / _kA
+    c, s = np.cos(2 * xi), np.sin(2 * xi)
+    ch, sh = np.cosh(2 * eta), np.sinh(2 * eta)
+    c2 = _complex(c * ch, -s * sh)
+    s2 = _complex(s * ch, c * sh)
+    p0, p1, p2 = _BETA
+    z1 = _complex(xi, eta) - s2 * (p0 + c2 * (p1 + p2 * c2))
+    xi1 = z1.real
+    eta1 = z1.imag
+
+    ## sin chi = sin xi1 / cosh eta1 and chi is within +-90 degrees
+    sinchi = np.sin(xi1) / np.cosh(eta1)
+    coschi = np.sqrt(1 - sinchi * sinchi)
+    c2 = 1 - 2 * sinchi * sinchi
+    p0, p1, p2 = _DELTA
+    phi = np.arcsin(sinchi) + 2 * sinchi * coschi * (p0 + c2 * (p1 + p2 * c2))
+    lon = lon0 + np.degrees(np.arctan2(np.sinh(eta1), np.cos(xi1)))
+    return np.degrees(phi), lon
+
+
+def epsg(number, north):
+    '''Vectorized utm.epsg.'''
+    return np.where(north, 32600, 32700) + np.asarray(number)
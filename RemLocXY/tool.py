@@ -0,0 +1,369 @@
+'''
+Flow of the ArcGIS Pro tool (RemoteLocationXYPro.py).
+
+main() reads the tool parameters, triangulates the fix with RemLocXY.solver
+and writes and displays the outputs. arcpy is imported when main() runs, not
+when this module is imported, so the rest of the package stays free of it.
+
+The outputs are added to the map and styled together by display() at the
+end of a run (or of a batch of runs), with the symbology of the lyr-files
+in RemLocStyles loaded once per session.
+'''
+
+import csv, os, time
+
+from RemLocXY import precheck, records, solver, trace
+
+# Folder of the scripts and the toolbox. It is required for creating path to the templates (*.lyr-files) of symbology
+relatpath = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+# Output layer name -> (lyr-file in RemLocStyles, label expression, transparency)
+## If you do not like the default symbology of a layer you can change its lyr-file as you wish and it will be used as a new default template
+STYLES = {"ObservationPoints": ("startpoints.lyr", '"<CLR red=\'178\' green=\'178\' blue=\'178\'><FNT size = \'9\'>"&[dist]&"</FNT></CLR>"', None),
+          "ObservationLines": ("lines.lyr", None, None),
+          "ObjectLocation": ("objectloc.lyr", '"<CLR red=\'178\' green=\'178\' blue=\'178\'><FNT size = \'9\'>" & "X "& [Xin] &vbCrLf&"Y "& [Yin] &vbCrLf& "Error = "& round( [r], 1)&" m" & "</FNT></CLR>"', None),
+          "Accuracy": ("buffer.lyr", None, 70)}
+
+# Symbology of the lyr-files loaded in this session: path -> (modification time, symbology)
+_symbology = {}
+
+#----------------------------------------------------------------------------
+#                                 Display
+#----------------------------------------------------------------------------
+
+def symbology(arcpy, name):
+    '''
+    Symbology of the template of output layer name, read from its lyr-file
+    once and cached for the session (again only if the file is changed).
+    Returns None if the lyr-file can not be read.
+    '''
+    stylepath = os.path.join(relatpath, "RemLocStyles", STYLES[name][0])
+    try:
+        mtime = os.path.getmtime(stylepath)
+        cached = _symbology.get(stylepath)
+        if cached is None or cached[0] != mtime:
+            cached = _symbology[stylepath] = (mtime, arcpy.mp.LayerFile(stylepath).listLayers()[0].symbology)
+        return cached[1]
+    except:
+        return None
+
+
+def clear(arcpy, df, workspace):
+    '''Remove the layers of earlier runs (data in workspace) from the map df.'''
+    ## Collect the layers whose workspacePath is our folder path in one walk of the map, then delete them
+    old = []
+    for lyr in df.listLayers():
+        try:
+            if lyr.workspacePath == workspace:
+                old.append(lyr)
+        except:
+            arcpy.AddWarning("Web based layer left on map.")
+    for lyr in old:
+        df.removeLayer(lyr)
+    return len(old)
+
+
+def display(arcpy, df, outputs):
+    '''
+    Show outputs, a list of (layer name, path) of a run or of a whole batch,
+    in the map df in one pass: every output is added and styled from the
+    cached template of its layer name. Returns the new layers.
+    '''
+    layers = []
+    for name, path in outputs:
+        layer = df.addDataFromPath(path)
+        layers.append(layer)
+        try:
+            style = symbology(arcpy, name)
+            if style is None:
+                raise IOError(STYLES[name][0])
+            layer.symbology = style
+            label, transparency = STYLES[name][1:]
+            if label:
+                layer.showLabels = True # switching on of the labels
+                for lblClass in layer.listLabelClasses():
+                    lblClass.expressionEngine = "VBScript"
+                    lblClass.expression = label # here you can change color and size of the labels
+                    lblClass.visible = True
+            if transparency is not None:
+                layer.transparency = transparency # e.g. 70% for the "Accuracy" layer
+        except:
+            ### if the symbology hasn't been changed it means the pattern of the layer hasn't been found
+            arcpy.AddWarning("\n*.lyr-pattern of the \"" + name + "\" layer hasn't been found.\n  The symbology has been set by default.\n")
+    return layers
+
+
+def main(arcpy=None):
+    '''Run the tool; arcpy defaults to the arcpy module of ArcGIS Pro.'''
+    if arcpy is None:
+        import arcpy
+
+    arcpy.AddWarning("Triangulate the XY of Remote Location\nCopyright (C) 2014  International Crane Foundation\n")
+    arcpy.AddWarning("This program is free software: you can redistribute it and or modify\nit under the terms of the GNU General Public License as published by \nthe Free Software Foundation, either version 3 of the License, or\nany later version.\n")
+    arcpy.AddWarning("This program is distributed in the hope that it will be useful,\nbut WITHOUT ANY WARRANTY; without even the implied warranty of \nMERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the \nGNU General Public License for more details. \n\nYou should have received a copy of the GNU General Public License\nalong with this program.  If not, see <http://www.gnu.org/licenses/>.\n")
+
+    # Start the clock for the run time report
+    startTime = time.time()
+
+    # Time every stage into the JSON trace file of parameter 15 (optional)
+    try:
+        tracer = trace.tracer(arcpy.GetParameterAsText(14))
+    except:
+        tracer = trace.tracer(None)
+
+    #----------------------------------------------------------------------------
+    #                            Workspace
+    #----------------------------------------------------------------------------
+    tracer.stage("Workspace")
+
+    # Choose path and folder or create "C:\Temp_RemLocXY" as a workspace by default
+    TempDir = arcpy.GetParameterAsText(11)
+    if TempDir == '#' or not TempDir: 
+        if not os.path.exists("C:\\Temp_RemLocXY"):  # provide the
+            os.makedirs("C:\\Temp_RemLocXY")         # default path
+        TempDir = "C:\\Temp_RemLocXY"                # if unspecified
+        
+    # Set current workspace
+    arcpy.env.scratchWorkspace = TempDir         
+    arcpy.env.workspace = TempDir
+    tracer.folder = TempDir
+
+    # Keep intermediate data in the "memory" workspace instead of TempDir (default);
+    # only the final outputs are written to disk then
+    try:
+        inMemory = arcpy.GetParameterAsText(13).lower() not in ("false", "0")
+    except:
+        inMemory = True
+    if inMemory:
+        IntermedDir = "memory"
+        IntermedExt = ""
+    else:
+        IntermedDir = str(TempDir)
+        IntermedExt = ".shp"
+
+    # Define Spatial Reference for WGS84
+    wgs = arcpy.SpatialReference(4326)
+
+    #----------------------------------------------------------------------------
+    #                   Create Txt-File and Input Data
+    #----------------------------------------------------------------------------
+    tracer.stage("Create Txt-File")
+
+    # Input name of the file or set "RemoteLocationXY" by default
+    name = arcpy.GetParameterAsText(12)
+    if name == '#' or not name: 
+        name = "RemoteLocationXY"
+    filename = name + ".txt"
+    filepath = os.path.join(TempDir, filename)   # Provide filepath
+
+    # Make the first row a list of the field names
+    fields = ["lat1","lon1","az1","lat2","lon2","az2","lat3","lon3","az3","dist","Xin","Yin","r"]
+
+    # Get the parameters via user input
+    lat1 = arcpy.GetParameterAsText(0)
+    lon1 = arcpy.GetParameterAsText(1)
+    az1 = arcpy.GetParameterAsText(2)
+    lat2 = arcpy.GetParameterAsText(3)
+    lon2 = arcpy.GetParameterAsText(4)
+    az2 = arcpy.GetParameterAsText(5)
+    lat3 = arcpy.GetParameterAsText(6)
+    lon3 = arcpy.GetParameterAsText(7)
+    az3 = arcpy.GetParameterAsText(8)
+    dist = arcpy.GetParameterAsText(9)
+    table = arcpy.SetParameter(10, filepath)
+
+    # Keep the fix in a record (RemLocXY.records); Xin, Yin and r are nought until there is a location
+    record = records.Fix(lat1,lon1,az1,lat2,lon2,az2,lat3,lon3,az3,dist)
+
+    # Make the second row a list of the parameters
+    row_input = record.row()
+     
+    # Write the CSV file
+    with open(filepath,"w") as f:
+            writer = csv.writer(f)     
+            write = writer.writerow
+            write(fields)
+            write(row_input)
+    f.close()
+
+    #----------------------------------------------------------------------------
+    #                      Pre-check of the Geometry
+    #----------------------------------------------------------------------------
+    tracer.stage("Pre-check")
+
+    # Classify the fix before any geoprocessing and report a bad one at once
+    ## The observation points and lines are still drawn, so the bearings can be checked
+    record.status = int(precheck.check(*record.values()))
+    if record.status != precheck.OK:
+        arcpy.AddWarning("\nPre-check: " + precheck.message(record.status) + "\n")
+
+
+    #----------------------------------------------------------------------------
+    #                  Overwrite Existing Maplayers
+    #----------------------------------------------------------------------------
+    tracer.stage("Overwrite Existing Maplayers")
+
+    # Enable the ability to overwrite existing data
+    arcpy.env.overwriteOutput = True
+
+    # Do not add the intermediate results of the tools to the map; the outputs are displayed together at the end
+    arcpy.env.addOutputsToMap = False
+
+    # Get the map document
+    mxd = arcpy.mp.ArcGISProject("CURRENT")
+
+    # Get the data frame
+    df = mxd.listMaps("*")[0]
+
+    # Clean up old layers created during previous Visualizations, so their files can be overwritten
+    clear(arcpy, df, TempDir)
+
+    # Outputs to display as (layer name, path)
+    outputs = []
+         
+    #----------------------------------------------------------------------------
+    #         Create and Display Lines and Points of Observations
+    #----------------------------------------------------------------------------
+    tracer.stage("Create and Display Lines")
+
+    # Set local variables
+    ## Were using a Concatenate to make the path of the folderpath
+    ## This combines the filename and filepath so the OS can read it.
+    line_1 = os.path.join(IntermedDir,"line_1"+IntermedExt)
+    line_2 = os.path.join(IntermedDir,"line_2"+IntermedExt)
+    line_3 = os.path.join(IntermedDir,"line_3"+IntermedExt)
+    lines = os.path.join(str(TempDir),"ObservationLines.shp")
+    ## XY event layers are layers of the txt-file, not data: they get a layer name, no path
+    startpoint_1 = "ObsPoint1"
+    startpoint_2 = "ObsPoint2"
+    startpoint_3 = "ObsPoint3"
+    startpoints = os.path.join(str(TempDir),"ObservationPoints.shp")
+
+    # Create lines and points
+    ## Process: bearings and distances to lines
+    arcpy.management.BearingDistanceToLine(filepath, line_1, "lon1", "lat1", "dist", "METERS", "az1", "DEGREES", "GEODESIC", "", wgs)
+    arcpy.management.BearingDistanceToLine(filepath, line_2, "lon2", "lat2", "dist", "METERS", "az2", "DEGREES", "GEODESIC", "", wgs)
+    arcpy.management.BearingDistanceToLine(filepath, line_3, "lon3", "lat3", "dist", "METERS", "az3", "DEGREES", "GEODESIC", "", wgs)
+
+    ## Make XY Event Layers: creating of start points in WGS84 using inputed data
+    arcpy.management.MakeXYEventLayer(filepath, "lon1", "lat1", startpoint_1, wgs, "")
+    arcpy.management.MakeXYEventLayer(filepath, "lon2", "lat2", startpoint_2, wgs, "")
+    arcpy.management.MakeXYEventLayer(filepath, "lon3", "lat3", startpoint_3, wgs, "")
+
+    ## Merge all points and all lines in two layers by geometry type
+    arcpy.management.Merge([startpoint_1,startpoint_2,startpoint_3],startpoints)
+    arcpy.management.Merge([line_1,line_2,line_3],lines)
+
+    # Change tables of the new layers
+    ## Delete fields excluding "dist" field and use it as the field of "distingush" for setting of unique symbology
+    ## Calculate ID of "dist" fields
+    arcpy.management.DeleteField(lines,["lat1","lon1","az1","lat2","lon2","az2","lat3","lon3","az3"])
+    arcpy.management.CalculateField(lines, "dist", "!FID!+1", "PYTHON", "")
+    arcpy.management.DeleteField(startpoints,["lat1","lon1","az1","lat2","lon2","az2","lat3","lon3","az3","Xin","Yin","r"])
+    arcpy.management.CalculateField(startpoints, "dist", "!FID!+1", "PYTHON", "")
+
+    ## Display the outputs at the end of the run
+    outputs.append(("ObservationLines", lines))
+    outputs.append(("ObservationPoints", startpoints))
+
+    #----------------------------------------------------------------------------
+    #          Get Points of Intersection and Check Triangulation
+    #----------------------------------------------------------------------------
+    tracer.stage("Get Points of Intersection")
+
+    # Find intersections of line_1, line_2 and line_3, the incenter and the error
+    ## The math runs in-process (RemLocXY.solver); arcpy is only used for display
+    fix = record.triangulate()
+
+    ## Make sure, every pair of lines has a point of intersection
+    for (i, j), XY in zip(solver.PAIRS, (fix.XY1, fix.XY2, fix.XY3)):
+        if XY is None:
+            # If it is false then print the warning:
+            arcpy.AddWarning("\nObservation lines #" + str(i) + " and #" + str(j) + " do not intersect.\nThe triangulation is invalid!\n")
+
+    #----------------------------------------------------------------------------
+    # If There is a Triangle then find The Center and The Radius of The Incircle
+    #----------------------------------------------------------------------------
+    tracer.stage("Incircle")
+
+    # If there are all three points then display the incenter and error of the measurements
+    IntersectionCount = fix.IntersectionCount
+    if IntersectionCount == 3:
+        # Coordinates of incenter (WGS84) and the error of the measurement (it equals R of incircle)
+        Xin = record.Xin
+        Yin = record.Yin
+        R = record.r
+
+        ## Rewrite the coordinates of incenter in the inputed txt-file
+        row_output = record.row()
+        with open(filepath,"w") as f:
+            writer = csv.writer(f)     
+            write = writer.writerow
+            write(fields)
+            write(row_output)
+        f.close()
+
+        # Make XY event layer of the incenter and save it
+        Incenter_XY = "ObjectsLocation_XY"
+        arcpy.management.MakeXYEventLayer(filepath, "Xin", "Yin", Incenter_XY, wgs)
+        Incenter = os.path.join(str(TempDir),"ObjectLocation.shp") 
+        arcpy.management.CopyFeatures(Incenter_XY, Incenter)
+
+        outputs.append(("ObjectLocation", Incenter))
+        
+        # Export txt-file to Excel table
+        tracer.stage("Excel Table")
+        name_xls = name + '.xls'
+        output_xls = os.path.join(TempDir, name_xls)
+        arcpy.conversion.TableToExcel(Incenter, output_xls)
+
+        ## Add result message in processing box
+        arcpy.AddMessage("\nObject Location: \n" + "X " + str(Xin) + ", Y " + str(Yin) + " (in WGS-84)" + "\nEst. Error = " + str(R) + " meters \n")
+
+        # Create buffer of errors around of the incenter; radius of the buffer equal the radius of the incircle (R)
+        tracer.stage("Accuracy Buffer")
+        bufferror = os.path.join(str(TempDir),"Accuracy.shp")
+        arcpy.analysis.Buffer(Incenter, bufferror, str(R) + " Meters", "FULL", "ROUND", "NONE", "")
+        outputs.append(("Accuracy", bufferror))
+        
+        # Delete intermediate files
+        tracer.stage("Delete Intermediate Data")
+        ## Check to see if intermediate data exist; if they do, then delete them
+        intermed = [line_1,line_2,line_3,startpoint_1,startpoint_2,startpoint_3,Incenter_XY]
+        for intermed in intermed:
+            if arcpy.Exists(intermed):
+                arcpy.management.Delete(intermed)
+
+    else:
+        # Print error message in processing box:
+        arcpy.AddWarning("There is insufficient or wrong data for build of triangle, deriving coordinates\nof observed object and estimation of error of the measurements\n")
+        
+        # Delete intermediate files
+        tracer.stage("Delete Intermediate Data")
+        ## Check to see if intermediate data exist; if they do, then delete them
+        intermed = [line_1,line_2,line_3,startpoint_1,startpoint_2,startpoint_3]
+        for intermed in intermed:
+            if arcpy.Exists(intermed):
+                arcpy.management.Delete(intermed)
+
+    #----------------------------------------------------------------------------
+    #                        Display the Outputs
+    #----------------------------------------------------------------------------
+    tracer.stage("Display")
+
+    # Add all outputs, styled from the cached lyr-files, in one map update
+    display(arcpy, df, outputs)
+
+    #----------------------------------------------------------------------------
+    #                               Run Time
+    #----------------------------------------------------------------------------
+    tracer.stage("Run Time")
+
+    # Report the run time of this run and where its intermediate data were kept
+    runTime = time.time() - startTime
+    mode = "memory" if inMemory else "disk"
+    arcpy.AddMessage("Run time: " + str(round(runTime, 2)) + " s (intermediate data on " + mode + ")")
+
+    # Write the trace file and report the time of every stage
+    if tracer.enabled:
+        arcpy.AddMessage(tracer.finish())
@@ -0,0 +1,104 @@
+'''
+Per-stage timing of a run of the tool.
+
+The script calls tracer.stage(name) at the start of every section (the
+banner comments of RemoteLocationXYPro.py) and tracer.finish() at the end.
+Every stage becomes a span with its wall time, CPU time and the files and
+bytes written to the output folder while it ran. The spans are saved to a
+JSON trace file and summed up in one line for the process log.
+
+tracer(None) returns a tracer whose methods do nothing, so tracing costs
+nothing when it is disabled.
+'''
+
+import datetime
+import json
+import os
+import time
+
+
+class NullTracer(object):
+    '''Tracer used when tracing is disabled.'''
+
+    enabled = False
+
+    def stage(self, name):
+        pass
+
+    def finish(self):
+        return None
+
+
+class Tracer(object):
+    '''
+    Records stage spans. folder is the output folder whose files are
+    counted; path is the JSON trace file written by finish().
+    '''
+
+    enabled = True
+
+    def __init__(self, path, folder=None):
+        self.path = path
+        self.folder = folder
+        self.spans = []
+        self.started = datetime.datetime.now().isoformat(timespec="seconds")
+        self._t0 = time.perf_counter()
+        self._c0 = time.process_time()
+        self._current = None
+
+    def _written(self, since):
+        '''Number and bytes of the files in the output folder modified since since (ns).'''
+        files = 0
+        size = 0
+        if self.folder and os.path.isdir(self.folder):
+            for entry in os.scandir(self.folder):
+                if entry.is_file():
+                    st = entry.stat()
+                    if st.st_mtime_ns >= since:
+                        files += 1
+                        size += st.st_size
+        return files, size
+
+    def _close(self):
+        if self._current is None:
+            return
+        name, wall, cpu, since = self._current
+        files, size = self._written(since)
+        self.spans.append({"stage": name,
+                           "start": wall - self._t0,
+                           "wall": time.perf_counter() - wall,
+                           "cpu": time.process_time() - cpu,
+                           "files": files,
+                           "bytes": size})
+        self._current = None
+
+    def stage(self, name):
+        '''End the current stage and start the next one.'''
+        self._close()
+        self._current = (name, time.perf_counter(), time.process_time(), time.time_ns())
+
+    def summary(self):
+        '''One line: total time and the time of every stage.'''
+        total = time.perf_counter() - self._t0
+        return "Stages (s): " + ", ".join("%s %.3f" % (s["stage"], s["wall"]) for s in self.spans) + \
+            "; total %.3f" % total
+
+    def finish(self):
+        '''End the last stage, write the trace file and return the summary.'''
+        self._close()
+        trace = {"started": self.started,
+                 "wall": time.perf_counter() - self._t0,
+                 "cpu": time.process_time() - self._c0,
+                 "folder": self.folder,
+                 "spans": self.spans}
+        if self.path:
+            with open(self.path, "w") as f:
+                json.dump(trace, f, indent=1)
+        return self.summary()
+
+
+def tracer(path, folder=None):
+    '''Return a Tracer writing to path, or a NullTracer if path is empty.'''
+    if not path or path == "#":
+        return NullTracer()
+    return Tracer(path, folder)
@@ -0,0 +1,279 @@
+'''
+Incremental track filtering of the fixes of tagged animals.
+
+Fixes of one animal are a time series. Tracks keeps a constant-velocity
+Kalman filter per animal (state X, Y, vx, vy on the UTM grid of the
+animal's first fix) and updates it with every new location and its error
+(the incircle radius R as a standard deviation, or a 2 x 2 covariance)
+in O(1) per fix, for many animals at once:
+
+    tracks = Tracks(lag=5)
+    filtered, smoothed = tracks.update(animal, time, Xin, Yin, R)
+    ...
+    last = tracks.flush()
+
+With lag > 0 a fixed-lag Rauch-Tung-Striebel smoother runs over the last
+lag fixes of every animal: each update also returns the smoothed state of
+the fix lag steps back, and flush returns the rest. Only that window of
+the history is kept, so the cost per fix does not grow with the track.
+'''
+
+from collections import namedtuple
+
+import numpy as np
+
+from RemLocXY import tmerc
+
+# Spectral density of the random acceleration (m^2/s^3)
+ACCELERATION = 0.05
+# Standard deviation of the unknown speed at the first fix (m/s)
+VELOCITY_SD = 10.0
+# Smallest standard deviation of a location (m); R is 0 for perfect triangles
+MIN_SD = 1.0
+
+State = namedtuple("State", ["animal", "index", "time", "Xin", "Yin", "X_UTM", "Y_UTM",
+                             "vx", "vy", "cov", "zone", "north"])
+State.__doc__ = '''
+Filtered or smoothed states; every member has one row per fix.
+
+animal            animal ID of the fix
+index             number of the fix in the animal's track (from 0)
+time              time of the fix (seconds)
+Xin, Yin          location in WGS84 (lon, lat)
+X_UTM, Y_UTM      location in the UTM zone of the animal
+vx, vy            velocity east and north on the grid (m/s)
+cov               (fixes, 4, 4) covariance of X, Y, vx, vy
+zone, north       UTM zone of the animal
+'''
+
+
+def _seconds(t):
+    t = np.asarray(t)
+    if t.dtype.kind == "M":
+        return t.astype("datetime64[ns]").astype(np.int64) / 1e9
+    return t.astype(np.float64)
+
+
+def _transition(dt, q):
+    '''F and Q of the constant-velocity model for (n,) time steps.'''
+    n = len(dt)
+    F = np.tile(np.eye(4), (n, 1, 1))
+    F[:, 0, 2] = dt
+    F[:, 1, 3] = dt
+    Q = np.zeros((n, 4, 4))
+    d3 = q * dt**3 / 3
+    d2 = q * dt**2 / 2
+    for i in (0, 1):
+        Q[:, i, i] = d3
+        Q[:, i, i + 2] = d2
+        Q[:, i + 2, i] = d2
+        Q[:, i + 2, i + 2] = q * dt
+    return F, Q
+
+
+def _mul(A, B):
+    return np.einsum("...ij,...jk->...ik", A, B)
+
+
+def _t(A):
+    return np.swapaxes(A, -1, -2)
+
+
+class Tracks(object):
+    '''
+    Kalman filter states of many animals. lag is the number of fixes the
+    smoother looks ahead (0: filter only); q the acceleration density.
+    '''
+
+    def __init__(self, lag=0, q=ACCELERATION, velocity_sd=VELOCITY_SD, capacity=16):
+        self.lag = int(lag)
+        self.q = float(q)
+        self.velocity_sd = float(velocity_sd)
+        self.slots = {}
+        self.animals = []
+        w = self.lag + 1
+        self.count = np.zeros(capacity, dtype=np.int64)
+        ## Fixes of every animal whose smoothed state has been returned
+        self.done = np.zeros(capacity, dtype=np.int64)
+        self.time = np.zeros(capacity)
+        self.zone = np.zeros(capacity, dtype=np.int64)
+        self.north = np.zeros(capacity, dtype=bool)
+        ## Window of the last lag + 1 fixes: filtered state and covariance,
+        ## and the prediction (with its transition) that led to them
+        self.xf = np.zeros((capacity, w, 4))
+        self.Pf = np.zeros((capacity, w, 4, 4))
+        self.xp = np.zeros((capacity, w, 4))
+        self.Pp = np.zeros((capacity, w, 4, 4))
+        self.F = np.zeros((capacity, w, 4, 4))
+        self.t = np.zeros((capacity, w))
+
+    def __len__(self):
+        return len(self.animals)
+
+    def _grow(self, size):
+        capacity = len(self.count)
+        if size <= capacity:
+            return
+        new = max(size, 2 * capacity)
+        for name in ("count", "done", "time", "zone", "north", "xf", "Pf", "xp", "Pp", "F", "t"):
+            old = getattr(self, name)
+            arr = np.zeros((new,) + old.shape[1:], dtype=old.dtype)
+            arr[:capacity] = old
+            setattr(self, name, arr)
+
+    def _slot(self, animal):
+        slot = self.slots.get(animal)
+        if slot is None:
+            slot = self.slots[animal] = len(self.animals)
+            self.animals.append(animal)
+            self._grow(len(self.animals))
+        return slot
+
+    def update(self, animal, time, Xin, Yin, R=None, cov=None):
+        '''
+        Add fixes: animal IDs, times (seconds or datetime64), locations in
+        WGS84 and their error as a standard deviation R (meters) or an
+        (n, 2, 2) covariance cov (m^2). Fixes of an animal must come in
+        time order. Returns (filtered, smoothed) States; smoothed holds the
+        fixes lag steps back of the animals that have that many.
+        '''
+        animal = list(animal)
+        n = len(animal)
+        time = np.broadcast_to(_seconds(time), (n,))
+        Xin = np.broadcast_to(np.asarray(Xin, dtype=np.float64), (n,))
+        Yin = np.broadcast_to(np.asarray(Yin, dtype=np.float64), (n,))
+        if cov is None:
+            sd = np.maximum(np.broadcast_to(np.asarray(R, dtype=np.float64), (n,)), MIN_SD)
+            cov = np.eye(2) * (sd * sd)[:, None, None]
+        cov = np.broadcast_to(np.asarray(cov, dtype=np.float64), (n, 2, 2))
+        slot = np.array([self._slot(a) for a in animal], dtype=np.int64)
+
+        ## Fixes of the same animal in one call are taken in rounds, in order
+        rank = np.zeros(n, dtype=np.int64)
+        seen = {}
+        for i, s in enumerate(slot.tolist()):
+            rank[i] = seen.get(s, 0)
+            seen[s] = rank[i] + 1
+        filtered = []
+        smoothed = []
+        for r in range(int(rank.max(initial=-1)) + 1):
+            rows = np.nonzero(rank == r)[0]
+            f, s = self._update(slot[rows], time[rows], Xin[rows], Yin[rows], cov[rows])
+            filtered.append((rows, f))
+            smoothed.append(s)
+        return self._merge(filtered, n), self._concat(smoothed)
+
+    def _update(self, slot, time, Xin, Yin, cov):
+        first = self.count[slot] == 0
+        ## The first fix of an animal fixes its UTM zone
+        if first.any():
+            z, h = tmerc.zone(Yin[first], Xin[first])
+            self.zone[slot[first]] = z
+            self.north[slot[first]] = h
+        zone = self.zone[slot]
+        north = self.north[slot]
+        X, Y, _, _ = tmerc.forward(Yin, Xin, zone, north)
+        z = np.stack([X, Y], axis=-1)
+
+        # Predict from the last state of every animal
+        w = self.lag
+        dt = np.where(first, 0.0, time - self.time[slot])
+        if (dt < 0).any():
+            raise ValueError("Fixes of an animal must be added in time order")
+        F, Q = _transition(dt, self.q)
+        x = self.xf[slot, w]
+        P = self.Pf[slot, w]
+        xp = np.einsum("nij,nj->ni", F, x)
+        Pp = _mul(_mul(F, P), _t(F)) + Q
+        ## No prior for the first fix: position from the fix, unknown speed
+        xp[first] = 0.0
+        Pp[first] = np.diag([1e12, 1e12, self.velocity_sd**2, self.velocity_sd**2])
+        xp[first, :2] = z[first]
+
+        # Update with the location
+        S = Pp[:, :2, :2] + cov
+        K = _mul(Pp[:, :, :2], np.linalg.inv(S))
+        xf = xp + np.einsum("nij,nj->ni", K, z - xp[:, :2])
+        Pf = Pp - _mul(K, Pp[:, :2, :])
+        Pf = (Pf + _t(Pf)) / 2
+
+        # Shift the window of every animal and store the new fix
+        for name, value in (("xf", xf), ("Pf", Pf), ("xp", xp), ("Pp", Pp), ("F", F), ("t", time)):
+            buf = getattr(self, name)
+            buf[slot, :-1] = buf[slot, 1:]
+            buf[slot, -1] = value
+        self.time[slot] = time
+        index = self.count[slot].copy()
+        self.count[slot] += 1
+        filtered = self._state(slot, index, time, xf, Pf)
+
+        # Fixed-lag smoothing of the fix lag steps back
+        smoothed = None
+        if w:
+            ## (fixes that flush returned already are not returned again)
+            ready = np.nonzero((self.count[slot] > w) & (index - w >= self.done[slot]))[0]
+            if len(ready):
+                s = slot[ready]
+                xs, Ps = self._smooth(s, w)
+                smoothed = self._state(s, index[ready] - w, self.t[s, 0], xs, Ps)
+                self.done[s] = index[ready] - w + 1
+        return filtered, smoothed
+
+    def _smooth(self, slot, steps):
+        '''RTS backward pass over the last steps + 1 window entries; returns
+        the smoothed state and covariance of the oldest of them.'''
+        xs = self.xf[slot, -1]
+        Ps = self.Pf[slot, -1]
+        for k in range(self.lag - 1, self.lag - 1 - steps, -1):
+            C = _mul(self.Pf[slot, k], _mul(_t(self.F[slot, k + 1]),
+                                             np.linalg.inv(self.Pp[slot, k + 1])))
+            xs = self.xf[slot, k] + np.einsum("nij,nj->ni", C, xs - self.xp[slot, k + 1])
+            Ps = self.Pf[slot, k] + _mul(_mul(C, Ps - self.Pp[slot, k + 1]), _t(C))
+        return xs, Ps
+
+    def _state(self, slot, index, time, x, P):
+        zone = self.zone[slot]
+        north = self.north[slot]
+        lat, lon = tmerc.inverse(x[:, 0], x[:, 1], zone, north)
+        return State([self.animals[s] for s in slot.tolist()], index, time, lon, lat,
+                     x[:, 0], x[:, 1], x[:, 2], x[:, 3], P, zone, north)
+
+    @staticmethod
+    def _concat(states):
+        states = [s for s in states if s is not None]
+        if not states:
+            ## (typed as the states of fixes, so they concatenate alike)
+            empty = [np.zeros((0,) + shape) for shape in ((), (), (), (), (), (), (), (4, 4))]
+            return State([], np.zeros(0, dtype=np.int64), *empty, np.zeros(0, dtype=np.int64),
+                         np.zeros(0, dtype=bool))
+        return State(sum((s.animal for s in states), []),
+                     *(np.concatenate(parts) for parts in list(zip(*states))[1:]))
+
+    def _merge(self, parts, n):
+        '''Put the states of the rounds back in input order.'''
+        order = np.concatenate([rows for rows, _ in parts]) if parts else np.zeros(0, dtype=np.int64)
+        state = self._concat([s for _, s in parts])
+        inverse = np.empty(n, dtype=np.int64)
+        inverse[order] = np.arange(n)
+        return State([state.animal[i] for i in inverse.tolist()],
+                     *(v[inverse] for v in state[1:]))
+
+    def flush(self, animals=None):
+        '''
+        Smoothed states of the last fixes of animals (all by default) that
+        neither update nor an earlier flush has returned, oldest first per
+        animal.
+        '''
+        animals = self.animals if animals is None else animals
+        out = []
+        for animal in animals:
+            s = self.slots[animal]
+            n = int(self.count[s])
+            for index in range(max(int(self.done[s]), n - self.lag), n):
+                steps = n - 1 - index
+                slot = np.array([s])
+                xs, Ps = self._smooth(slot, steps)
+                k = self.lag - steps
+                out.append(self._state(slot, np.array([index]), self.t[slot, k], xs, Ps))
+            self.done[s] = n
+        return self._concat(out)
@@ -0,0 +1,116 @@
+'''
+Transverse Mercator projection for the UTM zones used by the tool.
+
+The forward and inverse transforms use the Krueger series to third order in
+the third flattening n of WGS84, which is accurate to about a millimeter
+within a UTM zone. The zone is picked from the average latitude and
+longitude of the observation points, exactly as the ArcGIS scripts did it.
+'''
+
+import math
+
+#----------------------------------------------------------------------------
+#                     WGS84 ellipsoid and UTM constants
+#----------------------------------------------------------------------------
+
+a = 6378137.0                 # semi-major axis (meters)
+f = 1 / 298.257223563         # flattening
+k0 = 0.9996                   # scale on the central meridian
+E0 = 500000.0                 # false easting
+N0_SOUTH = 10000000.0         # false northing in the Southern Hemisphere
+
+n = f / (2 - f)               # third flattening
+e = 2 * math.sqrt(n) / (1 + n)  # first eccentricity
+A = a / (1 + n) * (1 + n**2 / 4 + n**4 / 64)  # rectifying radius
+
+## Krueger series coefficients
+alpha = (n / 2 - 2 * n**2 / 3 + 5 * n**3 / 16,
+         13 * n**2 / 48 - 3 * n**3 / 5,
+         61 * n**3 / 240)
+beta = (n / 2 - 2 * n**2 / 3 + 37 * n**3 / 96,
+        n**2 / 48 + n**3 / 15,
+        17 * n**3 / 480)
+delta = (2 * n - 2 * n**2 / 3 - 2 * n**3,
+         7 * n**2 / 3 - 8 * n**3 / 5,
+         56 * n**3 / 15)
+
+#----------------------------------------------------------------------------
+#                             Zone selection
+#----------------------------------------------------------------------------
+
+def zone(avgLat, avgLon):
+    '''Return (zone number, True if Northern Hemisphere) for a position.'''
+    return int(math.floor((avgLon + 180) / 6) + 1), avgLat > 0
+
+
+def epsg(zone_number, north):
+    '''Return the EPSG code of a WGS84 / UTM zone (326xx north, 327xx south).'''
+    return (32600 if north else 32700) + zone_number
+
+
+def central_meridian(zone_number):
+    '''Return the longitude of the central meridian of a zone in degrees.'''
+    return zone_number * 6 - 183
+
+#----------------------------------------------------------------------------
+#                         Forward and inverse
+#----------------------------------------------------------------------------
+
+def forward(lat, lon, zone_number, north):
+    '''
+    Project WGS84 decimal degrees into the given UTM zone.
+
+    Returns (X, Y, gamma, k): easting and northing in meters, the meridian
+    convergence in degrees (the bearing of grid north measured clockwise
+    from true north) and the point scale factor.
+    '''
+    phi = math.radians(lat)
+    dlon = math.radians(lon - central_meridian(zone_number))
+    sinphi = math.sin(phi)
+    t = math.sinh(math.atanh(sinphi) - e * math.atanh(e * sinphi))
+    cosl = math.cos(dlon)
+    xi1 = math.atan2(t, cosl)
+    eta1 = math.atanh(math.sin(dlon) / math.sqrt(1 + t * t))
+
+    xi = xi1
+    eta = eta1
+    sigma = 1.0
+    tau = 0.0
+    for j, aj in enumerate(alpha, 1):
+        c2 = math.cos(2 * j * xi1)
+        s2 = math.sin(2 * j * xi1)
+        ch2 = math.cosh(2 * j * eta1)
+        sh2 = math.sinh(2 * j * eta1)
+        xi += aj * s2 * ch2
+        eta += aj * c2 * sh2
+        sigma += 2 * j * aj * c2 * ch2
+        tau += 2 * j * aj * s2 * sh2
+
+    X = E0 + k0 * A * eta
+    Y = k0 * A * xi + (0.0 if north else N0_SOUTH)
+
+    tanl = math.tan(dlon)
+    st = math.sqrt(1 + t * t)
+    gamma = math.degrees(math.atan2(tau * st + sigma * t * tanl, sigma * st - tau * t * tanl))
+    k = (k0 * A / a) * math.sqrt((1 + ((1 - n) / (1 + n) * math.tan(phi))**2)
+                                 * (sigma**2 + tau**2) / (t * t + cosl * cosl))
+    return X, Y, gamma, k
+
+
+def inverse(X, Y, zone_number, north):
+    '''Return (lat, lon) in WGS84 decimal degrees of a UTM easting/northing.'''
+    xi = (Y - (0.0 if north else N0_SOUTH)) / (k0 * A)
+    eta = (X - E0) / (k0 * A)
+
+    xi1 = xi
+    eta1 = eta
+    for j, bj in enumerate(beta, 1):
+        xi1 -= bj * math.sin(2 * j * xi) * math.cosh(2 * j * eta)
+        eta1 -= bj * math.cos(2 * j * xi) * math.sinh(2 * j * eta)
+
+    chi = math.asin(math.sin(xi1) / math.cosh(eta1))
+    phi = chi
+    for j, dj in enumerate(delta, 1):
+        phi += dj * math.sin(2 * j * chi)
+    lon = central_meridian(zone_number) + math.degrees(math.atan2(math.sinh(eta1), math.cos(xi1)))
+    return math.degrees(phi), lon
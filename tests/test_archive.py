@@ -0,0 +1,104 @@
+'''
+RemLocXY.archive: queries return the records a brute-force filter of
+everything appended finds.
+'''
+
+import numpy as np
+
+from RemLocXY import archive
+
+ANIMALS = ["Crane 1", "Crane 2", "Crane 3", "Crane 4"]
+
+
+def _appended(path, seed=8):
+    '''Archive of three appended batches, with the records as columns.'''
+    rng = np.random.default_rng(seed)
+    store = archive.Archive(path, grid=0.5)
+    columns = {"animal": [], "time": [], "Xin": [], "Yin": []}
+    for batch in range(3):
+        n = 500
+        animal = [ANIMALS[i] for i in rng.integers(0, len(ANIMALS), n)]
+        time = rng.uniform(0, 86400 * 30, n) + batch * 86400 * 10
+        Xin = np.where(rng.random(n) < 0.2, rng.uniform(178, 180, n), rng.uniform(-90, -88, n))
+        Yin = rng.uniform(43, 45, n)
+        Xin[:5] = np.nan
+        Yin[:5] = np.nan
+        store.append(animal, time, Xin, Yin, rng.uniform(0, 100, n))
+        columns["animal"] += animal
+        for name, v in (("time", time), ("Xin", Xin), ("Yin", Yin)):
+            columns[name].append(v)
+    for name in ("time", "Xin", "Yin"):
+        columns[name] = np.concatenate(columns[name])
+    columns["animal"] = np.array(columns["animal"])
+    return store, columns
+
+
+def _brute(columns, animal=None, start=None, end=None, bbox=None):
+    '''Sorted times of the records matching every criterion.'''
+    t, x, y = columns["time"], columns["Xin"], columns["Yin"]
+    mask = np.ones(len(t), dtype=bool)
+    if animal is not None:
+        mask &= columns["animal"] == animal
+    if start is not None:
+        mask &= t >= start
+    if end is not None:
+        mask &= t < end
+    if bbox is not None:
+        west, south, east, north = bbox
+        with np.errstate(invalid="ignore"):
+            inside = (x >= west) & (x <= east) if west <= east else (x >= west) | (x <= east)
+            mask &= inside & (y >= south) & (y <= north)
+    return np.sort(t[mask])
+
+
+def test_query_matches_brute_force(tmp_path):
+    store, columns = _appended(str(tmp_path / "season.rlx"))
+    assert len(store) == 1500
+    day = 86400.0
+    cases = [{},
+             {"animal": "Crane 2"},
+             {"animal": "Crane 9"},
+             {"start": 12 * day, "end": 31 * day},
+             {"animal": "Crane 3", "start": 5 * day},
+             {"animal": "Crane 4", "start": 15 * day, "end": 22 * day},
+             {"bbox": (-89.3, 43.2, -88.6, 44.1)},
+             {"bbox": (179.0, 43.0, -89.5, 44.0)},
+             {"animal": "Crane 1", "end": 20 * day, "bbox": (-90.0, 43.0, -89.0, 45.0)},
+             {"start": 40 * day, "bbox": (-88.5, 44.5, -88.0, 45.0)}]
+    for criteria in cases:
+        found = store.query(**criteria)
+        assert np.all(np.diff(found["time"]) >= 0)
+        assert np.array_equal(found["time"], _brute(columns, **criteria)), criteria
+        if "animal" in criteria and len(found):
+            assert set(store.animal_ids(found)) == {criteria["animal"]}
+
+
+class _Reads(object):
+    '''Records that count the rows read by index arrays.'''
+
+    def __init__(self, records):
+        self.records = records
+        self.rows = 0
+
+    def __getitem__(self, index):
+        if not isinstance(index, str):
+            self.rows += len(index)
+        return self.records[index]
+
+
+def test_animal_window_reads_only_window(tmp_path):
+    store, columns = _appended(str(tmp_path / "season.rlx"))
+    store.records = reads = _Reads(store.records)
+    day = 86400.0
+    found = store.query(animal="Crane 2", start=15 * day, end=22 * day)
+    assert np.array_equal(found["time"], _brute(columns, "Crane 2", 15 * day, 22 * day))
+    assert len(found) and reads.rows == len(found)
+
+
+def test_reopen(tmp_path):
+    path = str(tmp_path / "season.rlx")
+    store, columns = _appended(path)
+    again = archive.Archive(path)
+    assert len(again) == len(store)
+    assert np.array_equal(again.query(animal="Crane 4")["time"],
+                          _brute(columns, animal="Crane 4"))
@@ -0,0 +1,31 @@
+'''
+RemLocXY.batch: the vectorized triangulation gives the results of the
+scalar RemLocXY.solver, fix by fix.
+'''
+
+import numpy as np
+
+from RemLocXY import bench, batch, solver
+from RemLocXY.batch import FIELDS_IN
+
+
+def test_batch_matches_solver():
+    c = bench.fixes(300, seed=11, sd=2.0)
+    values = np.column_stack([c[name] for name in FIELDS_IN])
+    fix = batch.triangulate_batch(*values.T)
+    ## Both located fixes and misses are compared
+    assert 0 < fix.valid.sum() < len(values)
+    for i, row in enumerate(values.tolist()):
+        one = solver.triangulate(row[0:3], row[3:6], row[6:9], row[9])
+        assert fix.zone[i] == one.zone and fix.north[i] == one.north
+        assert fix.valid[i] == one.valid
+        for k, xy in enumerate((one.XY1, one.XY2, one.XY3)):
+            assert fix.ok[i, k] == (xy is not None)
+        if not one.valid:
+            continue
+        assert abs(fix.Xin[i] - one.Xin) < 1e-9
+        assert abs(fix.Yin[i] - one.Yin) < 1e-9
+        assert abs(fix.R[i] - one.R) < 1e-6
+        assert abs(fix.Xin_UTM[i] - one.Xin_UTM) < 1e-6
+        assert abs(fix.Yin_UTM[i] - one.Yin_UTM) < 1e-6
+
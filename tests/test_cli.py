@@ -0,0 +1,108 @@
+'''
+RemLocXY.cli: output formats read back, and checkpointed runs.
+'''
+
+import csv
+import json
+
+import numpy as np
+import pytest
+
+from RemLocXY import bench, cli, lsq
+from RemLocXY.batch import FIELDS_IN
+
+
+@pytest.fixture
+def src(tmp_path):
+    path = str(tmp_path / "fixes.csv")
+    bench._write_csv(path, bench.fixes(1000, seed=3), 1000)
+    return path
+
+
+def _interrupted(monkeypatch, after):
+    '''solve_chunk that fails after some chunks, as a killed run.'''
+    solve_chunk = cli.solve_chunk
+    calls = [0]
+
+    def failing(*args):
+        calls[0] += 1
+        if calls[0] > after:
+            raise KeyboardInterrupt
+        return solve_chunk(*args)
+
+    monkeypatch.setattr(cli, "solve_chunk", failing)
+
+
+def test_jsonl_parseable(src, tmp_path):
+    dst = str(tmp_path / "result.jsonl")
+    total, valid, _ = cli.triangulate_file(src, dst, format="jsonl", chunksize=100)
+    with open(dst) as f:
+        rows = [json.loads(line) for line in f]
+    assert len(rows) == total == 1000
+    ## No header row as data: every value is a number or blank
+    for row in rows:
+        assert set(FIELDS_IN) <= set(row)
+        assert all(isinstance(row[name], float) for name in FIELDS_IN)
+    assert sum(1 for row in rows if row["Xin"] != 0 or row["Yin"] != 0) == valid
+
+
+def test_csv_read_back(src, tmp_path):
+    dst = str(tmp_path / "result.csv")
+    total, _, _ = cli.triangulate_file(src, dst, chunksize=100)
+    with open(dst) as f:
+        rows = list(csv.reader(f))
+    assert rows[0][:len(FIELDS_IN)] == FIELDS_IN
+    assert len(rows) == total + 1
+
+
+@pytest.mark.parametrize("format", ["csv", "jsonl"])
+def test_resume_after_kill(src, tmp_path, monkeypatch, format):
+    expected = str(tmp_path / "expected")
+    cli.triangulate_file(src, expected, format=format, chunksize=100)
+
+    dst = str(tmp_path / "result")
+    checkpoint = str(tmp_path / "run.json")
+    with monkeypatch.context() as m:
+        _interrupted(m, 4)
+        with pytest.raises(KeyboardInterrupt):
+            cli.triangulate_file(src, dst, format=format, chunksize=100, checkpoint=checkpoint,
+                                 interval=0.0)
+    ## Output written after the last checkpoint is dropped when the run continues
+    with open(dst, "a") as f:
+        f.write("partial row")
+    total, _, _ = cli.triangulate_file(src, dst, format=format, chunksize=100,
+                                       checkpoint=checkpoint, interval=0.0)
+    assert total == 1000
+    with open(expected, "rb") as f1, open(dst, "rb") as f2:
+        assert f1.read() == f2.read()
+
+
+def test_lsq_more_bearings(tmp_path):
+    c = bench.fixes(200, seed=5, sd=2.0)
+    names = FIELDS_IN + ["lat4", "lon4", "az4"]
+    ## The fourth bearing repeats the first one where given, blank elsewhere
+    extra = {"lat4": c["lat1"], "lon4": c["lon1"], "az4": c["az1"]}
+    given = np.arange(200) % 2 == 0
+    src = str(tmp_path / "fixes.csv")
+    with open(src, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow([name.upper() if name in extra else name for name in names])
+        for i in range(200):
+            writer.writerow([c[name][i] for name in FIELDS_IN]
+                            + [extra[name][i] if given[i] else "" for name in extra])
+    dst = str(tmp_path / "result.csv")
+    cli.triangulate_file(src, dst, error="lsq", sd=2.0)
+    with open(dst) as f:
+        rows = list(csv.reader(f))
+    Xin = np.array([float(row[rows[0].index("Xin")]) for row in rows[1:]])
+
+    lat = np.column_stack([c["lat1"], c["lat2"], c["lat3"], np.where(given, c["lat1"], np.nan)])
+    lon = np.column_stack([c["lon1"], c["lon2"], c["lon3"], np.where(given, c["lon1"], np.nan)])
+    az = np.column_stack([c["az1"], c["az2"], c["az3"], np.where(given, c["az1"], np.nan)])
+    four = lsq.estimate(lat, lon, az, dist=c["dist"], sigma=2.0)
+    three = lsq.estimate(lat[:, :3], lon[:, :3], az[:, :3], dist=c["dist"], sigma=2.0)
+    assert np.allclose(Xin[four.valid], four.Xin[four.valid], rtol=0, atol=1e-9)
+    ## Blank bearings are left out; given ones change the location
+    both = three.valid & four.valid
+    assert np.array_equal(four.Xin[both & ~given], three.Xin[both & ~given])
+    assert not np.allclose(four.Xin[both & given], three.Xin[both & given])
@@ -0,0 +1,126 @@
+'''
+RemLocXY.geodesic: the Vincenty direct and inverse problems and the
+intersection of geodesics against GeographicLib (Karney). The hard-coded
+values are GeographicLib 2.1 results; with geographiclib installed
+(optional) random cases are compared as well.
+'''
+
+import numpy as np
+import pytest
+
+from RemLocXY import batch, bench, geodesic
+from RemLocXY.batch import FIELDS_IN
+
+# (lat1, lon1, az1, s) -> (lat2, lon2, az2) of Geodesic.WGS84.Direct
+DIRECT = [((43.57, -89.76, 45.0, 5000.0), (43.60181341314548, -89.71621122850227, 45.030189793653435)),
+          ((-33.9, 18.4, 200.0, 12000000.0), (-34.96770378271846, -138.1249827398786, -20.267142724016225)),
+          ((0.0, 0.0, 90.0, 20000000.0), (0.0, 179.6630568239043, 90.0)),
+          ((89.5, 10.0, 170.0, 300000.0), (86.82046824207117, 18.436454657094906, 178.43441898144945)),
+          ((10.0, 179.9, 80.0, 50000.0), (10.078193265582293, -179.65077987884433, 80.0783085221955))]
+# (lat1, lon1, lat2, lon2) -> (s12, azi1, azi2) of Geodesic.WGS84.Inverse
+INVERSE = [((43.57, -89.76, 43.58, -89.74), (1960.7003360828307, 55.47585267910647, 55.489638749203124)),
+           ((-33.9, 18.4, 51.5, -0.12), (9632341.016456127, -11.475703119132286, -15.366905904376766)),
+           ((10.0, 179.9, 10.5, -179.5), (85903.26473810835, 49.871126300589985, 49.9778943995886))]
+# Nearly antipodal points, where Vincenty does not converge (GeographicLib:
+# 19936288.578965314 and 20000239.43772467 m)
+ANTIPODAL = [(0.0, 0.0, 0.5, 179.5), (0.0, 0.0, 0.0, 179.8)]
+# Lines from (lat1, lon1) at az1 and (lat2, lon2) at az2 crossing at (lat, lon)
+# after s1 and s2 meters, from GeographicLib Direct out of the crossing
+CROSSINGS = [((43.57462601226398, -89.76270238322907, 19.991242225122164,
+               43.61384063211441, -89.80238327470656, 109.96387088685731), (43.6, -89.75, 3000.0, 4500.0)),
+             ((-11.37345633131513, -179.68353119627594, 209.9257665499298,
+               -12.270780383592868, -179.57238213637285, 299.89959314952966),
+              (-12.0, 179.95, 80000.0, 60000.0))]
+
+
+def _meters(lat1, lon1, lat2, lon2):
+    '''Rough distance (meters) between nearby points.'''
+    dlon = (np.asarray(lon2) - lon1 + 180) % 360 - 180
+    return 111195.0 * np.hypot(np.asarray(lat2) - lat1, dlon * np.cos(np.radians(lat1)))
+
+
+def test_direct():
+    for args, (lat, lon, az) in DIRECT:
+        lat2, lon2, az2 = geodesic.direct(*args)
+        assert _meters(lat, lon, lat2, lon2) < 1e-4
+        assert abs(az2 - az) < 1e-8
+
+
+def test_inverse():
+    for args, (s, az1, az2) in INVERSE:
+        s12, azi1, azi2 = geodesic.inverse(*args)
+        assert abs(s12 - s) < 1e-4
+        assert abs(azi1 - az1) < 1e-8 and abs(azi2 - az2) < 1e-8
+
+
+def test_inverse_antipodal():
+    ## Rather NaN than a wrong distance
+    for args in ANTIPODAL:
+        s12, _, _ = geodesic.inverse(*args)
+        assert np.isnan(s12)
+
+
+def test_intersect():
+    lines = np.array([c[0] for c in CROSSINGS])
+    lat, lon, s1, s2, converged = geodesic.intersect(*lines.T)
+    assert converged.all()
+    for i, (_, (lat0, lon0, d1, d2)) in enumerate(CROSSINGS):
+        assert _meters(lat0, lon0, lat[i], lon[i]) < 1e-4
+        assert abs(s1[i] - d1) < 1e-4 and abs(s2[i] - d2) < 1e-4
+
+
+def test_intersect_not_converged():
+    ## Parallel lines, lines crossing beyond the limit, and too few steps
+    lat, lon, s1, s2, converged = geodesic.intersect([0.0, 43.0], [10.0, -89.0], [90.0, 0.0],
+                                                     [0.01, 43.0], [10.0, -88.9], [90.0, 1.0],
+                                                     limit=100000.0)
+    assert not converged.any()
+    assert np.isnan(lat).all() and np.isnan(s1).all() and np.isnan(s2).all()
+    lines = np.array([c[0] for c in CROSSINGS])
+    _, _, _, _, converged = geodesic.intersect(*lines.T, max_iter=1)
+    assert not converged.any()
+
+
+def test_against_geographiclib():
+    pytest.importorskip("geographiclib")
+    from geographiclib.geodesic import Geodesic
+    g = Geodesic.WGS84
+    rng = np.random.default_rng(12)
+    n = 200
+    lat1 = rng.uniform(-80, 80, n)
+    lon1 = rng.uniform(-180, 180, n)
+    az1 = rng.uniform(-180, 180, n)
+    s = rng.uniform(1, 1e7, n)
+    lat2, lon2, az2 = geodesic.direct(lat1, lon1, az1, s)
+    s12, azi1, azi2 = geodesic.inverse(lat1, lon1, lat2, lon2)
+    for i in range(n):
+        r = g.Direct(lat1[i], lon1[i], az1[i], s[i])
+        assert _meters(r["lat2"], r["lon2"], lat2[i], lon2[i]) < 1e-4
+        r = g.Inverse(lat1[i], lon1[i], lat2[i], lon2[i])
+        if np.isfinite(s12[i]):
+            assert abs(s12[i] - r["s12"]) < 1e-4
+
+    ## Crossings 1-50 km from two observation points
+    X = (rng.uniform(-70, 70, n), rng.uniform(-180, 180, n))
+    ends = []
+    for d in (rng.uniform(1000, 50000, (2, n))):
+        b = rng.uniform(0, 360, n)
+        ends.append([g.Direct(X[0][i], X[1][i], b[i], d[i]) for i in range(n)])
+    lines = [[r[k] for r in rows] for rows in ends for k in ("lat2", "lon2")]
+    az = [[(r["azi2"] + 180) % 360 for r in rows] for rows in ends]
+    lat, lon, s1, s2, converged = geodesic.intersect(lines[0], lines[1], az[0],
+                                                     lines[2], lines[3], az[1])
+    assert converged.all()
+    assert (_meters(X[0], X[1], lat, lon) < 1e-4).all()
+
+
+def test_triangulate_near_utm():
+    ## Over a few km the geodesic and the UTM triangulation agree to a decimeter
+    c = bench.fixes(300, seed=5)
+    columns = [c[name] for name in FIELDS_IN]
+    plane = batch.triangulate_batch(*columns)
+    fix = geodesic.triangulate_geodesic(*columns)
+    assert np.array_equal(fix.valid, plane.valid)
+    ok = fix.valid
+    assert (_meters(plane.Yin[ok], plane.Xin[ok], fix.Yin[ok], fix.Xin[ok]) < 0.2).all()
+    assert (np.abs(fix.R[ok] - plane.R[ok]) < 0.2).all()
@@ -0,0 +1,74 @@
+'''
+RemLocXY.gpkg: GeoPackage output is a valid SQLite file with usable extents.
+'''
+
+import sqlite3
+
+import numpy as np
+
+from RemLocXY import bench, batch, cli, gpkg
+from RemLocXY.batch import FIELDS_IN
+
+
+def _values(n, seed=5):
+    c = bench.fixes(n, seed=seed)
+    return np.column_stack([c[name] for name in FIELDS_IN])
+
+
+def _check(path):
+    db = sqlite3.connect(path)
+    try:
+        assert db.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+        extents = {}
+        for name, min_x, min_y, max_x, max_y in db.execute(
+                "SELECT table_name, min_x, min_y, max_x, max_y FROM gpkg_contents"):
+            extents[name] = (min_x, min_y, max_x, max_y)
+        counts = {name: db.execute("SELECT count(*) FROM \"%s\"" % name).fetchone()[0]
+                  for name in gpkg.LAYERS}
+        indexed = {name: db.execute("SELECT count(*) FROM \"rtree_%s_geom\"" % name).fetchone()[0]
+                   for name in gpkg.LAYERS}
+    finally:
+        db.close()
+    return extents, counts, indexed
+
+
+def test_integrity_and_extent(tmp_path):
+    values = _values(300)
+    fix = batch.triangulate_batch(*values.T)
+    path = str(tmp_path / "fixes.gpkg")
+    gpkg.write_gpkg(path, values, fix)
+    extents, counts, indexed = _check(path)
+    assert counts["ObjectLocation"] == counts["Accuracy"] == int(fix.valid.sum())
+    assert counts == indexed
+    min_x, min_y, max_x, max_y = extents["Accuracy"]
+    ok = fix.valid
+    assert min_x <= fix.Xin[ok].min() and max_x >= fix.Xin[ok].max()
+    assert min_y <= fix.Yin[ok].min() and max_y >= fix.Yin[ok].max()
+
+
+def test_non_finite_error(tmp_path):
+    values = _values(50)
+    fix = batch.triangulate_batch(*values.T)
+    R = np.array(fix.R, dtype=np.float64)
+    R[:10] = np.nan
+    R[10:12] = np.inf
+    result = cli.Located(fix.valid, fix.Xin, fix.Yin, R)
+    path = str(tmp_path / "fixes.gpkg")
+    gpkg.write_gpkg(path, values, result)
+    extents, counts, indexed = _check(path)
+    assert all(v is not None and np.isfinite(v) for v in extents["Accuracy"])
+    assert counts["Accuracy"] == int(fix.valid[12:].sum())
+    assert counts == indexed
+
+
+def test_cli_gpkg(tmp_path):
+    src = str(tmp_path / "fixes.csv")
+    c = bench.fixes(400, seed=9)
+    bench._write_csv(src, c, 400)
+    dst = str(tmp_path / "result.gpkg")
+    total, valid, _ = cli.triangulate_file(src, dst, format="gpkg", chunksize=100, error="lsq")
+    extents, counts, indexed = _check(dst)
+    assert total == 400
+    assert counts["ObjectLocation"] == counts["Accuracy"] == valid
+    assert counts == indexed
+    assert all(v is not None for v in extents["Accuracy"])
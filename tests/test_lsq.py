@@ -0,0 +1,62 @@
+'''
+RemLocXY.lsq: bearings-only estimates and their degenerate cases.
+'''
+
+import numpy as np
+
+from RemLocXY import batch, lsq
+
+# Three observation points and bearings that cross around (43.565, -89.745)
+STATIONS = [(43.57, -89.76), (43.58, -89.74), (43.56, -89.73)]
+AZIMUTHS = [124.6, 205.8, 289.0]
+
+
+def _estimate(azimuths, stations=STATIONS, **options):
+    lat = [[p[0] for p in stations]]
+    lon = [[p[1] for p in stations]]
+    return lsq.estimate(lat, lon, [azimuths], **options)
+
+
+def test_three_bearings_near_incenter():
+    est = _estimate(AZIMUTHS, dist=5000)
+    assert est.valid[0]
+    assert np.isfinite(est.error[0]) and est.error[0] > 0
+    fix = batch.triangulate_batch(*[[v] for p, az in zip(STATIONS, AZIMUTHS) for v in (p[0], p[1], az)],
+                                  [5000.0])
+    assert fix.valid[0]
+    assert abs(est.Xin[0] - fix.Xin[0]) < 1e-3
+    assert abs(est.Yin[0] - fix.Yin[0]) < 1e-3
+
+
+def test_two_bearings_need_sigma():
+    ## Without sigma the error of two bearings is undefined (0 degrees of freedom)
+    est = _estimate(AZIMUTHS[:2], STATIONS[:2])
+    assert not est.valid[0]
+    est = _estimate(AZIMUTHS[:2], STATIONS[:2], sigma=1.0)
+    assert est.valid[0]
+    assert np.isfinite(est.error[0])
+
+
+def test_diverging_bearings_invalid():
+    ## The lines only cross behind the observers
+    away = [(az + 180.0) % 360.0 for az in AZIMUTHS]
+    assert not _estimate(away[:2], STATIONS[:2], sigma=1.0).valid[0]
+    assert not _estimate(away).valid[0]
+    assert not _estimate(away, sigma=1.0).valid[0]
+
+
+def test_missing_bearings():
+    est = _estimate([AZIMUTHS[0], np.nan, np.nan], sigma=1.0)
+    assert not est.valid[0]
+    assert not _estimate([np.nan] * 3).valid[0]
+
+
+def test_every_valid_error_finite():
+    rng = np.random.default_rng(7)
+    az = rng.uniform(0, 360, (500, 3))
+    lat = np.tile([p[0] for p in STATIONS], (500, 1))
+    lon = np.tile([p[1] for p in STATIONS], (500, 1))
+    for sigma in (None, 1.0):
+        est = lsq.estimate(lat, lon, az, dist=20000, sigma=sigma)
+        assert np.isfinite(est.error[est.valid]).all()
+        assert np.isfinite(est.Xin[est.valid]).all()
@@ -0,0 +1,73 @@
+'''
+RemLocXY.montecarlo: the error ellipse of a fix against the covariance
+propagated linearly from the bearing error.
+'''
+
+import numpy as np
+
+from RemLocXY import batch, montecarlo, tmerc
+
+# Three observation points and bearings that cross around (43.565, -89.745)
+STATIONS = [(43.57, -89.76), (43.58, -89.74), (43.56, -89.73)]
+AZIMUTHS = [124.6, 205.8, 289.0]
+
+
+def _columns(azimuths, dist=10000.0):
+    return [[v] for p, az in zip(STATIONS, azimuths) for v in (p[0], p[1], az)] + [[dist]]
+
+
+def _propagated(sd, h=1e-4):
+    '''Covariance (m^2) of the UTM incenter for bearings off by sd degrees.'''
+    J = []
+    for i in range(3):
+        up, down = list(AZIMUTHS), list(AZIMUTHS)
+        up[i] += h
+        down[i] -= h
+        f, g = batch.triangulate_batch(*_columns(up)), batch.triangulate_batch(*_columns(down))
+        J.append([(f.Xin_UTM[0] - g.Xin_UTM[0]) / (2 * h), (f.Yin_UTM[0] - g.Yin_UTM[0]) / (2 * h)])
+    J = np.array(J)
+    return sd**2 * J.T @ J
+
+
+def test_ellipse_of_known_covariance():
+    sd = 0.2
+    cov = _propagated(sd)
+    e = montecarlo.monte_carlo(*_columns(AZIMUTHS), sd=sd, samples=20000, seed=1)
+    assert np.abs(e.cov[0] - cov).max() < 0.05 * np.abs(cov).max()
+    ## Axes from the eigenvalues at the 95% chi-square quantile
+    w, v = np.linalg.eigh(cov)
+    scale = -2 * np.log(1 - montecarlo.LEVEL)
+    assert abs(e.major[0] - np.sqrt(w[1] * scale)) < 0.03 * e.major[0]
+    assert abs(e.minor[0] - np.sqrt(w[0] * scale)) < 0.03 * e.minor[0]
+    ## Orientation: grid azimuth of the major axis turned to true north
+    _, _, gamma, _ = tmerc.forward(e.Yin, e.Xin, e.zone, e.north)
+    expected = (np.degrees(np.arctan2(v[0, 1], v[1, 1])) + gamma[0]) % 180
+    assert abs((e.orientation[0] - expected + 90) % 180 - 90) < 2.0
+    ## Centered on the incenter of the measured bearings
+    fix = batch.triangulate_batch(*_columns(AZIMUTHS))
+    assert e.Xin[0] == fix.Xin[0] and e.Yin[0] == fix.Yin[0]
+    assert e.fraction[0] == 1.0
+    assert e.minor[0] <= e.radius[0] <= e.major[0]
+
+
+def test_reproducible_and_scaled():
+    one = montecarlo.monte_carlo(*_columns(AZIMUTHS), sd=0.1, samples=2000, seed=3)
+    two = montecarlo.monte_carlo(*_columns(AZIMUTHS), sd=0.1, samples=2000, seed=3)
+    assert np.array_equal(one.cov, two.cov)
+    ## Twice the bearing error, twice the ellipse (to sampling noise)
+    wide = montecarlo.monte_carlo(*_columns(AZIMUTHS), sd=0.2, samples=2000, seed=3)
+    assert abs(wide.major[0] / one.major[0] - 2) < 0.05
+
+
+def test_no_triangle():
+    ## The measured lines are just too short to meet; some samples meet
+    columns = _columns(AZIMUTHS, dist=1850.0)
+    fix = batch.triangulate_batch(*columns)
+    e = montecarlo.monte_carlo(*columns, sd=3.0, samples=2000, seed=2)
+    assert not fix.valid[0]
+    assert 0 < e.fraction[0] < 1
+    ## Centered on the mean of the samples that gave a triangle
+    assert np.isfinite(e.Xin[0]) and np.isfinite(e.major[0])
+    ## No sample at all: no ellipse
+    e = montecarlo.monte_carlo(*_columns(AZIMUTHS, dist=1000.0), sd=3.0, samples=2000, seed=2)
+    assert e.fraction[0] == 0 and np.isnan(e.Xin[0])
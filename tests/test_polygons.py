@@ -0,0 +1,47 @@
+'''
+RemLocXY.geodesic: accuracy circles and error ellipses of whole batches.
+'''
+
+import numpy as np
+
+from RemLocXY import geodesic
+
+LAT = np.array([43.57, -33.9, 0.0, 10.0])
+LON = np.array([-89.76, 18.4, 0.0, 179.99])
+
+
+def test_circles():
+    radius = np.array([12.0, 250.0, 3000.0, 500.0])
+    lat, lon = geodesic.circles(LAT, LON, radius, vertices=36)
+    assert lat.shape == lon.shape == (4, 37)
+    ## Closed rings
+    assert np.array_equal(lat[:, 0], lat[:, -1]) and np.array_equal(lon[:, 0], lon[:, -1])
+    s, az, _ = geodesic.inverse(LAT[:, None], LON[:, None], lat, lon)
+    assert np.abs(s - radius[:, None]).max() < 1e-6
+    angle, _, _ = geodesic.template(36)
+    assert np.abs((az - angle + 180) % 360 - 180).max() < 1e-6
+    ## The ring across the antimeridian stays in one piece
+    assert np.ptp(lon[3]) < 1
+
+
+def test_ellipses():
+    major = np.array([300.0, 50.0, 1000.0, 80.0])
+    minor = np.array([100.0, 50.0, 10.0, 20.0])
+    orientation = np.array([30.0, 0.0, 135.0, 90.0])
+    lat, lon = geodesic.ellipses(LAT, LON, major, minor, orientation, vertices=36)
+    s, az, _ = geodesic.inverse(LAT[:, None], LON[:, None], lat, lon)
+    ## The first vertex lies on the major axis, a quarter turn on the minor axis
+    assert np.abs(s[:, 0] - major).max() < 1e-6
+    assert np.abs((az[:, 0] - orientation + 180) % 360 - 180).max() < 1e-6
+    assert np.abs(s[:, 9] - minor).max() < 1e-6
+    assert (s <= major[:, None] + 1e-6).all() and (s >= minor[:, None] - 1e-6).all()
+    ## An ellipse with equal axes is the circle
+    circle = geodesic.circles(LAT[1:2], LON[1:2], 50.0, vertices=36)
+    assert np.abs(lat[1] - circle[0][0]).max() < 1e-12
+    assert np.abs(lon[1] - circle[1][0]).max() < 1e-12
+
+
+def test_template_cached():
+    ring = geodesic.template(12)
+    assert geodesic.template(12) is ring
+    assert not any(a.flags.writeable for a in ring)
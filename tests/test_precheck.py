@@ -0,0 +1,56 @@
+'''
+RemLocXY.precheck: reason codes agree with the validity of
+batch.triangulate_batch.
+'''
+
+import numpy as np
+
+from RemLocXY import batch, bench, precheck
+from RemLocXY.batch import FIELDS_IN
+
+# Three observation points and bearings that cross around (43.565, -89.745)
+FIX = [43.57, -89.76, 124.6, 43.58, -89.74, 205.8, 43.56, -89.73, 289.0, 5000.0]
+
+
+def _fixes():
+    parts = []
+    for seed, sd, dist in ((1, 1.0, 10000.0), (2, 20.0, 10000.0), (3, 5.0, 2500.0)):
+        c = bench.fixes(1000, seed=seed, sd=sd, dist=dist)
+        parts.append(np.column_stack([c[name] for name in FIELDS_IN]))
+    values = np.concatenate(parts)
+    values[:20, 4] = np.nan
+    return values
+
+
+def test_agrees_with_batch():
+    values = _fixes()
+    code = precheck.check(*values.T)
+    fix = batch.triangulate_batch(*values.T)
+    ## Every fix that passes triangulates
+    assert fix.valid[code == precheck.OK].all()
+    ## A pair of lines that does not cross leaves no triangle
+    missed = np.isin(code, [precheck.MISSING, precheck.DIVERGING, precheck.BEYOND_DIST])
+    assert not fix.valid[missed].any()
+    ## Only close stations, nearly parallel lines (within MIN_ANGLE, they
+    ## may still cross) or slivers are rejected with a triangle
+    rejected = set(code[fix.valid & (code != precheck.OK)].tolist())
+    assert rejected <= {precheck.STATIONS_CLOSE, precheck.PARALLEL, precheck.DEGENERATE}
+    summary = precheck.summary(code)
+    assert sum(summary.values()) == len(values)
+    assert summary["ok"] and summary["diverging"] and summary["beyond_dist"] and summary["missing"]
+
+
+def test_reasons():
+    rows = np.tile(FIX, (7, 1))
+    rows[1, 0] = 95.0                    # latitude out of range
+    rows[2, 3:5] = rows[2, 0:2]          # stations 1 and 2 at one point
+    rows[3, 5] = rows[3, 2] + 180.0      # lines 1 and 2 parallel
+    rows[4, 2] = (FIX[2] + 180) % 360    # line 1 points away
+    rows[5, 9] = 1000.0                  # lines too short
+    code = precheck.check(*rows.T)
+    assert code.tolist()[:6] == [precheck.OK, precheck.MISSING, precheck.STATIONS_CLOSE,
+                                 precheck.PARALLEL, precheck.DIVERGING, precheck.BEYOND_DIST]
+    ## A stricter shape factor turns the fix into a sliver
+    assert precheck.check(*rows[:1].T, min_shape=0.99)[0] == precheck.DEGENERATE
+    assert precheck.message(precheck.STATIONS_CLOSE) == \
+        "Two observation points are less than 10 m apart."
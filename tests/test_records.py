@@ -0,0 +1,67 @@
+'''
+RemLocXY.records: the compact fix records, their views and a solve round
+trip.
+'''
+
+import numpy as np
+
+from RemLocXY import batch, bench, precheck, records
+from RemLocXY.batch import FIELDS_IN
+
+
+def _values(n=500, seed=13):
+    c = bench.fixes(n, seed=seed, sd=2.0)
+    return np.column_stack([c[name] for name in FIELDS_IN])
+
+
+def test_dtype():
+    assert records.FIX_DTYPE.itemsize == 85
+    assert records.FIX_DTYPE.names[:len(FIELDS_IN)] == tuple(FIELDS_IN)
+    fixes = records.empty(3)
+    assert np.isnan(fixes["Xin"]).all() and (fixes["status"] == records.UNSOLVED).all()
+
+
+def test_views():
+    fixes = records.from_values(_values(100))
+    part = fixes[10:20]
+    assert np.shares_memory(part, fixes)
+    assert all(np.shares_memory(c, fixes) for c in records.columns(part))
+    part["Xin"] = 7.0
+    assert (fixes["Xin"][10:20] == 7.0).all() and np.isnan(fixes["Xin"][:10]).all()
+
+
+def test_solve_round_trip():
+    values = _values()
+    fixes = records.from_values(values)
+    fix = records.solve(fixes)
+    ## The float32 fields hold the azimuths to a few millimeters at 10 km
+    assert np.abs(fixes["lat1"] - values[:, 0]).max() == 0
+    assert np.abs(fixes["az1"] - values[:, 2]).max() < 2e-5
+    expected = batch.triangulate_batch(*values.T)
+    assert np.array_equal(fix.valid, expected.valid)
+    ok = expected.valid
+    assert np.abs(fixes["Xin"][ok] - expected.Xin[ok]).max() < 1e-6
+    assert (np.abs(fixes["r"][ok] - expected.R[ok]) < 1e-2 * np.maximum(expected.R[ok], 1)).all()
+    assert np.isnan(fixes["Xin"][~fix.valid]).all()
+    assert np.array_equal(fixes["status"], precheck.check(*values.T))
+    ## Through a file and back
+    copy = records.from_columns(np.frombuffer(fixes.tobytes(), dtype=records.FIX_DTYPE))
+    assert copy.tobytes() == fixes.tobytes()
+
+
+def test_single_fix():
+    values = _values(20)
+    fixes = records.from_values(values)
+    records.solve(fixes)
+    for record in fixes:
+        fix = records.Fix.from_record(record)
+        assert fix.record().tobytes() == record.tobytes()
+        one = records.Fix(*fix.values())
+        one.triangulate()
+        assert one.valid == fix.valid
+        if one.valid:
+            assert abs(one.Xin - fix.Xin) < 1e-6 and abs(one.r - fix.r) < 1e-2 * max(fix.r, 1)
+            assert one.row()[10:] == [one.Xin, one.Yin, one.r]
+        else:
+            assert one.row()[10:] == [0, 0, 0]
+    assert records.Fix("43.5", "", None, *[1.0] * 7).row()[1:3] == ["", ""]
@@ -0,0 +1,44 @@
+'''
+RemLocXY.registry: snapping to the station index finds the nearest station
+within the tolerance, as a brute-force search does.
+'''
+
+import numpy as np
+
+from RemLocXY import registry
+
+
+def _brute(stations, points, tolerance):
+    d = np.sqrt(((points[:, None, :] - stations[None, :, :])**2).sum(axis=-1))
+    best = d.argmin(axis=-1)
+    dist = d[np.arange(len(points)), best]
+    near = dist <= tolerance
+    return np.where(near, best, -1), np.where(near, dist, np.inf)
+
+
+def test_index_matches_brute_force():
+    rng = np.random.default_rng(2)
+    lat = 43.5 + rng.uniform(0, 0.01, 400)
+    lon = -89.8 + rng.uniform(0, 0.01, 400)
+    stations = registry.ecef(lat, lon)
+    ## Points on, near and away from the stations
+    points = np.concatenate([stations[:100] + rng.normal(0, 10, (100, 3)),
+                             stations[100:150],
+                             registry.ecef(43.5 + rng.uniform(-0.01, 0.02, 300),
+                                           -89.8 + rng.uniform(-0.01, 0.02, 300))])
+    for tolerance in (5.0, 25.0, 100.0):
+        best, dist = registry.StationIndex(stations, tolerance).query(points)
+        expected, expected_dist = _brute(stations, points, tolerance)
+        assert np.array_equal(dist, expected_dist)
+        assert np.array_equal(best, expected)
+        assert (best >= 0).any() and (best < 0).any()
+
+
+def test_snap():
+    reg = registry.Registry(["A", "B", "C"], [43.57, 43.58, 43.56], [-89.76, -89.74, -89.73])
+    lat = np.array([43.5701, 43.58, 43.565, np.nan])
+    lon = np.array([-89.76, -89.7401, -89.735, -89.73])
+    best, dist = reg.snap(lat, lon, tolerance=25.0)
+    assert best.tolist() == [0, 1, -1, -1]
+    assert 0 < dist[0] < 25 and 0 < dist[1] < 25
+    assert np.isinf(dist[2:]).all()
@@ -0,0 +1,78 @@
+'''
+RemLocXY.service: HTTP handling and micro-batching of concurrent requests.
+'''
+
+import asyncio
+import json
+
+import numpy as np
+
+from RemLocXY import bench, service
+from RemLocXY.batch import FIELDS_IN
+
+
+async def _request(port, body, length=None):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    length = str(len(body)) if length is None else length
+    writer.write(("POST /triangulate HTTP/1.1\r\nContent-Length: %s\r\n"
+                  "Connection: close\r\n\r\n" % length).encode() + body)
+    head = await reader.readuntil(b"\r\n\r\n")
+    data = await reader.read()
+    writer.close()
+    return int(head.split(b" ", 2)[1]), json.loads(data)
+
+
+async def _serve(requests, delay=service.DELAY):
+    s = service.Service(delay)
+    server = await asyncio.start_server(s.connection, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    try:
+        return s, await asyncio.gather(*[_request(port, *r) for r in requests])
+    finally:
+        server.close()
+        await server.wait_closed()
+
+
+def _bodies(n):
+    c = bench.fixes(n, seed=6)
+    return [json.dumps({name: float(c[name][i]) for name in FIELDS_IN}).encode() for i in range(n)]
+
+
+def test_bad_content_length():
+    _, answers = asyncio.run(_serve([(b"{}", "ten"), (b"{}", "-1")]))
+    assert [status for status, _ in answers] == [400, 400]
+
+
+def test_concurrent_requests_batched():
+    s, answers = asyncio.run(_serve([(body,) for body in _bodies(40)]))
+    assert all(status == 200 and "valid" in data for status, data in answers)
+    assert s.batcher.fixes == 40
+    assert s.batcher.batches < 40
+
+
+def test_bad_fix_among_good_requests():
+    bodies = _bodies(3)
+    bad = bodies[0].replace(b'"dist": 10000.0', b'"dist": Infinity')
+    assert bad != bodies[0]
+    _, answers = asyncio.run(_serve([(bad,)] + [(body,) for body in bodies[1:]]))
+    assert [status for status, _ in answers] == [400, 200, 200]
+    assert all("valid" in data for _, data in answers[1:])
+
+
+def test_one_fix_cannot_fail_a_batch():
+    c = bench.fixes(3, seed=6)
+    values = np.column_stack([c[name] for name in FIELDS_IN])
+    ## utm.zone raises OverflowError on an infinite longitude
+    values[0, 1] = np.inf
+    results = service.solve(values)
+    assert not results[0]["valid"]
+    assert results[1:] == service.solve(values[1:])
+
+
+def test_solve_error_answered(monkeypatch):
+    def failing(values):
+        raise RuntimeError("broken")
+
+    monkeypatch.setattr(service, "solve", failing)
+    _, answers = asyncio.run(_serve([(body,) for body in _bodies(3)]))
+    assert [status for status, _ in answers] == [500] * 3
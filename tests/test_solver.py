@@ -0,0 +1,65 @@
+'''
+RemLocXY.solver: the single-fix triangulation on known geometry.
+'''
+
+import math
+
+from RemLocXY import solver
+
+# Observation points and azimuths of geodesics that meet at (43.6, -89.75)
+# after 3000, 4500 and 2000 m (GeographicLib)
+TARGET = (43.6, -89.75)
+OBS = [(43.57462601226398, -89.76270238322907, 19.991242225122164),
+       (43.61384063211441, -89.80238327470656, 109.96387088685731),
+       (43.608998520764196, -89.7285454169935, 240.01479671989233)]
+
+
+def _meters(lat, lon):
+    return math.hypot((lat - TARGET[0]) * 111195.0,
+                      (lon - TARGET[1]) * 111195.0 * math.cos(math.radians(TARGET[0])))
+
+
+def test_incircle():
+    ## The 3-4-5 right triangle: incenter (1, 1), radius 1
+    assert solver.incircle(0, 0, 4, 0, 0, 3) == (1.0, 1.0, 1.0)
+    ## All lines through one point: the location is exact
+    assert solver.incircle(2, 5, 2, 5, 2, 5) == (2, 5, 0.0)
+
+
+def test_intersect():
+    X, Y = solver.intersect((0, 0), 45, 10, (10, 0), 315, 10)
+    assert abs(X - 5) < 1e-12 and abs(Y - 5) < 1e-12
+    ## Parallel, too short, and crossing behind a point
+    assert solver.intersect((0, 0), 0, 10, (10, 0), 0, 10) is None
+    assert solver.intersect((0, 0), 45, 5, (10, 0), 315, 5) is None
+    assert solver.intersect((0, 0), 225, 10, (10, 0), 315, 10) is None
+
+
+def test_lines_through_one_point():
+    fix = solver.triangulate(OBS[0], OBS[1], OBS[2], 5000)
+    assert fix.valid and fix.IntersectionCount == 3
+    ## Straight lines on the UTM grid stay within centimeters of the geodesics
+    assert _meters(fix.Yin, fix.Xin) < 0.05
+    assert fix.R < 0.01
+    for X, Y in (fix.XY1, fix.XY2, fix.XY3):
+        assert _meters(Y, X) < 0.05
+    assert (fix.zone, fix.north, fix.epsg) == (16, True, 32616)
+
+
+def test_bearing_errors():
+    ## Bearings off by 1, -1 and 0.5 degrees: a triangle of a few meters
+    obs = [(lat, lon, az + d) for (lat, lon, az), d in zip(OBS, (1.0, -1.0, 0.5))]
+    fix = solver.triangulate(*obs, dist="5000")
+    assert fix.valid
+    assert abs(fix.R - 2.8106) < 1e-3
+    assert _meters(fix.Yin, fix.Xin) < 100
+
+
+def test_no_triangle():
+    ## Line 1 turned around, and line 2 (4500 m to the crossing) too short
+    obs = [(OBS[0][0], OBS[0][1], OBS[0][2] + 180.0)] + OBS[1:]
+    fix = solver.triangulate(*obs, dist=5000)
+    assert not fix.valid and fix.XY2 is None and fix.XY3 is None and fix.XY1 is not None
+    assert fix.Xin is None and fix.R is None
+    fix = solver.triangulate(*OBS, dist=4000)
+    assert fix.XY2 is not None and fix.IntersectionCount == 1 and not fix.valid
@@ -0,0 +1,63 @@
+'''
+RemLocXY.standin: the field expressions it evaluates and the scripts it runs.
+'''
+
+import os
+
+import pytest
+
+from RemLocXY import standin
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+VALUES = [43.5, -89.75, 45, 43.51, -89.7, 300, 43.45, -89.7, 0, 10000]
+
+
+def _points(arcpy, n=3):
+    fc = standin.FeatureClass("Point", standin.SpatialReference(), ["dist"],
+                              [[{"dist": 10 * i}, (0.0, 0.0)] for i in range(n)])
+    arcpy.data["memory/points"] = fc
+    return fc
+
+
+def test_calculate_field_expressions():
+    arcpy = standin.make_arcpy(echo=False)
+    fc = _points(arcpy)
+    arcpy.management.CalculateField("memory/points", "dist", "!FID!+1", "PYTHON", "")
+    assert [a["dist"] for a, _ in fc.rows] == [1, 2, 3]
+    arcpy.management.CalculateField("memory/points", "next", "!dist! + 0.5", "PYTHON")
+    assert [a["next"] for a, _ in fc.rows] == [1.5, 2.5, 3.5]
+    arcpy.management.CalculateField("memory/points", "Xin", -89.71, "PYTHON")
+    assert all(a["Xin"] == -89.71 for a, _ in fc.rows)
+
+
+@pytest.mark.parametrize("expression", ["__import__('os').getcwd()", "!FID! * 2", "math.pi"])
+def test_calculate_field_rejects_code(expression):
+    arcpy = standin.make_arcpy(echo=False)
+    fc = _points(arcpy)
+    with pytest.raises(standin.ExecuteError):
+        arcpy.management.CalculateField("memory/points", "other", expression, "PYTHON")
+    assert "other" not in fc.fields
+
+
+def test_run_pro_script(tmp_path):
+    params = VALUES + ["", str(tmp_path), "", "", ""]
+    arcpy = standin.run(os.path.join(ROOT, "RemoteLocationXYPro.py"), params, echo=False)
+    assert not [text for severity, text in arcpy.messages if severity == "error"]
+    assert any(name == "management.CalculateField" for name, _ in arcpy.calls)
+    assert any("Object Location" in text for _, text in arcpy.messages)
+
+
+def test_run_arcmap_script_unsupported(tmp_path):
+    params = VALUES + ["", str(tmp_path), "", "", ""]
+    with pytest.raises(ValueError, match="ArcMap"):
+        standin.run(os.path.join(ROOT, "RemoteLocationXY.py"), params, echo=False)
+
+
+@pytest.mark.parametrize("memory", ["", "false"])
+def test_pro_script_files(tmp_path, memory):
+    params = VALUES + ["", str(tmp_path), "", memory, ""]
+    standin.run(os.path.join(ROOT, "RemoteLocationXYPro.py"), params, echo=False)
+    ## Only the outputs are left in the folder: no event layers, no run time file
+    assert sorted(os.listdir(str(tmp_path))) == [
+        "Accuracy.shp", "ObjectLocation.shp", "ObservationLines.shp", "ObservationPoints.shp",
+        "RemoteLocationXY.txt", "RemoteLocationXY.xls"]
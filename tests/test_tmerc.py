@@ -0,0 +1,63 @@
+'''
+RemLocXY.tmerc: the vectorized projection gives the results of the scalar
+RemLocXY.utm, in every zone, in both hemispheres and at the zone edges.
+'''
+
+import numpy as np
+
+from RemLocXY import tmerc, utm
+
+
+def _points(n=3000, seed=4):
+    rng = np.random.default_rng(seed)
+    lat = rng.uniform(-80, 84, n)
+    lon = rng.uniform(-180, 180, n)
+    ## Points on and next to the zone edges, and on the equator
+    edge = rng.integers(0, 60, n // 3) * 6 - 180.0
+    lon[:n // 3] = np.clip(edge + rng.choice([-1e-9, 0.0, 1e-9], n // 3), -180, 179.999999)
+    lat[:50] = 0.0
+    return lat, lon
+
+
+def test_zone():
+    lat, lon = _points()
+    number, north = tmerc.zone(lat, lon)
+    expected = [utm.zone(a, b) for a, b in zip(lat.tolist(), lon.tolist())]
+    assert number.tolist() == [z for z, _ in expected]
+    assert north.tolist() == [h for _, h in expected]
+    assert tmerc.epsg(number, north).tolist() == [utm.epsg(z, h) for z, h in expected]
+
+
+def test_forward_inverse():
+    lat, lon = _points()
+    number, north = tmerc.zone(lat, lon)
+    ## Also project into the neighbouring zone, up to 9 degrees off the central meridian
+    number = np.concatenate([number, number % 60 + 1])
+    north = np.concatenate([north, north])
+    lat = np.concatenate([lat, lat])
+    lon = np.concatenate([lon, lon])
+    X, Y, gamma, k = tmerc.forward(lat, lon, number, north)
+    la, lo = tmerc.inverse(X, Y, number, north)
+    for i in range(len(lat)):
+        args = (int(number[i]), bool(north[i]))
+        X0, Y0, gamma0, k0 = utm.forward(lat[i], lon[i], *args)
+        assert abs(X[i] - X0) < 1e-6 and abs(Y[i] - Y0) < 1e-6
+        assert abs(gamma[i] - gamma0) < 1e-9 and abs(k[i] - k0) < 1e-12
+        lat0, lon0 = utm.inverse(X[i], Y[i], *args)
+        assert abs(la[i] - lat0) < 1e-11 and abs(lo[i] - lon0) < 1e-11
+    ## Back to the start: the 6th order series is good to 1 mm this far off
+    assert np.abs(la - lat).max() < 1e-8
+    assert np.abs((lo - lon + 180) % 360 - 180).max() < 1e-8
+
+
+def test_blocks():
+    ## Large arrays are projected BLOCK points at a time, in any shape
+    lat, lon = _points(3 * tmerc.BLOCK + 17)
+    lat, lon = lat.reshape(-1, 1), lon.reshape(1, -1)[:, :3]
+    X, Y, gamma, k = tmerc.forward(lat, lon, 31, True)
+    assert X.shape == (len(lat), 3)
+    one = tmerc.forward(lat[-5:], lon, 31, True)
+    for v, w in zip((X, Y, gamma, k), one):
+        assert np.allclose(v[-5:], w, rtol=0, atol=1e-8)
+    la, lo = tmerc.inverse(X, Y, 31, True)
+    assert la.shape == lo.shape == X.shape
@@ -0,0 +1,90 @@
+'''
+RemLocXY.track: filtering and fixed-lag smoothing of straight-line tracks.
+'''
+
+import numpy as np
+import pytest
+
+from RemLocXY import tmerc, track
+
+# Start of the tracks (UTM zone 16 north) and the speed east, north (m/s)
+START = (300000.0, 4830000.0)
+VELOCITY = (1.5, -0.5)
+
+
+def _track(n, sd, seed=0, step=60.0):
+    '''Times, true UTM positions and noisy WGS84 fixes of a straight track.'''
+    rng = np.random.default_rng(seed)
+    time = np.arange(n) * step
+    X = START[0] + VELOCITY[0] * time
+    Y = START[1] + VELOCITY[1] * time
+    lat, lon = tmerc.inverse(X + rng.normal(0, sd, n), Y + rng.normal(0, sd, n), 16, True)
+    return time, X, Y, lon, lat
+
+
+def _error(state, X, Y):
+    return np.hypot(state.X_UTM - X[state.index], state.Y_UTM - Y[state.index])
+
+
+def test_filter_and_smoother():
+    n, sd = 200, 20.0
+    time, X, Y, lon, lat = _track(n, sd)
+    ## Little random acceleration: the animal keeps its course
+    tracks = track.Tracks(lag=5, q=1e-4)
+    filtered = []
+    smoothed = []
+    for i in range(n):
+        f, s = tracks.update(["c12"], time[i:i+1], lon[i:i+1], lat[i:i+1], sd)
+        filtered.append(f)
+        smoothed.append(s)
+    smoothed.append(tracks.flush())
+    f = track.Tracks._concat(filtered)
+    s = track.Tracks._concat(smoothed)
+    assert f.index.tolist() == list(range(n))
+    assert s.index.tolist() == list(range(n))
+    ## Past the start the filter beats the fixes and the smoother the filter
+    late = slice(50, None)
+    raw = np.hypot(*(np.array(tmerc.forward(lat, lon, 16, True)[:2]) - [X, Y]))
+    assert _error(f, X, Y)[late].mean() < 0.7 * raw[late].mean()
+    assert _error(s, X, Y)[late].mean() < _error(f, X, Y)[late].mean()
+    assert abs(f.vx[-1] - VELOCITY[0]) < 0.2 and abs(f.vy[-1] - VELOCITY[1]) < 0.2
+    assert (f.zone == 16).all() and f.north.all()
+
+
+def test_batch_update_as_one_by_one():
+    ## Fixes of several animals in one call, as when added one at a time
+    time, _, _, lon, lat = _track(30, 10.0, seed=1)
+    animals = ["a", "b"] * 15
+    offset = np.where(np.arange(30) % 2, 0.01, 0.0)
+    one = track.Tracks(lag=2)
+    f1, s1 = one.update(animals, time, lon + offset, lat, 10.0)
+    other = track.Tracks(lag=2)
+    parts = [other.update([a], time[i:i+1], lon[i:i+1] + offset[i], lat[i:i+1], 10.0)
+             for i, a in enumerate(animals)]
+    f2 = track.Tracks._concat([f for f, _ in parts])
+    assert f1.animal == f2.animal
+    assert np.allclose(f1.X_UTM, f2.X_UTM) and np.allclose(f1.vy, f2.vy)
+    s2 = track.Tracks._concat([s for _, s in parts])
+    assert sorted(zip(s1.animal, s1.index.tolist())) == sorted(zip(s2.animal, s2.index.tolist()))
+
+
+def test_flush_idempotent():
+    time, _, _, lon, lat = _track(10, 10.0)
+    tracks = track.Tracks(lag=4)
+    _, smoothed = tracks.update(["c12"] * 10, time, lon, lat, 10.0)
+    assert smoothed.index.tolist() == list(range(6))
+    last = tracks.flush()
+    assert last.index.tolist() == [6, 7, 8, 9]
+    assert len(tracks.flush().index) == 0
+    ## Later fixes are smoothed on, without returning the flushed ones again
+    time, _, _, lon, lat = _track(20, 10.0)
+    _, smoothed = tracks.update(["c12"] * 10, time[10:], lon[10:], lat[10:], 10.0)
+    assert smoothed.index.tolist() == list(range(10, 16))
+    assert tracks.flush().index.tolist() == [16, 17, 18, 19]
+
+
+def test_time_order():
+    tracks = track.Tracks()
+    tracks.update(["c12"], [100.0], [-89.7], [43.6], 10.0)
+    with pytest.raises(ValueError):
+        tracks.update(["c12"], [50.0], [-89.7], [43.6], 10.0)